@@ -93,7 +93,8 @@ def process_one_sweep(args):
             xinfo = XProject.from_json(new_json)
             xcryst = list(xinfo.get_crystals().values())[0]
             xsweep = xcryst.get_xwavelength(wavelength_id).get_sweeps()[0]
-            xsweep_dict = xsweep.to_dict()
+            # only the processing state will have changed, so just pass that back
+            xsweep_dict = xsweep.get_processing_state()
 
         shutil.rmtree(tmpdir, ignore_errors=True)
         if os.path.exists(tmpdir):
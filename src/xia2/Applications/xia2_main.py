@@ -10,7 +10,6 @@ import os
 import platform
 import sys
 
-import h5py
 from dials.util import Sorry
 
 from xia2.cli import extra_help_lines
@@ -74,6 +73,8 @@ def check_hdf5_master_files(master_files):
     files and not just the data files: if the latter then sys.exit() with a
     helpful message"""
 
+    import h5py
+
     bad = []
 
     for filename in master_files:
@@ -578,9 +578,11 @@ def _get_sweeps(templates):
     mp_params = params.xia2.settings.multiprocessing
     nproc = mp_params.nproc
 
+    # the headers of a single template are read in parallel by load_imagesets
     if (
         params.xia2.settings.read_all_image_headers
         and nproc > 1
+        and len(templates) > 1
         and not os.name == "nt"
     ):
         method = "multiprocessing"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import collections
 import logging
 import os
 import signal
@@ -19,6 +20,7 @@ from xia2.Driver.DriverHelper import (
     generate_random_name,
 )
 from xia2.DriverExceptions.NotAvailableError import NotAvailableError
+from xia2.Handlers import LogIndex
 
 logger = logging.getLogger("xia2.Driver.DefaultDriver")
 
@@ -47,7 +49,9 @@ class DefaultDriver:
         # usually small
         self._standard_input_records = []
 
-        # this will be bigger but that is ok...
+        # this will be bigger but that is ok... unless a limit is set, in
+        # which case only the most recent records are kept
+        self._output_record_limit = None
         self._standard_output_records = []
 
         # optional - possibly useful if using a batch submission
@@ -90,6 +94,16 @@ class DefaultDriver:
     def get_xpid(self):
         return self._xpid
 
+    def set_output_record_limit(self, limit):
+        """Keep only the last limit records of the standard output in memory,
+        for programs with very verbose output. All of the output is still
+        written to the log file."""
+
+        self._output_record_limit = limit
+        self._standard_output_records = collections.deque(
+            self._standard_output_records, maxlen=limit
+        )
+
     def set_cpu_threads(self, cpu_threads):
         self._cpu_threads = cpu_threads
 
@@ -189,6 +203,8 @@ class DefaultDriver:
 
         self._standard_input_records = []
         self._standard_output_records = []
+        if self._output_record_limit:
+            self.set_output_record_limit(self._output_record_limit)
 
         self._command_line = []
 
@@ -246,7 +262,7 @@ class DefaultDriver:
         # only look for errors in the last 30 lines of the standard
         # output - if something went wrong, it went wrong in there...
 
-        self.check_for_error_text(self._standard_output_records[-30:])
+        self.check_for_error_text(self.get_all_output()[-30:])
         # next check the status
 
         self.check_return_code()
@@ -324,7 +340,7 @@ class DefaultDriver:
         self._standard_output_records.append(record)
 
         if self._log_file is not None:
-            self._log_file.write(record)
+            self._write_log_record(record)
 
             # FIXME 07/NOV/06 I have noticed that sometimes
             # information is missed from the log files - perhaps
@@ -353,13 +369,20 @@ class DefaultDriver:
 
         # should have bufsize = 0 here... won't work on mac!
 
+        LogIndex.clear_loggraph_index(filename)
         self._log_file = open(filename, "w", encoding="utf-8")
         if self._standard_output_records:
             for s in self._standard_output_records:
-                self._log_file.write(s)
+                self._write_log_record(s)
 
         self._log_file_name = self._log_file.name
 
+    def _write_log_record(self, record):
+        # index the loggraph tables as they are written, for xia2.html
+        if "$TABLE" in record:
+            LogIndex.record_loggraph_table(self._log_file)
+        self._log_file.write(record)
+
     def get_log_file(self):
         """Get a pointer to the log file if set."""
 
@@ -369,8 +392,11 @@ class DefaultDriver:
         return ""
 
     def get_all_output(self):
-        """Return all of the output of the job."""
+        """Return all of the output of the job, or the most recent records
+        if set_output_record_limit() has been used."""
 
+        if self._output_record_limit:
+            return list(self._standard_output_records)
         return self._standard_output_records
 
     def close(self):
@@ -18,15 +18,16 @@ import sys
 
 from dials.util import Sorry
 from dials.util.system import CPU_COUNT
-from dxtbx.serialize import load
 
 from xia2.Experts.FindImages import image2template_directory
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Flags import Flags
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.PipelineSelection import add_preference
+from xia2.lib.lazy_import import lazy_import
 from xia2.Schema import imageset_cache, update_with_reference_geometry
-from xia2.Schema.XProject import XProject
+
+load = lazy_import("dxtbx.serialize.load")
 
 logger = logging.getLogger("xia2.Handlers.CommandLine")
 
@@ -508,6 +509,8 @@ class _CommandLine:
         with open(xinfo) as fh:
             logger.debug(fh.read().strip())
         logger.debug(60 * "-")
+        from xia2.Schema.XProject import XProject
+
         self._xinfo = XProject(xinfo)
 
     def get_xinfo(self):
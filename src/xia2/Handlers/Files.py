@@ -20,6 +20,16 @@ logger = logging.getLogger("xia2.Handlers.Files")
 class _FileHandler:
     """A singleton class to manage files."""
 
+    # the files which are copied by cleanup()
+    _records = (
+        "_log_files",
+        "_more_log_files",
+        "_xml_files",
+        "_html_files",
+        "_data_files",
+        "_more_data_files",
+    )
+
     def __init__(self):
         self._temporary_files = []
 
@@ -131,6 +141,36 @@ class _FileHandler:
         if filename not in self._temporary_files:
             self._temporary_files.append(filename)
 
+    def get_records(self):
+        """A copy of the log, html and data files recorded so far, from which
+        to find those recorded since with get_records_since()."""
+        return {name: getattr(self, name).copy() for name in self._records}
+
+    def get_records_since(self, records):
+        """The files recorded since records were taken with get_records(),
+        e.g. in another process, to be recorded here with add_records()."""
+        added = {}
+        for name in self._records:
+            current = getattr(self, name)
+            if isinstance(current, dict):
+                added[name] = {
+                    key: filename
+                    for key, filename in current.items()
+                    if records[name].get(key) != filename
+                }
+            else:
+                added[name] = [f for f in current if f not in records[name]]
+        return added
+
+    def add_records(self, records):
+        """Record the files from get_records_since()."""
+        for name, added in records.items():
+            current = getattr(self, name)
+            if isinstance(current, dict):
+                current.update(added)
+            else:
+                current.extend(f for f in added if f not in current)
+
 
 FileHandler = _FileHandler()
 
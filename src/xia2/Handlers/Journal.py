@@ -0,0 +1,172 @@
+# A journal of completed processing stages - each time an Indexer, Refiner
+# or Integrater for a sweep completes, the state of the sweep is appended to
+# the journal, along with a fingerprint of the inputs. When continuing from a
+# previous job the most recent state for each sweep can then be restored,
+# provided the inputs are unchanged, rather than starting the sweep again
+# from scratch.
+
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger("xia2.Handlers.Journal")
+
+
+def sweep_key(sweep):
+    """The identity of a sweep within the project, e.g. DEFAULT/NATIVE/SWEEP1"""
+    if not sweep.get_wavelength():
+        return "default/default/%s" % sweep.get_name()
+    wavelength = sweep.get_wavelength()
+    return "/".join(
+        (wavelength.get_crystal().get_name(), wavelength.get_name(), sweep.get_name())
+    )
+
+
+# Parameters which do not change the processing of a sweep: how sweeps are
+# distributed over processes, which sweep a parallel job processes, and
+# whether and where the stages are journalled.
+_UNFINGERPRINTED_PARAMETERS = (
+    "xia2.settings.multiprocessing.",
+    "xia2.settings.sweep.id",
+    "xia2.settings.developmental.continue_from_previous_job",
+    "xia2.settings.developmental.journal",
+)
+
+
+def sweep_fingerprint(sweep):
+    """A hash of the inputs to the processing of a sweep: the image files
+    (path, size and modification time) and the modified xia2 parameters."""
+    from xia2.Handlers.Phil import PhilIndex
+
+    h = hashlib.sha256()
+    h.update(sweep.get_template().encode())
+    h.update(str(sweep.get_image_range()).encode())
+    imageset = sweep.get_imageset()
+    paths = sorted(set(imageset.paths())) if imageset else []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            h.update(f"{path}:missing".encode())
+        else:
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns}".encode())
+    for definition in PhilIndex.get_diff().all_definitions():
+        if not definition.path.startswith(_UNFINGERPRINTED_PARAMETERS):
+            h.update(f"{definition.path}={definition.object.as_str()}".encode())
+    return h.hexdigest()
+
+
+class _Journal:
+    """A singleton class to record completed processing stages."""
+
+    def __init__(self):
+        self._filename = None
+        self._relocate = None
+
+    def open(self, filename, relocate=None):
+        """Set the journal file, records are appended to any existing ones.
+        If given, relocate is a pair of directories (from, to): paths below
+        from are recorded as below to, for processing in a directory whose
+        output will be moved (see process_one_sweep)."""
+        self._filename = os.path.abspath(filename)
+        self._relocate = relocate
+
+    def close(self):
+        self._filename = None
+        self._relocate = None
+
+    def record_sweep(self, sweep, stage):
+        """Record the state of a sweep following completion of a stage."""
+        if self._filename is None or sweep is None:
+            return
+        try:
+            record = {
+                "sweep": sweep_key(sweep),
+                "stage": stage,
+                "time": time.time(),
+                "fingerprint": sweep_fingerprint(sweep),
+                "payload": sweep.get_processing_state(),
+            }
+            text = json.dumps(
+                record, skipkeys=True, separators=(",", ":"), ensure_ascii=True
+            )
+        except Exception as e:
+            # the journal is a convenience, failure to record must not be fatal
+            logger.debug("Unable to record %s for journal: %s", stage, e)
+            return
+        if self._relocate:
+            # as the paths in the json files are rewritten by process_one_sweep
+            text = text.replace(*(os.fspath(d) for d in self._relocate))
+        self._append(text + "\n")
+        logger.debug("Journal: recorded %s of %s", stage, record["sweep"])
+
+    def _append(self, text):
+        # Sweeps processed in parallel, possibly on other hosts, append to the
+        # same journal: write each record with a single write while holding an
+        # exclusive lock, so that records are never interleaved.
+        data = text.encode()
+        fd = os.open(self._filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            while data:
+                data = data[os.write(fd, data) :]
+            os.fsync(fd)
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+    def _read_records(self):
+        from xia2.Schema.XProject import decode_dict_keys
+
+        if self._filename is None or not os.path.isfile(self._filename):
+            return
+        with open(self._filename) as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line, object_hook=decode_dict_keys)
+                except ValueError:
+                    # e.g. a partially written last record following a crash
+                    continue
+
+    def latest_record(self, sweep):
+        """Get the most recent journal record for a sweep for which the inputs
+        are unchanged, or None."""
+        key = sweep_key(sweep)
+        latest = None
+        for record in self._read_records():
+            if record.get("sweep") == key:
+                latest = record
+        if latest is None:
+            return None
+        if latest["fingerprint"] != sweep_fingerprint(sweep):
+            logger.debug("Journal: inputs for %s have changed", key)
+            return None
+        return latest
+
+    def restore_sweep(self, sweep):
+        """Restore the indexer, refiner and integrater of a sweep from the
+        journal. Returns the name of the last completed stage, or None."""
+        record = self.latest_record(sweep)
+        if record is None:
+            return None
+        sweep.set_processing_state(record["payload"])
+        logger.info(
+            "Restored %s from journal after completed %s stage",
+            sweep.get_name(),
+            record["stage"],
+        )
+        return record["stage"]
+
+
+Journal = _Journal()
@@ -0,0 +1,117 @@
+# Indexes for xia2 log files, written as the logs are produced, so that the
+# tools which monitor a running job (xia2.is_doing) or summarise the program
+# logs (xia2.html) can seek directly to the records they need rather than
+# rescanning log files which for long runs may be very large.
+#
+# Two kinds of index are written, each alongside the file it indexes:
+#
+#   xia2-debug.txt.idx: the path of each program log file, as it is started
+#   N_program.log.idx: the byte offset of each loggraph $TABLE in the log
+#
+# Only the standard library is used, so that xia2.is_doing stays lightweight.
+
+
+from __future__ import annotations
+
+import os
+
+INDEX_SUFFIX = ".idx"
+
+_logfile_index = None
+
+
+def set_logfile_index(filename):
+    """Start a new index of program log files."""
+    global _logfile_index
+    _logfile_index = os.path.abspath(filename)
+    with open(_logfile_index, "w"):
+        pass
+
+
+def record_logfile(logfile):
+    """Append a program log file to the index, if there is one."""
+    if _logfile_index is None:
+        return
+    try:
+        with open(_logfile_index, "a", encoding="utf-8") as fh:
+            fh.write(f"{os.path.abspath(logfile)}\n")
+    except OSError:
+        # the index is a convenience, failure to update it is not fatal
+        pass
+
+
+def logfiles_from(filename, offset=0):
+    """Read the log files recorded in an index from offset (in bytes),
+    returning a list of log files and the offset to read subsequent records
+    from. A partially written last record is left for the next read."""
+    with open(filename, "rb") as fh:
+        fh.seek(offset)
+        data = fh.read()
+    end = data.rfind(b"\n") + 1
+    logfiles = data[:end].decode("utf-8").splitlines()
+    return logfiles, offset + end
+
+
+def last_logfile(filename):
+    """The most recent log file in an index, reading only the end of it."""
+    with open(filename, "rb") as fh:
+        size = fh.seek(0, os.SEEK_END)
+        offset = size
+        data = b""
+        # read backwards until the start of the last complete record
+        while offset > 0 and data.count(b"\n") < 2:
+            offset = max(0, offset - 4096)
+            fh.seek(offset)
+            data = fh.read(size - offset)
+    records = data[: data.rfind(b"\n")].decode("utf-8").splitlines()
+    return records[-1] if records else None
+
+
+def clear_loggraph_index(logfile):
+    """Remove any index of a log file which is about to be (re)written."""
+    try:
+        os.remove(logfile + INDEX_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def record_loggraph_table(log_file):
+    """Record the position of a loggraph table about to be written to the
+    open log file."""
+    try:
+        offset = log_file.tell()
+        with open(log_file.name + INDEX_SUFFIX, "a") as fh:
+            fh.write(f"{offset}\n")
+    except OSError:
+        # an incomplete index must not be used
+        clear_loggraph_index(log_file.name)
+
+
+def loggraph_table_lines(logfile):
+    """The lines of the loggraph tables in a log file, read from the index of
+    table positions, or None if the log file has no valid index."""
+    index = logfile + INDEX_SUFFIX
+    if not os.path.isfile(index):
+        return None
+    with open(index) as fh:
+        offsets = [int(record) for record in fh]
+
+    lines = []
+    with open(logfile, "rb") as fh:
+        for offset in offsets:
+            fh.seek(offset)
+            line = fh.readline().decode("latin-1")
+            if "$TABLE" not in line:
+                # the index does not match the log file
+                return None
+            # a table is the $TABLE line, then $GRAPHS, column labels and
+            # data, each section terminated by $$
+            n_terminators = line.count("$$")
+            lines.append(line)
+            while n_terminators < 4:
+                line = fh.readline().decode("latin-1")
+                if not line:
+                    break
+                n_terminators += line.count("$$")
+                lines.append(line)
+    return lines
@@ -12,11 +12,17 @@
 
 from __future__ import annotations
 
-from iotbx.phil import parse
-from libtbx.phil import interface
+import hashlib
+import importlib.util
+import logging
+import os
+import re
+import tempfile
+from importlib import metadata
 
-master_phil = parse(
-    """
+logger = logging.getLogger("xia2.Handlers.Phil")
+
+master_phil_str = """
 general
   .short_caption = "General settings"
 {
@@ -121,6 +127,16 @@ xds
       .type = float
       .short_caption = "BEAM_DIVERGENCE_E.S.D. ="
       .expert_level = 1
+    fork_jobs = 1
+      .type = int(value_min=1)
+      .short_caption = "Number of INTEGRATE jobs"
+      .help = "Split INTEGRATE into up to this many image ranges, each at " \
+              "least 5 degrees wide, integrated as separate XDS jobs in " \
+              "parallel and merged afterwards. The jobs share " \
+              "multiprocessing.nproc, so no more than nproc jobs are run, or " \
+              "with multiprocessing.type=qsub are each submitted with nproc " \
+              "processors."
+      .expert_level = 2
     reintegrate = true
       .type = bool
       .short_caption = "Reintegrate after global refinement"
@@ -317,6 +333,14 @@ dials
               "this value to be part of the background."
       .short_caption = "Global threshold cutoff"
       .expert_level = 1
+    reuse_spots = True
+      .type = bool
+      .help = "Reuse the spots already found on images searched with the " \
+              "same parameters, e.g. when indexing is repeated or xia2 is " \
+              "run again in the same directory, only searching for spots " \
+              "on images not yet searched."
+      .short_caption = "Reuse spots already found"
+      .expert_level = 2
   }
   index
     .short_caption = "Indexing"
@@ -893,6 +917,14 @@ xia2.settings
     .type = bool
     .short_caption = "Read all image headers"
     .expert_level = 1
+  image_header_cache = None
+    .type = path
+    .help = "Directory for an on-disk cache of the models read from the image " \
+            "headers, shared between runs, so that each header is only read " \
+            "once. This should be on a local disk, e.g. scratch space, rather " \
+            "than a network file system. By default no cache is kept."
+    .short_caption = "Image header cache directory"
+    .expert_level = 2
   detector_distance = None
     .type = float(value_min=0.0)
     .help = "Distance between sample and detector (mm)"
@@ -941,8 +973,18 @@ xia2.settings
   {
     continue_from_previous_job = False
       .type = bool
-      .help = "If xia2.json file is present from a previous xia2 job then "
-              "continue scaling from the previous integration results."
+      .help = "If xia2.json or xia2.state file is present from a previous "
+              "xia2 job then continue scaling from the previous integration "
+              "results. Sweeps "
+              "are also restored from the last completed indexing, refinement "
+              "or integration stage recorded in xia2-journal.jsonl, if their "
+              "input images and parameters are unchanged."
+    journal = None
+      .type = path
+      .help = "Used internally when sweeps are processed in parallel: the "
+              "journal of the xia2 job for which a sweep is processed, in a "
+              "temporary subdirectory of the directory of the journal."
+      .expert_level = 2
     use_dials_spotfinder = False
       .type = bool
       .help = "This feature requires the dials project to be installed, and " \
@@ -985,6 +1027,17 @@ xia2.settings
     .type = float
     .short_caption = "Threshold for lattice rejection"
     .expert_level = 2
+  speculative_lattices = 1
+    .type = int(value_min=1)
+    .help = "When a lattice is rejected, refine and integrate up to this many " \
+            "of the next candidate lattices in parallel, each in its own " \
+            "working directory, keeping the first which is not rejected, as " \
+            "rejecting the lattices one at a time would. The later candidates " \
+            "are then stopped. Each candidate uses the full " \
+            "multiprocessing.nproc, so this trades CPU for wall time. Only " \
+            "applies to sweeps which are refined individually."
+    .short_caption = "Candidate lattices to integrate in parallel"
+    .expert_level = 2
   xds
     .expert_level = 1
     .short_caption = "xia2 XDS settings"
@@ -1083,14 +1136,10 @@ xia2.settings
     }
   }
 }
-""",
-    process_includes=True,
-)
+"""
 
 # override default resolution parameters
-master_phil = master_phil.fetch(
-    source=parse(
-        """\
+resolution_defaults_str = """\
 xia2.settings {
   resolution {
     isigma = None
@@ -1098,10 +1147,150 @@ xia2.settings {
   }
 }
 """
+
+
+def _build_master_phil():
+    from iotbx.phil import parse
+
+    master_phil = parse(master_phil_str, process_includes=True)
+    return master_phil.fetch(source=parse(resolution_defaults_str))
+
+
+_include_scope = re.compile(r"^\s*include\s+scope\s+([\w.]+)", re.MULTILINE)
+
+
+def _module_source(module_name):
+    """The source file of a module, found without importing it (or its
+    parent packages), or None if not found."""
+    top, *rest = module_name.split(".")
+    try:
+        spec = importlib.util.find_spec(top)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if not rest:
+        return spec.origin
+    for location in spec.submodule_search_locations or []:
+        path = os.path.join(location, *rest)
+        for source in (path + ".py", os.path.join(path, "__init__.py")):
+            if os.path.isfile(source):
+                return source
+    return None
+
+
+def _included_sources(phil_str):
+    """The source files of the modules defining the scopes included by
+    phil_str, and in turn those included by them."""
+    sources = []
+    pending = _include_scope.findall(phil_str)
+    seen = set()
+    while pending:
+        module_name = pending.pop(0).rpartition(".")[0]
+        if module_name in seen:
+            continue
+        seen.add(module_name)
+        source = _module_source(module_name)
+        if source is None:
+            continue
+        sources.append(source)
+        try:
+            with open(source, encoding="utf-8", errors="replace") as fh:
+                pending.extend(_include_scope.findall(fh.read()))
+        except OSError:
+            pass
+    return sources
+
+
+def _master_phil_cache_file():
+    """The cache file for the fully expanded master scope, which depends on
+    the master scope definition itself and the source of the modules
+    defining the included scopes, as well as the xia2 and DIALS versions."""
+    h = hashlib.sha256()
+    for package in ("xia2", "dials"):
+        try:
+            h.update(f"{package}={metadata.version(package)}".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    h.update(master_phil_str.encode())
+    h.update(resolution_defaults_str.encode())
+    # for development (e.g. editable) installs, where the included scopes may
+    # change without the version changing
+    for source in _included_sources(master_phil_str):
+        try:
+            with open(source, "rb") as fh:
+                h.update(source.encode() + hashlib.sha256(fh.read()).digest())
+        except OSError:
+            h.update(f"{source}:missing".encode())
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
     )
-)
+    return os.path.join(cache_dir, "xia2", f"master_phil-{h.hexdigest()[:16]}.phil")
+
+
+def _load_master_phil():
+    """Parse the master scope, from the cached expanded scope if present.
+
+    Processing the include statements means importing the DIALS modules that
+    define the included scopes, which dominates the start up time of xia2
+    programs, so the expanded scope is saved for subsequent runs."""
+    from iotbx.phil import parse
+
+    cache_file = _master_phil_cache_file()
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file) as fh:
+                return parse(fh.read())
+        except Exception as e:
+            logger.debug("Ignoring master phil cache %s: %s", cache_file, e)
+
+    master_phil = _build_master_phil()
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+        with os.fdopen(fd, "w") as fh:
+            fh.write(master_phil.as_str(attributes_level=3))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug("Unable to write master phil cache %s: %s", cache_file, e)
+    return master_phil
+
+
+_master_phil = None
+
+
+def get_master_phil():
+    global _master_phil
+    if _master_phil is None:
+        _master_phil = _load_master_phil()
+    return _master_phil
+
+
+def __getattr__(name):
+    # master_phil is only parsed when first used
+    if name == "master_phil":
+        return get_master_phil()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _PhilIndex:
+    """The libtbx.phil.interface.index of the xia2 parameters, created on
+    first use so that importing this module does not parse the master scope."""
+
+    def __init__(self):
+        self._index = None
+
+    def __getattr__(self, name):
+        if name == "_index":
+            raise AttributeError(name)
+        if self._index is None:
+            from libtbx.phil import interface
+
+            self._index = interface.index(master_phil=get_master_phil())
+        return getattr(self._index, name)
+
 
-PhilIndex = interface.index(master_phil=master_phil)
+PhilIndex = _PhilIndex()
 
 if __name__ == "__main__":
     PhilIndex.working_phil.show()
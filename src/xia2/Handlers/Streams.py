@@ -16,6 +16,8 @@ import platform
 import sys
 from datetime import date
 
+from xia2.Handlers import LogIndex
+
 if not hasattr(logging, "NOTICE"):
     # Create a NOTICE log level and associated command
     setattr(logging, "NOTICE", 25)
@@ -88,6 +90,8 @@ def setup_logging(logfile=None, debugfile=None, verbose=False):
         for logger_ in [xia2_logger] + other_loggers:
             logger_.addHandler(fh)
             logger_.setLevel(logging.DEBUG)
+        # and index the program log files recorded in the debug log
+        LogIndex.set_logfile_index(debugfile + LogIndex.INDEX_SUFFIX)
 
 
 # -------------------------------------------------------------------------------
@@ -7,6 +7,7 @@ import copy
 import logging
 import math
 import os
+import shutil
 import string
 import time
 
@@ -23,6 +24,13 @@ from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
 from xia2.lib.bits import auto_logfiler
+from xia2.Modules.Indexer.SpotfindingCache import (
+    SpotfindingCache,
+    combine_hot_masks,
+    merge_ranges,
+    spotfinding_key,
+    subtract_ranges,
+)
 from xia2.Schema.Interfaces.Indexer import Indexer
 from xia2.Wrappers.Dials.CheckIndexingSymmetry import (
     CheckIndexingSymmetry as _CheckIndexingSymmetry,
@@ -295,11 +303,6 @@ class DialsIndexer(Indexer):
             spotfinder.set_input_spot_filename(
                 f"{spotfinder.get_xpid()}_{xsweep.get_name()}_strong.refl"
             )
-            if PhilIndex.params.dials.fast_mode:
-                wedges = self._index_select_images_i(imageset)
-                spotfinder.set_scan_ranges(wedges)
-            else:
-                spotfinder.set_scan_ranges([(first, last)])
             if dfs_params.phil_file is not None:
                 spotfinder.set_phil_file(dfs_params.phil_file)
             if dfs_params.min_spot_size is not None:
@@ -327,9 +330,14 @@ class DialsIndexer(Indexer):
                 spotfinder.set_global_threshold(dfs_params.global_threshold)
             if dfs_params.threshold.algorithm is not None:
                 spotfinder.set_threshold_algorithm(dfs_params.threshold.algorithm)
-            spotfinder.run()
 
-            spot_filename = spotfinder.get_spot_filename()
+            if PhilIndex.params.dials.fast_mode:
+                scan_ranges = self._index_select_images_i(imageset)
+            else:
+                scan_ranges = [(first, last)]
+            spot_filename = self._find_spots(
+                spotfinder, imageset, scan_ranges, mask_pickle
+            )
             if not os.path.exists(spot_filename):
                 raise RuntimeError(
                     "Spotfinding failed: %s does not exist."
@@ -500,6 +508,91 @@ class DialsIndexer(Indexer):
         self.set_indexer_payload("spot_lists", spot_lists)
         self.set_indexer_payload("experiments", experiments_filenames)
 
+    def _find_spots(self, spotfinder, imageset, scan_ranges, mask):
+        """Find spots on the scan ranges of the imageset, reusing any spots
+        already found on these images with the same parameters, mask and
+        geometry, and return the name of the file of spots. The experiments
+        written, with any hot mask, are those of all of the images searched."""
+
+        if not PhilIndex.params.dials.find_spots.reuse_spots:
+            spotfinder.set_scan_ranges(scan_ranges)
+            spotfinder.run()
+            return spotfinder.get_spot_filename()
+
+        cache = SpotfindingCache(self.get_working_directory())
+        files = [mask]
+        if spotfinder.get_parameters()["phil_file"]:
+            files.append(spotfinder.get_parameters()["phil_file"])
+        geometry = {
+            "beam": imageset.get_beam().to_dict(),
+            "detector": imageset.get_detector().to_dict(),
+        }
+        key = spotfinding_key(
+            imageset.get_template(), spotfinder.get_parameters(), files, geometry
+        )
+        entry = cache.get(key)
+        searched = entry["ranges"] if entry else []
+        cached_filename = entry["filename"] if entry else None
+        experiments_filename = os.path.join(
+            self.get_working_directory(), spotfinder.get_output_sweep_filename()
+        )
+
+        missing = subtract_ranges(scan_ranges, searched)
+        reflections = None
+        if missing:
+            spotfinder.set_scan_ranges(missing)
+            spotfinder.run()
+            hot_mask = spotfinder.get_hot_mask_filename()
+            if not entry:
+                cache.set(
+                    key,
+                    missing,
+                    spotfinder.get_spot_filename(),
+                    experiments_filename,
+                    hot_mask,
+                )
+                return spotfinder.get_spot_filename()
+
+            # the experiments written refer to the hot mask of the images just
+            # searched: add the hot pixels found on those already searched
+            if hot_mask and entry["hot_mask"]:
+                combine_hot_masks([entry["hot_mask"], hot_mask], hot_mask)
+
+            # add the spots found to those already found
+            reflections = flex.reflection_table.from_file(cached_filename)
+            found = flex.reflection_table.from_file(spotfinder.get_spot_filename())
+            identifiers = found.experiment_identifiers()
+            for i in list(identifiers.keys()):
+                del identifiers[i]
+            reflections.extend(found)
+            searched = merge_ranges(searched + missing)
+            cached_filename = os.path.join(
+                self.get_working_directory(),
+                "%d_found_spots.refl" % spotfinder.get_xpid(),
+            )
+            reflections.as_file(cached_filename)
+            cache.set(key, searched, cached_filename, experiments_filename, hot_mask)
+        else:
+            logger.info(
+                "Reusing spots found on images %s",
+                ", ".join("%d-%d" % r for r in merge_ranges(scan_ranges)),
+            )
+            # the experiments written when the images were searched, with the
+            # hot mask of all of the images searched
+            shutil.copyfile(entry["experiments"], experiments_filename)
+
+        if merge_ranges(scan_ranges) == searched:
+            return cached_filename
+
+        if reflections is None:
+            reflections = flex.reflection_table.from_file(cached_filename)
+        z = reflections["xyzobs.px.value"].parts()[2]
+        selected = flex.bool(len(reflections), False)
+        for first, last in scan_ranges:
+            selected |= (z >= first - 1) & (z < last)
+        reflections.select(selected).as_file(spotfinder.get_spot_filename())
+        return spotfinder.get_spot_filename()
+
     def _index(self):
         if PhilIndex.params.dials.index.method in (libtbx.Auto, None):
             if self._indxr_input_cell is not None:
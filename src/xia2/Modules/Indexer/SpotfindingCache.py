@@ -0,0 +1,122 @@
+# A record of the spots found on each sweep, so that spotfinding over images
+# which have already been searched with the same parameters - when indexing
+# is repeated on part of a sweep, or xia2 is run again in the same directory -
+# can reuse the spots already found, only searching images not yet searched.
+# The experiments written by the spotfinding, with any hot mask, are kept with
+# the spots, so that the hot mask is that of all of the images searched.
+# N.B. images are identified by their template, so new images written under
+# the same names are not noticed: use dials.find_spots.reuse_spots=False.
+
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or adjacent (first, last) image ranges, giving the
+    sorted list of distinct ranges."""
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def subtract_ranges(ranges, covered):
+    """The parts of the (first, last) image ranges not in the covered
+    ranges."""
+
+    remaining = []
+    covered = merge_ranges(covered)
+    for first, last in merge_ranges(ranges):
+        for c_first, c_last in covered:
+            if c_last < first or c_first > last:
+                continue
+            if c_first > first:
+                remaining.append((first, c_first - 1))
+            first = c_last + 1
+            if first > last:
+                break
+        if first <= last:
+            remaining.append((first, last))
+    return remaining
+
+
+def spotfinding_key(template, parameters, files=(), geometry=None):
+    """A key identifying the spots found on the images of a sweep: from the
+    image template, the spotfinding parameters, the contents of any other
+    files used, e.g. the mask, and the beam and detector geometry, on which
+    e.g. the filtering of ice rings depends."""
+
+    record = {
+        "template": template,
+        "parameters": parameters,
+        "files": [],
+        "geometry": geometry,
+    }
+    for filename in files:
+        with open(filename, "rb") as fh:
+            record["files"].append(hashlib.sha1(fh.read()).hexdigest())
+    text = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def combine_hot_masks(filenames, output):
+    """Write the combination of the hot masks in filenames - each a tuple of
+    per-panel masks, False at hot pixels - to output, so that the pixels
+    found hot on the images of any of them are masked."""
+
+    combined = None
+    for filename in filenames:
+        with open(filename, "rb") as fh:
+            mask = pickle.load(fh)
+        if combined is None:
+            combined = mask
+        else:
+            combined = tuple(a & b for a, b in zip(combined, mask))
+    with open(output, "wb") as fh:
+        pickle.dump(combined, fh)
+
+
+class SpotfindingCache:
+    """The image ranges searched, file of spots found and experiments (with
+    any hot mask) written for each spotfinding key, saved in a directory."""
+
+    def __init__(self, directory):
+        self._filename = os.path.join(directory, "spotfinding_cache.json")
+        self._entries = {}
+        if os.path.isfile(self._filename):
+            with open(self._filename) as fh:
+                self._entries = json.load(fh)
+
+    def get(self, key):
+        """The entry for key - the ranges searched, and the files of spots
+        found, experiments and hot mask - or None if not yet searched (or any
+        of the files has since gone)."""
+
+        entry = self._entries.get(key)
+        if entry is None or "experiments" not in entry:
+            return None
+        files = [entry["filename"], entry["experiments"]]
+        if entry["hot_mask"]:
+            files.append(entry["hot_mask"])
+        if not all(os.path.isfile(f) for f in files):
+            return None
+        return dict(entry, ranges=[tuple(r) for r in entry["ranges"]])
+
+    def set(self, key, ranges, filename, experiments, hot_mask=None):
+        self._entries[key] = {
+            "ranges": merge_ranges(ranges),
+            "filename": os.path.abspath(filename),
+            "experiments": os.path.abspath(experiments),
+            "hot_mask": os.path.abspath(hot_mask) if hot_mask else None,
+        }
+        with open(self._filename, "w") as fh:
+            json.dump(self._entries, fh, indent=2)
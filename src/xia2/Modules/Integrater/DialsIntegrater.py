@@ -287,6 +287,12 @@ class DialsIntegrater(Integrater):
             )
 
         self._intgr_per_image_statistics = integrate.get_per_image_statistics()
+        self._intgr_per_image_statistics.save(
+            os.path.join(
+                self.get_working_directory(),
+                "%d_per_image_statistics.npz" % integrate.get_xpid(),
+            )
+        )
         logger.info(self.show_per_image_statistics())
 
         report = self.Report()
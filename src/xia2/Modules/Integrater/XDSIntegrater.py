@@ -377,6 +377,12 @@ class XDSIntegrater(Integrater):
         integrate.run()
 
         self._intgr_per_image_statistics = integrate.get_per_image_statistics()
+        self._intgr_per_image_statistics.save(
+            os.path.join(
+                self.get_working_directory(),
+                "%d_per_image_statistics.npz" % integrate.get_xpid(),
+            )
+        )
         logger.info(self.show_per_image_statistics())
 
         # record the log file -
@@ -1,14 +1,196 @@
 from __future__ import annotations
 
+import functools
+import logging
+import os
+import shlex
+import struct
+from dataclasses import dataclass
+
 import iotbx.mtz
 from cctbx import sgtbx
 
 from xia2.lib.SymmetryLib import clean_reindex_operator
 
+logger = logging.getLogger("xia2.Modules.MtzUtils")
 
-def space_group_from_mtz(file_name):
+
+@dataclass(frozen=True)
+class MtzDataset:
+    project_name: str
+    crystal_name: str
+    dataset_name: str
+    i_dataset: int
+    cell: tuple[float, ...]
+    wavelength: float
+
+
+@dataclass(frozen=True)
+class MtzHeader:
+    """The metadata from an MTZ file header, without the reflection data."""
+
+    n_reflections: int
+    space_group_name: str
+    symops: tuple[str, ...]
+    column_labels: tuple[str, ...]
+    column_types: tuple[str, ...]
+    batches: tuple[int, ...]
+    resolution_range: tuple[float, float]
+    datasets: tuple[MtzDataset, ...]
+
+    def space_group(self):
+        result = sgtbx.space_group()
+        for symop in self.symops:
+            result.expand_smx(sgtbx.rt_mx(symop))
+        return result
+
+
+def _read_header_records(file_name):
+    """Read the 80 character main header records of an MTZ file, seeking
+    directly past the reflection data."""
+    with open(file_name, "rb") as fh:
+        preamble = fh.read(24)
+        if len(preamble) < 24 or preamble[:3] != b"MTZ":
+            raise ValueError(f"{file_name} is not an MTZ file")
+        # the integer format is in the second nibble of the machine stamp
+        endian = ">" if (preamble[9] >> 4) == 1 else "<"
+        (position,) = struct.unpack(endian + "i", preamble[4:8])
+        if position == -1:
+            # large file format with a 64 bit header position at word 5
+            (position,) = struct.unpack(endian + "q", preamble[16:24])
+        fh.seek((position - 1) * 4)
+
+        records = []
+        while True:
+            record = fh.read(80)
+            if len(record) < 80:
+                raise ValueError(f"{file_name}: unexpected end of MTZ header")
+            record = record.decode("ascii", errors="replace").rstrip()
+            if not records and not record.upper().startswith("VERS"):
+                raise ValueError(f"{file_name}: MTZ header not found")
+            if record.upper().startswith("END"):
+                return records
+            records.append(record)
+
+
+def _header_from_records(records):
+    n_reflections = space_group_name = resolution_range = None
+    symops = []
+    column_labels = []
+    column_types = []
+    batches = []
+    names = {}
+    cells = {}
+    wavelengths = {}
+
+    for record in records:
+        keyword = record[:4].upper()
+        if keyword == "NCOL":
+            n_reflections = int(record.split()[2])
+        elif keyword == "SYMI":
+            space_group_name = shlex.split(record)[5]
+        elif keyword == "SYMM":
+            symops.append(record[4:].replace(" ", ""))
+        elif keyword == "RESO":
+            min_res, max_res = (float(t) for t in record.split()[1:3])
+            resolution_range = (min_res**-0.5, max_res**-0.5)
+        elif keyword == "COLU":
+            tokens = record.split()
+            column_labels.append(tokens[1])
+            column_types.append(tokens[2])
+        elif keyword in ("PROJ", "CRYS", "DATA"):
+            tokens = record.split(None, 2)
+            name = tokens[2].strip() if len(tokens) > 2 else ""
+            names.setdefault(int(tokens[1]), {})[keyword] = name
+        elif keyword == "DCEL":
+            tokens = record.split()
+            cells[int(tokens[1])] = tuple(float(t) for t in tokens[2:8])
+        elif keyword == "DWAV":
+            tokens = record.split()
+            wavelengths[int(tokens[1])] = float(tokens[2])
+        elif keyword == "BATC":
+            batches.extend(int(t) for t in record.split()[1:])
+
+    if n_reflections is None or space_group_name is None or not symops:
+        raise ValueError("incomplete MTZ header")
+
+    datasets = []
+    n_datasets_in_crystal = {}
+    for set_id in sorted(names):
+        crystal = (names[set_id].get("PROJ", ""), names[set_id].get("CRYS", ""))
+        i_dataset = n_datasets_in_crystal.get(crystal, 0)
+        n_datasets_in_crystal[crystal] = i_dataset + 1
+        datasets.append(
+            MtzDataset(
+                project_name=crystal[0],
+                crystal_name=crystal[1],
+                dataset_name=names[set_id].get("DATA", ""),
+                i_dataset=i_dataset,
+                cell=cells.get(set_id, ()),
+                wavelength=wavelengths.get(set_id, 0.0),
+            )
+        )
+
+    return MtzHeader(
+        n_reflections=n_reflections,
+        space_group_name=space_group_name,
+        symops=tuple(symops),
+        column_labels=tuple(column_labels),
+        column_types=tuple(column_types),
+        batches=tuple(batches),
+        resolution_range=resolution_range or (0, 0),
+        datasets=tuple(datasets),
+    )
+
+
+def _header_from_mtz_object(file_name):
     mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return mtz_obj.space_group()
+    datasets = [
+        MtzDataset(
+            project_name=crystal.project_name(),
+            crystal_name=crystal.name(),
+            dataset_name=dataset.name(),
+            i_dataset=dataset.i_dataset(),
+            cell=crystal.unit_cell().parameters(),
+            wavelength=dataset.wavelength(),
+        )
+        for crystal in mtz_obj.crystals()
+        for dataset in crystal.datasets()
+    ]
+    return MtzHeader(
+        n_reflections=mtz_obj.n_reflections(),
+        space_group_name=mtz_obj.space_group_name(),
+        symops=tuple(str(s) for s in mtz_obj.space_group().all_ops()),
+        column_labels=tuple(c.label() for c in mtz_obj.columns()),
+        column_types=tuple(c.type() for c in mtz_obj.columns()),
+        batches=tuple(batch.num() for batch in mtz_obj.batches()),
+        resolution_range=tuple(mtz_obj.max_min_resolution()),
+        datasets=tuple(datasets),
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_mtz_header(file_name, mtime_ns, size):
+    try:
+        return _header_from_records(_read_header_records(file_name))
+    except (ValueError, IndexError, ZeroDivisionError, struct.error) as e:
+        logger.debug("Reading full MTZ file %s: %s", file_name, e)
+        return _header_from_mtz_object(file_name)
+
+
+def mtz_header(file_name):
+    """Read the header of an MTZ file, without reading the reflection data.
+
+    The result is cached for the lifetime of the process, keyed on the file
+    path, modification time and size, so repeated queries on the same file
+    do not read it again."""
+    file_name = os.path.abspath(file_name)
+    st = os.stat(file_name)
+    return _cached_mtz_header(file_name, st.st_mtime_ns, st.st_size)
+
+
+def space_group_from_mtz(file_name):
+    return mtz_header(file_name).space_group()
 
 
 def space_group_name_from_mtz(file_name):
@@ -20,13 +202,11 @@ def space_group_number_from_mtz(file_name):
 
 
 def batches_from_mtz(file_name):
-    mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return [batch.num() for batch in mtz_obj.batches()]
+    return list(mtz_header(file_name).batches)
 
 
 def nref_from_mtz(file_name):
-    mtz_obj = iotbx.mtz.object(file_name=file_name)
-    return mtz_obj.n_reflections()
+    return mtz_header(file_name).n_reflections
 
 
 def reindex(hklin, hklout, change_of_basis_op, space_group=None):
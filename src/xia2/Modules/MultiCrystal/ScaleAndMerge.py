@@ -40,6 +40,8 @@ from xia2.Modules.Scaler.DialsScaler import (
 from xia2.Modules.SSX.util import run_in_directory
 from xia2.Wrappers.Dials.Cosym import DialsCosym
 from xia2.Wrappers.Dials.EstimateResolution import EstimateResolution
+from xia2.Wrappers.Dials.Functional import EstimateResolution as FunctionalResolution
+from xia2.Wrappers.Dials.Functional import Scale as FunctionalScale
 from xia2.Wrappers.Dials.Functional.ExportShelx import ExportShelx
 from xia2.Wrappers.Dials.Functional.Merge import Merge
 from xia2.Wrappers.Dials.Refine import Refine
@@ -132,6 +134,30 @@ scaling
               "reflections for minimisation. A value of 0.0 for the maximum"
               "indicates that no upper limit should be applied."
   }
+  warm_start
+    .short_caption = "Warm start"
+  {
+    enabled = False
+      .type = bool
+      .short_caption = "Warm start cluster scaling"
+      .help = "Start the scaling of each output cluster, and the rescaling of"
+              "the filtered data, from the scaling models of the all-data"
+              "scaling and run a short refinement from these, rather than a"
+              "full scaling."
+    max_iterations = 10
+      .type = int(value_min=1)
+      .expert_level = 2
+      .short_caption = "Maximum iterations"
+      .help = "The maximum number of refinement iterations in each cycle of"
+              "scaling when warm starting."
+  }
+  in_process = True
+    .type = bool
+    .expert_level = 3
+    .short_caption = "Scale within the xia2 process"
+    .help = "Run dials.scale and dials.estimate_resolution within the xia2"
+            "process, passing the data in memory, rather than writing the data"
+            "to disk for separate programs."
 }
 symmetry
   .short_caption = "Symmetry"
@@ -699,7 +725,12 @@ class MultiCrystalScale:
         logger.notice(banner("Rescaling with extra filtering"))  # type: ignore
         # Final round of scaling, this time filtering out any bad datasets
         params.unit_cell.refine = []
-        scaled = Scale(data_manager, params, filtering=True)
+        scaled = Scale(
+            data_manager,
+            params,
+            filtering=True,
+            warm_start=params.scaling.warm_start.enabled,
+        )
         scale_and_filter_results = scaled.scale_and_filter_results
         logger.info("Scale and filtering:\n%s", scale_and_filter_results)
 
@@ -802,7 +833,9 @@ class MultiCrystalScale:
         logger.info(cluster_data.cluster)
         output_name = f"{cluster_data.directory}_scaled"
         free_flags_in_full_set = True
-        scaled = Scale(data_manager, params)
+        scaled = Scale(
+            data_manager, params, warm_start=params.scaling.warm_start.enabled
+        )
 
         logger.info(
             f"Datasets merged for {cluster_data.directory}: {len(data_manager._experiments)}"
@@ -1246,6 +1279,10 @@ class MultiCrystalScale:
     def reindex(self) -> None:
         logger.debug("Running reindexing")
         logger.info("Re-indexing to reference")
+        if self._experiments_filename is None or self._reflections_filename is None:
+            self._experiments_filename, self._reflections_filename = (
+                self._scaled.export_files()
+            )
         reindex = Reindex()
         auto_logfiler(reindex)
         reindex.set_experiments_filename(self._experiments_filename)
@@ -1452,15 +1489,22 @@ class Scale:
         data_manager: DataManager,
         params: iotbx.phil.scope_extract,
         filtering: bool = False,
+        warm_start: bool = False,
     ):
         self._data_manager = data_manager
         self._params = params
         self._filtering = filtering
+        self._warm_start = warm_start
 
-        self._experiments_filename: str = "models.expt"
-        self._reflections_filename: str = "observations.refl"
+        self._experiments_filename: str | None = "models.expt"
+        self._reflections_filename: str | None = "observations.refl"
 
-        if not filtering:
+        if self._params.scaling.in_process:
+            # the data are passed to dials.scale in memory, and are only
+            # written out if needed by another program
+            self._experiments_filename = None
+            self._reflections_filename = None
+        elif not filtering:
             self._data_manager.export_experiments(self._experiments_filename)
             self._data_manager.export_reflections(self._reflections_filename)
         else:
@@ -1484,8 +1528,21 @@ class Scale:
             if self._params.rescale_after_resolution_cutoff:
                 self.scale(d_min=self.d_min, d_max=d_max)
 
+    def export_files(self) -> tuple[str, str]:
+        """Get the experiments and reflections files for the current data,
+        writing these if the data have so far only been held in memory."""
+        if self._experiments_filename is None or self._reflections_filename is None:
+            self._experiments_filename = self._data_manager.export_experiments(
+                "models.expt"
+            )
+            self._reflections_filename = self._data_manager.export_reflections(
+                "observations.refl"
+            )
+        return self._experiments_filename, self._reflections_filename
+
     def refine(self) -> None:
         # refine in correct bravais setting
+        self.export_files()
         self._experiments_filename, self._reflections_filename = self._dials_refine(
             self._experiments_filename, self._reflections_filename
         )
@@ -1498,6 +1555,7 @@ class Scale:
 
     def two_theta_refine(self) -> None:
         # two-theta refinement to get best estimate of unit cell
+        self.export_files()
         self._experiments_filename, misc_files = self._dials_two_theta_refine(
             self._experiments_filename,
             self._reflections_filename,
@@ -1569,10 +1627,6 @@ class Scale:
     def scale(self, d_min: float | None = None, d_max: float | None = None) -> None:
         logger.debug("Scaling with dials.scale")
         scaler = DialsScale()
-        auto_logfiler(scaler)
-        scaler.add_experiments_json(self._experiments_filename)
-        scaler.add_reflections_file(self._reflections_filename)
-
         scaler.set_anomalous(self._params.scaling.anomalous)
 
         # Let dials.scale use its auto model determination as the default
@@ -1618,6 +1672,18 @@ class Scale:
 
         scaler.set_full_matrix(False)
 
+        if self._warm_start:
+            # the scaling models from the all-data scaling are already close
+            # to the solution for any subset of the data, but new models need
+            # a full scaling
+            if all(
+                expt.scaling_model is not None
+                for expt in self._data_manager.experiments
+            ):
+                scaler.set_cycles(self._params.scaling.warm_start.max_iterations)
+            else:
+                logger.debug("Warm start: no scaling models for some datasets")
+
         scaler.set_outlier_rejection(self._params.scaling.outlier_rejection)
 
         if self._filtering:
@@ -1639,6 +1705,44 @@ class Scale:
                 self._params.filtering.deltacchalf.stdcutoff
             )
 
+        if self._params.scaling.in_process:
+            self._scale_in_process(scaler)
+        else:
+            self._scale_with_program(scaler)
+        self._params.resolution.labels = "IPR,SIGIPR"
+
+    def _scale_in_process(self, scaler) -> None:
+        functional_scaler = FunctionalScale.Scale()
+        functional_scaler.set_phil_parameters(scaler.get_phil_parameters())
+        # dials.scale updates the scaling models of the experiments in place,
+        # and these may be shared with other data managers, e.g. those of the
+        # other clusters, so scale a copy as if read from a file
+        (
+            self._data_manager.experiments,
+            self._data_manager.reflections,
+        ) = functional_scaler.run(
+            copy.deepcopy(self._data_manager.experiments),
+            self._data_manager.reflections,
+        )
+        # the scaled data are no longer those in any previously written files
+        self._experiments_filename = None
+        self._reflections_filename = None
+        if self._filtering:
+            self.scale_and_filter_results = (
+                functional_scaler.get_scale_and_filter_results()
+            )
+            MultiplexFileHandler.record_optional_file(
+                functional_scaler.get_scale_and_filter_filename()
+            )
+
+        MultiplexFileHandler.record_log_file(functional_scaler.get_log_file())
+        MultiplexFileHandler.record_log_file(functional_scaler.get_html())
+
+    def _scale_with_program(self, scaler) -> None:
+        auto_logfiler(scaler)
+        experiments_filename, reflections_filename = self.export_files()
+        scaler.add_experiments_json(experiments_filename)
+        scaler.add_reflections_file(reflections_filename)
         scaler.scale()
         self._experiments_filename = scaler.get_scaled_experiments()
         self._reflections_filename = scaler.get_scaled_reflections()
@@ -1648,7 +1752,6 @@ class Scale:
         self._data_manager.reflections = flex.reflection_table.from_file(
             self._reflections_filename
         )
-        self._params.resolution.labels = "IPR,SIGIPR"
         if self._filtering:
             self.scale_and_filter_results = scaler.get_scale_and_filter_results()
             MultiplexFileHandler.record_optional_file(scaler._scale_and_filter_filename)
@@ -1664,12 +1767,15 @@ class Scale:
     def estimate_resolution_limit(self) -> tuple[float, str]:
         # see also xia2/Modules/Scaler/CommonScaler.py: CommonScaler._estimate_resolution_limit()
         params = self._params.resolution
-        m = EstimateResolution()
-        auto_logfiler(m)
-        # use the scaled .refl and .expt file
-        assert self._experiments_filename and self._reflections_filename
-        m.set_reflections(self._reflections_filename)
-        m.set_experiments(self._experiments_filename)
+        if self._params.scaling.in_process:
+            m = FunctionalResolution.EstimateResolution()
+        else:
+            m = EstimateResolution()
+            auto_logfiler(m)
+            # use the scaled .refl and .expt file
+            assert self._experiments_filename and self._reflections_filename
+            m.set_reflections(self._reflections_filename)
+            m.set_experiments(self._experiments_filename)
         m.set_limit_rmerge(params.rmerge)
         m.set_limit_completeness(params.completeness)
         m.set_limit_cc_half(params.cc_half)
@@ -1681,14 +1787,19 @@ class Scale:
         # if batch_range is not None:
         # start, end = batch_range
         # m.set_batch_range(start, end)
-        m.run()
-
-        MultiplexFileHandler.record_temp_file("dials.estimate_resolution.log")
-        MultiplexFileHandler.record_optional_file(m.get_json())
-        MultiplexFileHandler.record_log_file(
-            f"{m.get_xpid()}_dials.estimate_resolution.log"
-        )
-        MultiplexFileHandler.record_log_file(m.get_html())
+        if self._params.scaling.in_process:
+            m.run(self._data_manager.experiments, self._data_manager.reflections)
+            MultiplexFileHandler.record_optional_file(m.get_json())
+            MultiplexFileHandler.record_log_file(m.get_log_file())
+            MultiplexFileHandler.record_log_file(m.get_html())
+        else:
+            m.run()
+            MultiplexFileHandler.record_temp_file("dials.estimate_resolution.log")
+            MultiplexFileHandler.record_optional_file(m.get_json())
+            MultiplexFileHandler.record_log_file(
+                f"{m.get_xpid()}_dials.estimate_resolution.log"
+            )
+            MultiplexFileHandler.record_log_file(m.get_html())
 
         resolution_limits = []
         reasoning = []
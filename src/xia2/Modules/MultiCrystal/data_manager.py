@@ -4,6 +4,7 @@ import copy
 import logging
 import math
 
+import numpy as np
 from cctbx import miller, sgtbx
 from dials.array_family import flex
 from dials.command_line import export
@@ -95,6 +96,33 @@ class DataManager:
         self.reflections.reset_ids()
         self.reflections.assert_experiment_identifiers_are_consistent(self.experiments)
 
+    def reflections_per_experiment(self) -> list[flex.reflection_table]:
+        """Split the reflections into one table per experiment, in experiment
+        order, each with the single experiment id reset to 0.
+
+        The reflections are grouped with a single stable sort on id, rather
+        than a select_on_experiment_identifiers() call per experiment which
+        would scan the full table once for every experiment."""
+        identifiers_to_ids = {
+            v: k for k, v in dict(self._reflections.experiment_identifiers()).items()
+        }
+        perm = flex.sort_permutation(self._reflections["id"], stable=True)
+        reflections = self._reflections.select(perm)
+        # clear the identifier map so that it is not copied to every slice
+        for k in list(reflections.experiment_identifiers().keys()):
+            del reflections.experiment_identifiers()[k]
+        sorted_ids = reflections["id"].as_numpy_array()
+
+        per_experiment = []
+        for expt in self._experiments:
+            id_ = identifiers_to_ids[expt.identifier]
+            start, end = np.searchsorted(sorted_ids, [id_, id_ + 1])
+            selected = reflections[int(start) : int(end)]
+            selected["id"] = flex.int(selected.size(), 0)
+            selected.experiment_identifiers()[0] = expt.identifier
+            per_experiment.append(selected)
+        return per_experiment
+
     def select_and_create(self, experiment_identifiers: list[str]) -> DataManager:
         batch_offset_list = [
             i
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import copy
 import json
 import logging
 from collections import OrderedDict
@@ -133,27 +132,13 @@ class MultiCrystalAnalysis:
         return clustering
 
     def cluster_analysis(self) -> None:
-        reflections = []
-        identifiers = []
-        filtered_ids_to_identifiers_map = copy.deepcopy(
-            self._data_manager.ids_to_identifiers_map
-        )
-
-        for i in self._data_manager.experiments:
-            selected = self._data_manager.reflections.select_on_experiment_identifiers(
-                [i.identifier]
-            )
-            selected.reset_ids()
-            reflections.append(selected)
-            identifiers.append(i.identifier)
-
-        to_delete = []
-        for i in filtered_ids_to_identifiers_map:
-            if filtered_ids_to_identifiers_map[i] not in identifiers:
-                to_delete.append(i)
-
-        for i in to_delete:
-            filtered_ids_to_identifiers_map.pop(i)
+        reflections = self._data_manager.reflections_per_experiment()
+        identifiers = {expt.identifier for expt in self._data_manager.experiments}
+        filtered_ids_to_identifiers_map = {
+            k: v
+            for k, v in self._data_manager.ids_to_identifiers_map.items()
+            if v in identifiers
+        }
 
         intensity_clustering = DialsCorrelationMatrix()
         intensity_clustering.ids_to_identifiers_map = filtered_ids_to_identifiers_map
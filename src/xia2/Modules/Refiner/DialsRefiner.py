@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures
 import os
 
 from dials.algorithms.refinement.restraints.restraints_parameterisation import (
@@ -20,10 +21,41 @@ from xia2.Wrappers.Dials.Report import Report as _Report
 from xia2.Wrappers.Dials.SplitExperiments import SplitExperiments
 
 
+class _Refinement:
+    """The state of the refinement of the sweep of a refiner from the
+    results of one of its indexers."""
+
+    def __init__(
+        self,
+        refiner,
+        indexer,
+        experiments_filename,
+        reflections_filename,
+        scan_static,
+        scan_varying,
+        min_oscillation_range,
+    ):
+        self.refiner = refiner
+        self.indexer = indexer
+        self.experiments_filename = experiments_filename
+        self.reflections_filename = reflections_filename
+        self.scan_static = scan_static
+        self.scan_varying = scan_varying
+        self.min_oscillation_range = min_oscillation_range
+        self.log_file = None
+        self.done = False
+        self.failed = False
+
+
 class DialsRefiner(Refiner):
     def __init__(self):
         super().__init__()
 
+        # refinements of the sweep of this refiner already run alongside
+        # those of another sweep indexed with it, keyed by the indexing
+        # results they were refined from
+        self._prefetched_refinements = {}
+
     # factory functions
 
     def CombineExperiments(self):
@@ -113,119 +145,229 @@ class DialsRefiner(Refiner):
         pass
 
     def _refine(self):
-        for idxr in set(self._refinr_indexers.values()):
-            experiments = idxr.get_indexer_experiment_list()
-
-            indexed_experiments = idxr.get_indexer_payload("experiments_filename")
-            indexed_reflections = idxr.get_indexer_payload("indexed_filename")
-
-            # If multiple sweeps but not doing joint refinement, get only the
-            # relevant reflections.
-            multi_sweep = PhilIndex.params.xia2.settings.multi_sweep_refinement
-            if len(experiments) > 1 and not multi_sweep:
-                xsweeps = idxr._indxr_sweeps
-                assert len(xsweeps) == len(experiments)
-                # Don't do joint refinement
-                assert len(self._refinr_sweeps) == 1
-                xsweep = self._refinr_sweeps[0]
-                i = xsweeps.index(xsweep)
-                experiments = experiments[i : i + 1]
-
-                # Extract and output experiment and reflections for current sweep
-                indexed_experiments = os.path.join(
-                    self.get_working_directory(), "%s_indexed.expt" % xsweep.get_name()
-                )
-                indexed_reflections = os.path.join(
-                    self.get_working_directory(), "%s_indexed.refl" % xsweep.get_name()
-                )
+        # refine the sweeps of each indexer - unless already refined alongside
+        # another sweep indexed with them - and those of the other sweeps
+        # indexed with them, which would otherwise be refined one after
+        # another as each is integrated
+        refinements = []
+        for idxr in self._get_refiner_indexers():
+            key = self._refinement_key(idxr)
+            refinement = self._prefetched_refinements.pop(key, None)
+            refinements.append(refinement or self._prepare_refinement(idxr))
+        others = self._prepare_other_refinements()
+
+        self._run_refinements(refinements, others)
+
+        for refinement in others:
+            if not refinement.failed:
+                refiner = refinement.refiner
+                key = refiner._refinement_key(refinement.indexer)
+                refiner._prefetched_refinements[key] = refinement
+
+        for refinement in refinements:
+            self._finish_refinement(refinement)
+
+    def _get_refiner_indexers(self):
+        """The distinct indexers of this refiner, in order of epoch."""
+        indexers = []
+        for epoch in sorted(self._refinr_indexers):
+            idxr = self._refinr_indexers[epoch]
+            if idxr not in indexers:
+                indexers.append(idxr)
+        return indexers
+
+    @staticmethod
+    def _refinement_key(idxr):
+        return (
+            idxr.get_indexer_payload("experiments_filename"),
+            idxr.get_indexer_payload("indexed_filename"),
+        )
 
-                experiments.as_file(indexed_experiments)
+    def _split_refinement(self, idxr):
+        """Whether idxr indexed several sweeps which are to be refined
+        separately."""
+        experiments = idxr.get_indexer_experiment_list()
+        multi_sweep = PhilIndex.params.xia2.settings.multi_sweep_refinement
+        return len(experiments) > 1 and not multi_sweep
+
+    def _prepare_refinement(self, idxr):
+        experiments = idxr.get_indexer_experiment_list()
+
+        indexed_experiments = idxr.get_indexer_payload("experiments_filename")
+        indexed_reflections = idxr.get_indexer_payload("indexed_filename")
+
+        # If multiple sweeps but not doing joint refinement, get only the
+        # relevant reflections.
+        if self._split_refinement(idxr):
+            xsweeps = idxr._indxr_sweeps
+            assert len(xsweeps) == len(experiments)
+            # Don't do joint refinement
+            assert len(self._refinr_sweeps) == 1
+            xsweep = self._refinr_sweeps[0]
+            i = xsweeps.index(xsweep)
+            experiments = experiments[i : i + 1]
+
+            # Extract and output experiment and reflections for current sweep
+            indexed_experiments = os.path.join(
+                self.get_working_directory(), "%s_indexed.expt" % xsweep.get_name()
+            )
+            indexed_reflections = os.path.join(
+                self.get_working_directory(), "%s_indexed.refl" % xsweep.get_name()
+            )
 
-                reflections = flex.reflection_table.from_file(
-                    idxr.get_indexer_payload("indexed_filename")
-                )
-                sel = reflections["id"] == i
-                assert sel.count(True) > 0
-                imageset_id = reflections["imageset_id"].select(sel)
-                assert imageset_id.all_eq(imageset_id[0])
-                sel = reflections["imageset_id"] == imageset_id[0]
-                reflections = reflections.select(sel)
-                # set indexed reflections to id == 0 and imageset_id == 0
-                reflections["id"].set_selected(reflections["id"] == i, 0)
-                reflections["imageset_id"] = flex.int(len(reflections), 0)
-                reflections.as_file(indexed_reflections)
-
-            # currently only handle one lattice/refiner
-            assert len(experiments.crystals()) == 1
-
-            scan_static = PhilIndex.params.dials.refine.scan_static
-
-            # Avoid doing scan-varying refinement on narrow wedges.
-            scan_oscillation_ranges = []
-            for experiment in experiments:
-                start, end = experiment.scan.get_oscillation_range()
-                scan_oscillation_ranges.append(end - start)
-
-            min_oscillation_range = min(scan_oscillation_ranges)
-
-            if (
-                PhilIndex.params.dials.refine.scan_varying
-                and min_oscillation_range > 5
-                and not PhilIndex.params.dials.fast_mode
-            ):
-                scan_varying = PhilIndex.params.dials.refine.scan_varying
-            else:
-                scan_varying = False
-
-            if scan_static:
-                refiner = self.Refine()
-                refiner.set_experiments_filename(indexed_experiments)
-                refiner.set_indexed_filename(indexed_reflections)
-                refiner.set_scan_varying(False)
-                refiner.run()
-                self._refinr_experiments_filename = (
-                    refiner.get_refined_experiments_filename()
+            experiments.as_file(indexed_experiments)
+
+            reflections = flex.reflection_table.from_file(
+                idxr.get_indexer_payload("indexed_filename")
+            )
+            sel = reflections["id"] == i
+            assert sel.count(True) > 0
+            imageset_id = reflections["imageset_id"].select(sel)
+            assert imageset_id.all_eq(imageset_id[0])
+            sel = reflections["imageset_id"] == imageset_id[0]
+            reflections = reflections.select(sel)
+            # set indexed reflections to id == 0 and imageset_id == 0
+            reflections["id"].set_selected(reflections["id"] == i, 0)
+            reflections["imageset_id"] = flex.int(len(reflections), 0)
+            reflections.as_file(indexed_reflections)
+
+        # currently only handle one lattice/refiner
+        assert len(experiments.crystals()) == 1
+
+        scan_static = PhilIndex.params.dials.refine.scan_static
+
+        # Avoid doing scan-varying refinement on narrow wedges.
+        scan_oscillation_ranges = []
+        for experiment in experiments:
+            start, end = experiment.scan.get_oscillation_range()
+            scan_oscillation_ranges.append(end - start)
+
+        min_oscillation_range = min(scan_oscillation_ranges)
+
+        if (
+            PhilIndex.params.dials.refine.scan_varying
+            and min_oscillation_range > 5
+            and not PhilIndex.params.dials.fast_mode
+        ):
+            scan_varying = PhilIndex.params.dials.refine.scan_varying
+        else:
+            scan_varying = False
+
+        return _Refinement(
+            self,
+            idxr,
+            indexed_experiments,
+            indexed_reflections,
+            scan_static,
+            scan_varying,
+            min_oscillation_range,
+        )
+
+    def _prepare_other_refinements(self):
+        """The refinements of the other sweeps indexed with the sweep of this
+        refiner, when each is refined separately and there are processors to
+        spare to refine them alongside it."""
+        if PhilIndex.params.xia2.settings.multiprocessing.nproc <= 1:
+            return []
+
+        refinements = []
+        for idxr in self._get_refiner_indexers():
+            if not self._split_refinement(idxr):
+                continue
+            key = self._refinement_key(idxr)
+            for xsweep in idxr._indxr_sweeps:
+                if xsweep in self._refinr_sweeps:
+                    continue
+                refiner = xsweep._get_refiner()
+                if (
+                    isinstance(refiner, DialsRefiner)
+                    and not refiner.get_refiner_done()
+                    and idxr in refiner._refinr_indexers.values()
+                    and key not in refiner._prefetched_refinements
+                ):
+                    refinements.append(refiner._prepare_refinement(idxr))
+        return refinements
+
+    def _run_refinements(self, refinements, others):
+        """Run the scan-static then scan-varying refinements, at most nproc
+        at a time. An error in one of the refinements of this refiner is
+        raised, while other refinements which fail are simply left to be
+        run again when their own refiner is used."""
+        nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+
+        for scan_varying in (False, True):
+            pending = [
+                refinement
+                for refinement in refinements + others
+                if not (refinement.done or refinement.failed)
+                and (
+                    refinement.scan_varying if scan_varying else refinement.scan_static
                 )
-                self._refinr_indexed_filename = refiner.get_refined_filename()
-            else:
-                self._refinr_experiments_filename = indexed_experiments
-                self._refinr_indexed_filename = indexed_reflections
-
-            if scan_varying:
-                refiner = self.Refine()
-                refiner.set_experiments_filename(self._refinr_experiments_filename)
-                refiner.set_indexed_filename(self._refinr_indexed_filename)
-                if min_oscillation_range < 36:
-                    refiner.set_interval_width_degrees(min_oscillation_range / 2)
-                refiner.run()
-                self._refinr_experiments_filename = (
+            ]
+            if not pending:
+                continue
+
+            wrappers = []
+            for refinement in pending:
+                refiner = refinement.refiner.Refine()
+                refiner.set_experiments_filename(refinement.experiments_filename)
+                refiner.set_indexed_filename(refinement.reflections_filename)
+                if not scan_varying:
+                    refiner.set_scan_varying(False)
+                elif refinement.min_oscillation_range < 36:
+                    refiner.set_interval_width_degrees(
+                        refinement.min_oscillation_range / 2
+                    )
+                wrappers.append(refiner)
+
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(nproc, len(wrappers)))
+            ) as pool:
+                futures = [pool.submit(refiner.run) for refiner in wrappers]
+
+            for refinement, refiner, future in zip(pending, wrappers, futures):
+                if future.exception() is not None:
+                    if refinement in refinements:
+                        raise future.exception()
+                    refinement.failed = True
+                    continue
+                refinement.experiments_filename = (
                     refiner.get_refined_experiments_filename()
                 )
-                self._refinr_indexed_filename = refiner.get_refined_filename()
+                refinement.reflections_filename = refiner.get_refined_filename()
+                refinement.log_file = refiner.get_log_file()
 
-            if scan_static or scan_varying:
-                FileHandler.record_log_file(
-                    "%s REFINE" % idxr.get_indexer_full_name(), refiner.get_log_file()
-                )
-                report = self.Report()
-                report.set_experiments_filename(self._refinr_experiments_filename)
-                report.set_reflections_filename(self._refinr_indexed_filename)
-                html_filename = os.path.join(
-                    self.get_working_directory(),
-                    "%i_dials.refine.report.html" % report.get_xpid(),
-                )
-                report.set_html_filename(html_filename)
-                report.run()
-                FileHandler.record_html_file(
-                    "%s REFINE" % idxr.get_indexer_full_name(), html_filename
-                )
+        for refinement in refinements + others:
+            refinement.done = True
+
+    def _finish_refinement(self, refinement):
+        idxr = refinement.indexer
+        self._refinr_experiments_filename = refinement.experiments_filename
+        self._refinr_indexed_filename = refinement.reflections_filename
+
+        if refinement.log_file:
+            FileHandler.record_log_file(
+                "%s REFINE" % idxr.get_indexer_full_name(), refinement.log_file
+            )
+            report = self.Report()
+            report.set_experiments_filename(self._refinr_experiments_filename)
+            report.set_reflections_filename(self._refinr_indexed_filename)
+            html_filename = os.path.join(
+                self.get_working_directory(),
+                "%i_dials.refine.report.html" % report.get_xpid(),
+            )
+            report.set_html_filename(html_filename)
+            report.run()
+            FileHandler.record_html_file(
+                "%s REFINE" % idxr.get_indexer_full_name(), html_filename
+            )
 
-            experiments = ExperimentList.from_file(self._refinr_experiments_filename)
-            self.set_refiner_payload("models.expt", self._refinr_experiments_filename)
-            self.set_refiner_payload("observations.refl", self._refinr_indexed_filename)
+        experiments = ExperimentList.from_file(self._refinr_experiments_filename)
+        self.set_refiner_payload("models.expt", self._refinr_experiments_filename)
+        self.set_refiner_payload("observations.refl", self._refinr_indexed_filename)
 
-            # this is the result of the cell refinement
-            self._refinr_cell = experiments.crystals()[0].get_unit_cell().parameters()
+        # this is the result of the cell refinement
+        self._refinr_cell = experiments.crystals()[0].get_unit_cell().parameters()
 
     def _refine_finish(self):
         # For multiple-sweep joint refinement, because integraters are fairly rigidly
@@ -29,7 +29,11 @@ from mmtbx.scaling.xtriage import xtriage_analyses
 
 import xia2.Handlers.Environment
 import xia2.Handlers.Files
-from xia2.cli.plot_multiplicity import master_phil, plot_multiplicity
+from xia2.cli.plot_multiplicity import (
+    MultiplicityVolume,
+    master_phil,
+    plot_multiplicity,
+)
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Modules.Analysis import batch_phil_scope, phil_scope, separate_unmerged
 
@@ -144,6 +148,8 @@ class Report:
         mult_img_files = {}
 
         rd = dest_path or self.report_dir or "."
+        # merge and expand to P1 once for all of the slices
+        volume = MultiplicityVolume(self.intensities)
 
         for settings.slice_axis in ("h", "k", "l"):
             settings.plot.filename = os.path.join(
@@ -157,7 +163,7 @@ class Report:
                 % (settings.slice_axis, settings.slice_index),
             )
             # settings.slice_axis = axis
-            plot_multiplicity(self.intensities, settings)
+            plot_multiplicity(self.intensities, settings, volume=volume)
             mult_json_files[settings.slice_axis] = settings.json.filename
             with open(settings.plot.filename, "rb") as fh:
                 data = codecs.encode(fh.read(), encoding="base64").decode("ascii")
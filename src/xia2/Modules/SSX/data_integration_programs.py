@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import concurrent.futures
 import copy
 import errno
 import json
 import logging
 import os
+import random
 from dataclasses import dataclass
 from functools import reduce
 from io import StringIO
@@ -42,7 +44,10 @@ from dxtbx.serialize import load
 from xia2.Driver.timing import record_step
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Streams import banner
-from xia2.Modules.SSX.reporting import indexing_summary_output
+from xia2.Modules.SSX.reporting import (
+    condensed_unit_cell_info,
+    indexing_summary_output,
+)
 from xia2.Modules.SSX.util import log_to_file, run_in_directory
 
 xia2_logger = logging.getLogger(__name__)
@@ -237,8 +242,87 @@ def ssx_find_spots(
     return reflections
 
 
+def _large_cluster_ratios(large: Cluster) -> tuple[float, float]:
+    mean_cell_std = (large.cell_std[0] + large.cell_std[1] + large.cell_std[2]) / 3.0
+    mean_cell_length = (
+        large.median_cell[0] + large.median_cell[1] + large.median_cell[2]
+    ) / 3.0
+    length_ratio = mean_cell_std / mean_cell_length
+    mean_angle_std = (large.cell_std[3] + large.cell_std[4] + large.cell_std[5]) / 3.0
+    mean_angle = (
+        large.median_cell[3] + large.median_cell[4] + large.median_cell[5]
+    ) / 3.0
+    angle_ratio = mean_angle_std / mean_angle
+    return length_ratio, angle_ratio
+
+
+# Below this number of crystals, clustering is quicker than starting worker
+# processes, so the threshold search is always serial.
+PARALLEL_CLUSTERING_MIN_CRYSTALS = 1000
+
+
+def _auto_threshold_clusters(
+    crystal_symmetries: list[crystal.symmetry], nproc: int = 1
+) -> tuple[dict, list[Cluster]]:
+    """Decrease the clustering threshold until the largest cluster is tight.
+
+    Starting at a threshold of 5000, the threshold is halved until the relative
+    spread of the cell lengths or angles of the largest cluster is below 5%,
+    or the threshold would fall below 100. If no large clusters are found at a
+    threshold, the result at double that threshold is used.
+
+    With nproc > 1 and at least PARALLEL_CLUSTERING_MIN_CRYSTALS crystals, the
+    clusterings at all thresholds in the sequence are calculated concurrently,
+    then the sequence is walked in order, which gives the same result as the
+    serial search.
+    """
+    thresholds = [5000.0]
+    while thresholds[-1] / 2.0 > 100:
+        thresholds.append(thresholds[-1] / 2.0)
+
+    if nproc > 1 and len(crystal_symmetries) >= PARALLEL_CLUSTERING_MIN_CRYSTALS:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(nproc, len(thresholds))
+        ) as pool:
+            futures = [
+                pool.submit(
+                    report_on_crystal_clusters, crystal_symmetries, True, threshold=t
+                )
+                for t in thresholds
+            ]
+        results = {t: f.result() for t, f in zip(thresholds, futures)}
+    else:
+        results = {}
+
+    def result_at(threshold):
+        if threshold not in results:
+            results[threshold] = report_on_crystal_clusters(
+                crystal_symmetries, True, threshold=threshold
+            )
+        return results[threshold]
+
+    for threshold in thresholds:
+        cluster_plots, large_clusters = result_at(threshold)
+        if not large_clusters:
+            return result_at(threshold * 2.0)
+        length_ratio, angle_ratio = _large_cluster_ratios(large_clusters[0])
+        if not (length_ratio > 0.05 and angle_ratio > 0.05):
+            break
+    return cluster_plots, large_clusters
+
+
+def clusters_from_crystal_symmetries(
+    crystal_symmetries: list[crystal.symmetry],
+    threshold: float | str = 5000,
+    nproc: int = 1,
+) -> tuple[dict, list[Cluster]]:
+    if threshold == "auto":
+        return _auto_threshold_clusters(crystal_symmetries, nproc)
+    return report_on_crystal_clusters(crystal_symmetries, True, threshold=threshold)
+
+
 def clusters_from_experiments(
-    experiments: ExperimentList, threshold: float | str = 5000
+    experiments: ExperimentList, threshold: float | str = 5000, nproc: int = 1
 ) -> tuple[dict, list[Cluster]]:
     crystal_symmetries = [
         crystal.symmetry(
@@ -247,43 +331,92 @@ def clusters_from_experiments(
         )
         for expt in experiments
     ]
-
-    if threshold == "auto":
-        threshold = 5000
-        length_ratio = 1
-        angle_ratio = 1
-        while length_ratio > 0.05 and threshold > 100 and angle_ratio > 0.05:
-            cluster_plots, large_clusters = report_on_crystal_clusters(
-                crystal_symmetries, True, threshold=threshold
+    return clusters_from_crystal_symmetries(crystal_symmetries, threshold, nproc)
+
+
+class IncrementalUnitCellClustering:
+    """
+    Accumulate the crystals from processed batches, to give unit cell
+    clustering results that can be kept up to date as each batch finishes.
+
+    The cost of hierarchical clustering grows quadratically with the number of
+    crystals, so for live reports the clustering is calculated on a uniform
+    random sample (reservoir) of at most max_crystals crystals, which is
+    small enough to cluster in-process. The sample only differs from all
+    crystals when more than that are indexed (i.e. with a large n_crystals);
+    the exact clustering over all crystals is only calculated on request.
+    Results are cached until new crystals are added.
+    """
+
+    def __init__(
+        self,
+        threshold: float | str = 5000,
+        max_crystals: int = PARALLEL_CLUSTERING_MIN_CRYSTALS,
+        nproc: int = 1,
+        seed: int = 0,
+    ):
+        self.threshold = threshold
+        self.max_crystals = max_crystals
+        self.nproc = nproc
+        self._all_symmetries: list[crystal.symmetry] = []
+        self._reservoir: list[crystal.symmetry] = []
+        self._random = random.Random(seed)
+        # cached results, keyed by whether all crystals were included
+        self._cache: dict[bool, tuple[int, tuple[dict, list[Cluster]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._all_symmetries)
+
+    @property
+    def is_sampled(self) -> bool:
+        return len(self) > len(self._reservoir)
+
+    def add_experiments(self, experiments: ExperimentList) -> None:
+        for expt in experiments:
+            symmetry = crystal.symmetry(
+                unit_cell=expt.crystal.get_unit_cell(),
+                space_group=expt.crystal.get_space_group(),
             )
-            if not large_clusters:
-                threshold *= 2.0
-                cluster_plots, large_clusters = report_on_crystal_clusters(
-                    crystal_symmetries, True, threshold=threshold
-                )
-                break
-            large = large_clusters[0]
-            mean_cell_std = (
-                large.cell_std[0] + large.cell_std[1] + large.cell_std[2]
-            ) / 3.0
-            mean_cell_length = (
-                large.median_cell[0] + large.median_cell[1] + large.median_cell[2]
-            ) / 3.0
-            length_ratio = mean_cell_std / mean_cell_length
-            mean_angle_std = (
-                large.cell_std[3] + large.cell_std[4] + large.cell_std[5]
-            ) / 3.0
-            mean_angle = (
-                large.median_cell[3] + large.median_cell[4] + large.median_cell[5]
-            ) / 3.0
-            angle_ratio = mean_angle_std / mean_angle
-            threshold /= 2.0
-    else:
-        cluster_plots, large_clusters = report_on_crystal_clusters(
-            crystal_symmetries, True, threshold=threshold
-        )
+            self._all_symmetries.append(symmetry)
+            if len(self._reservoir) < self.max_crystals:
+                self._reservoir.append(symmetry)
+            else:
+                j = self._random.randrange(len(self))
+                if j < self.max_crystals:
+                    self._reservoir[j] = symmetry
 
-    return cluster_plots, large_clusters
+    def clusters(self, exact: bool = False) -> tuple[dict, list[Cluster]]:
+        """Get the cluster plots and large clusters.
+
+        If exact is False, the clustering may be based on a sample of the
+        crystals, see is_sampled.
+        """
+        if not self._all_symmetries:
+            return {}, []
+        all_crystals = exact or not self.is_sampled
+        cached = self._cache.get(all_crystals)
+        if cached and cached[0] == len(self):
+            return cached[1]
+        symmetries = self._all_symmetries if all_crystals else self._reservoir
+        # the sample is always clustered in-process
+        result = clusters_from_crystal_symmetries(
+            symmetries, self.threshold, self.nproc if all_crystals else 1
+        )
+        self._cache[all_crystals] = (len(self), result)
+        return result
+
+    def condensed_info(self) -> str:
+        """A condensed summary of the (possibly sampled) clustering for logging."""
+        _, large_clusters = self.clusters()
+        if not large_clusters:
+            return ""
+        info = condensed_unit_cell_info(large_clusters)
+        if self.is_sampled:
+            info += (
+                f"\n(Estimated from a random sample of {len(self._reservoir)}"
+                f" of {len(self)} crystals)"
+            )
+        return info
 
 
 def ssx_index(
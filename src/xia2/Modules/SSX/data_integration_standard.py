@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import contextlib
 import functools
 import json
 import logging
@@ -27,6 +28,7 @@ from xia2.Driver.timing import record_step
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Streams import banner
 from xia2.Modules.SSX.data_integration_programs import (
+    IncrementalUnitCellClustering,
     IndexingParams,
     IntegrationParams,
     RefinementParams,
@@ -38,6 +40,7 @@ from xia2.Modules.SSX.data_integration_programs import (
     ssx_index,
     ssx_integrate,
 )
+from xia2.Modules.SSX.prefetch import ImagePrefetcher
 from xia2.Modules.SSX.reporting import (
     condensed_metric_unit_cell_info,
     condensed_unit_cell_info,
@@ -79,6 +82,7 @@ class AlgorithmParams:
     steps: list[str] = field(default_factory=list)
     nproc: int = 1
     njobs: int = 1
+    prefetch_batches: int = 0
     multiprocessing_method: str = "multiprocessing"
     enable_live_reporting: bool = False
     parsed_grouping: ParsedYAML | None = None
@@ -529,6 +533,7 @@ def cumulative_assess_crystal_parameters(
     n_xtal = 0
     first_image = 0
     all_expts = ExperimentList()
+    clustering = IncrementalUnitCellClustering(threshold="auto", nproc=options.nproc)
     progress_reporter = ProgressReport({"images_per_batch": {}})
     count = 0
 
@@ -583,13 +588,10 @@ def cumulative_assess_crystal_parameters(
                 all_expts.extend(expts)
         progress_reporter.add_index_result(data)
 
-        if all_expts:
-            # generate up-to-date cluster plots and lists
-            cluster_plots, large_clusters = clusters_from_experiments(
-                all_expts, threshold="auto"
-            )
-            if large_clusters:
-                cell_clustering = f"{condensed_unit_cell_info(large_clusters)}"
+        if expts:
+            # update the cluster summary for the progress report
+            clustering.add_experiments(expts)
+            if cell_clustering := clustering.condensed_info():
                 progress_reporter.add_latest_clustering(cell_clustering)
 
         first_image += options.batch_size
@@ -597,6 +599,8 @@ def cumulative_assess_crystal_parameters(
 
     if all_expts:
         all_expts.as_file(working_directory / "indexed_all.expt")
+        # the final clustering determines the crystal parameters, so must be exact
+        cluster_plots, large_clusters = clustering.clusters(exact=True)
 
     if cluster_plots:
         generate_html_report(
@@ -732,6 +736,7 @@ def cumulative_determine_reference_geometry(
     first_image = 0
     all_expts = ExperimentList()
     all_tables = []
+    clustering = IncrementalUnitCellClustering(nproc=options.nproc)
     progress_reporter = ProgressReport({"images_per_batch": {}})
     count = 0
     while n_xtal < options.geometry_refinement_n_crystals:
@@ -784,17 +789,18 @@ def cumulative_determine_reference_geometry(
             if refl.size():
                 all_expts.extend(expts)
                 all_tables.append(refl)
+                clustering.add_experiments(expts)
         progress_reporter.add_index_result(data)
 
-        if all_expts:
-            cluster_plots, large_clusters = clusters_from_experiments(all_expts)
-            if large_clusters:
-                cell_clustering = f"{condensed_unit_cell_info(large_clusters)}"
-                progress_reporter.add_latest_clustering(cell_clustering)
+        if cell_clustering := clustering.condensed_info():
+            progress_reporter.add_latest_clustering(cell_clustering)
 
         first_image += options.batch_size
         progress_reporter.summarise()
 
+    if all_expts:
+        cluster_plots, _ = clustering.clusters(exact=True)
+
     if cluster_plots:
         generate_html_report(
             cluster_plots, working_directory / "dials.cell_clusters.html"
@@ -1002,33 +1008,59 @@ def process_batches(
             ):
                 FileHandler.record_more_data_file(tag, file)
 
-    if options.njobs > 1:
-        njobs = min(options.njobs, len(batch_directories))
-        xia2_logger.info(
-            f"Submitting processing in {len(batch_directories)} batches across {njobs} cores, each with nproc={options.nproc}."
-        )
-        libtbx.easy_mp.parallel_map(
-            func=ProcessBatch(
-                spotfinding_params, indexing_params, integration_params, options
-            ),
-            iterable=batch_directories,
-            qsub_command=f"qsub -pe smp {options.nproc}",
-            processes=njobs,
-            method=options.multiprocessing_method,
-            callback=process_output,
-            preserve_order=False,
-        )
-    else:
-        for batch_dir in batch_directories:
-            summary_data = process_batch(
-                batch_dir,
-                spotfinding_params,
-                indexing_params,
-                integration_params,
-                options,
-                progress,
+    njobs = min(options.njobs, len(batch_directories))
+    prefetcher = None
+    if options.prefetch_batches:
+        if options.njobs > 1 and options.multiprocessing_method != "multiprocessing":
+            xia2_logger.info(
+                f"Not prefetching images, as the batches are processed with "
+                f"method={options.multiprocessing_method}, not on this machine"
+            )
+        else:
+            prefetcher = ImagePrefetcher(
+                batch_directories, options.prefetch_batches, in_flight=max(njobs, 1)
             )
-            process_output(summary_data, add_all_to_progress=False)
+
+    with prefetcher or contextlib.nullcontext():
+        if options.njobs > 1:
+            xia2_logger.info(
+                f"Submitting processing in {len(batch_directories)} batches across {njobs} cores, each with nproc={options.nproc}."
+            )
+
+            def batch_done(summary_data):
+                if prefetcher:
+                    # the worker processes have all been forked by the time the
+                    # first batch is done, so the reader thread is not copied
+                    prefetcher.batch_done()
+                    prefetcher.start()
+                process_output(summary_data)
+
+            libtbx.easy_mp.parallel_map(
+                func=ProcessBatch(
+                    spotfinding_params, indexing_params, integration_params, options
+                ),
+                iterable=batch_directories,
+                qsub_command=f"qsub -pe smp {options.nproc}",
+                processes=njobs,
+                method=options.multiprocessing_method,
+                callback=batch_done,
+                preserve_order=False,
+            )
+        else:
+            if prefetcher:
+                prefetcher.start()
+            for batch_dir in batch_directories:
+                summary_data = process_batch(
+                    batch_dir,
+                    spotfinding_params,
+                    indexing_params,
+                    integration_params,
+                    options,
+                    progress,
+                )
+                if prefetcher:
+                    prefetcher.batch_done()
+                process_output(summary_data, add_all_to_progress=False)
 
 
 def check_for_gaps_in_steps(steps: list[str]) -> bool:
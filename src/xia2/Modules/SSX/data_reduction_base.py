@@ -30,6 +30,7 @@ from xia2.Modules.SSX.data_reduction_programs import (
     scale_reindex_single,
     split_integrated_data,
 )
+from xia2.Modules.SSX.reduction_pool import reduction_worker_pool, worker_pool
 from xia2.Modules.SSX.yml_handling import (
     apply_scaled_array_to_all_files,
     dose_series_repeat_to_groupings,
@@ -289,6 +290,11 @@ class BaseDataReduction:
         return cls(main_directory, new_data, reduction_params)
 
     def run(self) -> None:
+        # All parallel steps of the reduction share one pool of warm workers.
+        with reduction_worker_pool(self._reduction_params.nproc):
+            self._run()
+
+    def _run(self) -> None:
         if not self._integrated_data:
             xia2_logger.notice(banner("Merging"))  # type: ignore
             self._merge()
@@ -467,9 +473,7 @@ class BaseDataReduction:
         name_to_expts_arr: dict[str, tuple] = dict.fromkeys(merge_input.keys(), ())
 
         futures = {}
-        with concurrent.futures.ProcessPoolExecutor(
-            max_workers=self._reduction_params.nproc
-        ) as pool:
+        with worker_pool(self._reduction_params.nproc) as pool:
             for name, filelist in merge_input.items():
                 futures[pool.submit(prepare_scaled_array, filelist, best_unit_cell)] = (
                     name
@@ -483,9 +487,7 @@ class BaseDataReduction:
         resolution_limits = {}
         with (
             record_step("dials.merge (parallel)"),
-            concurrent.futures.ProcessPoolExecutor(
-                max_workers=self._reduction_params.nproc
-            ) as pool,
+            worker_pool(self._reduction_params.nproc) as pool,
         ):
             for name, (scaled_array, elist) in name_to_expts_arr.items():
                 future_list.append(
@@ -518,9 +520,7 @@ class BaseDataReduction:
             future_list = []
             with (
                 record_step("dials.merge (parallel)"),
-                concurrent.futures.ProcessPoolExecutor(
-                    max_workers=self._reduction_params.nproc
-                ) as pool,
+                worker_pool(self._reduction_params.nproc) as pool,
             ):
                 for name, (scaled_array, elist) in name_to_expts_arr.items():
                     if name in resolution_limits:
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import concurrent.futures
-import copy
+import contextlib
 import functools
 import json
 import logging
@@ -33,7 +33,7 @@ from dials.command_line.merge import phil_scope as merge_phil_scope
 from dials.command_line.scale import phil_scope as scaling_phil_scope
 from dials.util.export_mtz import log_summary
 from dials.util.resolution_analysis import resolution_cc_half
-from dxtbx.model import Crystal, ExperimentList
+from dxtbx.model import Crystal, CrystalFactory, ExperimentList
 from dxtbx.serialize import load
 from iotbx.phil import parse
 
@@ -42,6 +42,7 @@ from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
 from xia2.Modules.SSX.batch_cosym import BatchCosym
 from xia2.Modules.SSX.data_reduction_definitions import FilePair, ReductionParams
+from xia2.Modules.SSX.reduction_pool import worker_pool
 from xia2.Modules.SSX.reporting import condensed_unit_cell_info
 from xia2.Modules.SSX.util import log_to_file, run_in_directory
 
@@ -64,52 +65,103 @@ CrystalsDict = dict[str, CrystalsData]
 
 
 def mean_I_over_sigma(refls, expts, partiality_cutoff=0.25):
-    tables = refls.split_by_experiment_id()
-    assert len(tables) == len(expts)
-    mean_I_over_sigma_values = []
-    for table in tables:
-        sel = table.get_flags(table.flags.integrated_sum) & (
-            table["partiality"] > partiality_cutoff
+    """Calculate the mean I/sigma(I) of the integrated reflections per experiment.
+
+    The values for all experiments are accumulated in a single group-by pass
+    over the id column, rather than splitting the table per experiment.
+    """
+    n_expts = len(expts)
+    sel = refls.get_flags(refls.flags.integrated_sum) & (
+        refls["partiality"] > partiality_cutoff
+    )
+    sel = sel.as_numpy_array()
+    ids = refls["id"].as_numpy_array()
+    I = refls["intensity.sum.value"].as_numpy_array()
+    V = refls["intensity.sum.variance"].as_numpy_array()
+    sel &= V > 0
+    ids = ids[sel]
+    assert ids.size == 0 or (ids.min() >= 0 and ids.max() < n_expts)
+    i_over_sigma = I[sel] / np.sqrt(V[sel])
+    sums = np.bincount(ids, weights=i_over_sigma, minlength=n_expts)
+    counts = np.bincount(ids, minlength=n_expts)
+    means = np.zeros(n_expts)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means.tolist()
+
+
+def _inline_crystals(expts_dict: dict) -> tuple[list[str], list[Crystal]]:
+    # Parse the crystal models directly from the experiments json, avoiding
+    # the construction of the beam/detector/imageset models which are not
+    # needed for filtering. Only possible if the crystal models are inline.
+    identifiers = []
+    crystals = []
+    crystal_models: dict[int, Crystal] = {}
+    for expt in expts_dict.get("experiment", []):
+        identifiers.append(expt.get("identifier", ""))
+        idx = expt["crystal"]
+        if idx not in crystal_models:
+            model = expts_dict["crystal"][idx]
+            if not isinstance(model, dict):
+                raise TypeError(f"Crystal model {idx} is not inline")
+            crystal_models[idx] = CrystalFactory.from_dict(model)
+        crystals.append(crystal_models[idx])
+    return identifiers, crystals
+
+
+def _crystal_data_from_file_pair(
+    file_pair: FilePair,
+    calculate_meanIsigma: bool = False,
+    partiality_thresold: float = 0.25,
+) -> CrystalsData:
+    with open(file_pair.expt) as f:
+        expts_dict = json.load(f)
+    try:
+        identifiers, crystals = _inline_crystals(expts_dict)
+    except (KeyError, IndexError, TypeError):
+        # e.g. the crystal models are in separate files, or missing
+        new_expts = load.experiment_list(file_pair.expt, check_format=False)
+        identifiers = list(new_expts.identifiers())
+        crystals = list(new_expts.crystals())
+    if not identifiers:
+        return CrystalsData([], [])
+    if calculate_meanIsigma:
+        refls = flex.reflection_table.from_file(file_pair.refl)
+        mean_I_over_sigma_vals = mean_I_over_sigma(
+            refls, identifiers, partiality_thresold
         )
-        I = table["intensity.sum.value"].select(sel)
-        V = table["intensity.sum.variance"].select(sel)
-        if not V.all_gt(0):
-            sel2 = V > 0
-            I = I.select(sel2)
-            V = V.select(sel2)
-        if not I.size():
-            mean_I_over_sigma_values.append(0.0)
-        else:
-            mean_I_over_sigma_values.append(flex.mean(I / flex.sqrt(V)))
-    return mean_I_over_sigma_values
+    else:
+        mean_I_over_sigma_vals = [0.0] * len(identifiers)
+    return CrystalsData(
+        identifiers, crystals, mean_I_over_sigma_vals=mean_I_over_sigma_vals
+    )
 
 
 def load_crystal_data_from_new_expts(
     new_data: list[FilePair],
     calculate_meanIsigma: bool = False,
     partiality_thresold: float = 0.25,
+    nproc: int = 1,
 ) -> CrystalsDict:
     data: CrystalsDict = {}
     n = 0
-    for file_pair in new_data:
-        new_expts = load.experiment_list(file_pair.expt, check_format=False)
-        if new_expts:
-            if calculate_meanIsigma:
-                refls = flex.reflection_table.from_file(file_pair.refl)
-                mean_I_over_sigma_vals = mean_I_over_sigma(
-                    refls, new_expts, partiality_thresold
-                )
-            else:
-                mean_I_over_sigma_vals = [0.0] * len(new_expts)
-            data[str(file_pair.expt)] = CrystalsData(
-                copy.deepcopy(new_expts.identifiers()),
-                copy.deepcopy(new_expts.crystals()),
-                mean_I_over_sigma_vals=mean_I_over_sigma_vals,
+    with worker_pool(min(nproc, len(new_data))) as pool:
+        futures = [
+            pool.submit(
+                _crystal_data_from_file_pair,
+                file_pair,
+                calculate_meanIsigma,
+                partiality_thresold,
             )
-            n += len(new_expts)
+            for file_pair in new_data
+        ]
+    # Keep the input order, the crystals dict order is used for splitting later.
+    for file_pair, future in zip(new_data, futures):
+        crystals_data = future.result()
+        if crystals_data.identifiers:
+            n += len(crystals_data.identifiers)
         else:
             xia2_logger.warning(f"No crystals found in {str(file_pair.expt)}")
-            data[str(file_pair.expt)] = CrystalsData([], [])
+        data[str(file_pair.expt)] = crystals_data
     xia2_logger.info(f"Found {n} integrated crystals")
     return data
 
@@ -123,6 +175,7 @@ def filter_(
         integrated_data,
         calculate_meanIsigma=bool(reduction_params.mean_i_over_sigma_threshold),
         partiality_thresold=reduction_params.partiality_threshold,
+        nproc=reduction_params.nproc,
     )
     if not any(v.crystals for v in crystals_data.values()):
         raise ValueError(
@@ -694,9 +747,7 @@ def scale_parallel_batches(
     # xia2_logger.notice(banner("Scaling"))  # type: ignore
     with (
         record_step("dials.scale (parallel)"),
-        concurrent.futures.ProcessPoolExecutor(
-            max_workers=min(reduction_params.nproc, len(batches))
-        ) as pool,
+        worker_pool(min(reduction_params.nproc, len(batches))) as pool,
     ):
         scale_futures: dict[Any, int] = {
             pool.submit(
@@ -955,7 +1006,11 @@ def individual_cosym(
             random.seed(cosym_params.seed)
         cosym_instance = cosym(expts, tables, cosym_params)
         register_default_cosym_observers(cosym_instance)
-        cosym_instance.run()
+        with (
+            open(os.devnull, "w") as devnull,
+            contextlib.redirect_stdout(devnull),  # block printing from cosym
+        ):
+            cosym_instance.run()
         cosym_instance.experiments.as_file(cosym_params.output.experiments)
         joint_refls = flex.reflection_table.concat(cosym_instance.reflections)
         joint_refls.as_file(cosym_params.output.reflections)
@@ -1102,43 +1157,38 @@ def parallel_cosym(
 
     reindexed_results = [ProcessingBatch() for _ in range(len(data_to_reindex))]
 
-    with open(os.devnull, "w") as devnull:
-        sys.stdout = devnull  # block printing from cosym
-
-        with (
-            record_step("dials.cosym (parallel)"),
-            concurrent.futures.ProcessPoolExecutor(max_workers=nproc) as pool,
-        ):
-            cosym_futures: dict[Any, int] = {
-                pool.submit(
-                    individual_cosym,
-                    working_directory,
-                    batch,
-                    index,
-                    reduction_params,
-                ): index
-                for index, batch in enumerate(data_to_reindex)
-            }
-            for future in concurrent.futures.as_completed(cosym_futures):
-                idx = cosym_futures[future]
-                try:
-                    result = future.result()
-                except Exception as e:
-                    raise ValueError(
-                        f"Unsuccessful scaling and symmetry analysis of the new data. Error:\n{e}"
-                    )
-                else:
-                    reindexed_results[idx].add_filepair(
-                        FilePair(result.exptfile, result.reflfile)
-                    )
-                    FileHandler.record_log_file(
-                        result.logfile.name.rstrip(".log"), result.logfile
-                    )
-                    FileHandler.record_html_file(
-                        result.htmlfile.name.rstrip(".html"), result.htmlfile
-                    )
-
-    sys.stdout = sys.__stdout__  # restore printing
+    with (
+        record_step("dials.cosym (parallel)"),
+        worker_pool(nproc) as pool,
+    ):
+        cosym_futures: dict[Any, int] = {
+            pool.submit(
+                individual_cosym,
+                working_directory,
+                batch,
+                index,
+                reduction_params,
+            ): index
+            for index, batch in enumerate(data_to_reindex)
+        }
+        for future in concurrent.futures.as_completed(cosym_futures):
+            idx = cosym_futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                raise ValueError(
+                    f"Unsuccessful scaling and symmetry analysis of the new data. Error:\n{e}"
+                )
+            else:
+                reindexed_results[idx].add_filepair(
+                    FilePair(result.exptfile, result.reflfile)
+                )
+                FileHandler.record_log_file(
+                    result.logfile.name.rstrip(".log"), result.logfile
+                )
+                FileHandler.record_html_file(
+                    result.htmlfile.name.rstrip(".html"), result.htmlfile
+                )
     return reindexed_results
 
 
@@ -17,6 +17,7 @@ from xia2.Modules.SSX.data_reduction_programs import (
     filter_,
     scale_against_reference,
 )
+from xia2.Modules.SSX.reduction_pool import worker_pool
 
 xia2_logger = logging.getLogger(__name__)
 
@@ -52,9 +53,7 @@ class DataReductionWithReference(BaseDataReduction):
 
         with (
             record_step("dials.scale (parallel)"),
-            concurrent.futures.ProcessPoolExecutor(
-                max_workers=self._reduction_params.nproc
-            ) as pool,
+            worker_pool(self._reduction_params.nproc) as pool,
         ):
             scale_futures: dict[Any, int] = {
                 pool.submit(
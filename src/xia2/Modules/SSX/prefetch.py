@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import threading
+
+from dxtbx.serialize import load
+
+xia2_logger = logging.getLogger(__name__)
+
+_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def batch_image_files(working_directory: pathlib.Path) -> list[str]:
+    """The image files of a batch, if each image is in a file of its own.
+    Images in container files (e.g. HDF5) are not listed, as the parts of
+    the file holding the images of the batch are not known here."""
+    expts = load.experiment_list(
+        working_directory / "imported.expt", check_format=False
+    )
+    files: list[str] = []
+    for imageset in expts.imagesets():
+        paths = imageset.paths()
+        if len(set(paths)) == len(imageset):
+            files.extend(paths)
+    return files
+
+
+class ImagePrefetcher:
+    """Read the image files of upcoming batches in a background thread, up
+    to depth batches ahead of the in_flight batches being processed, so that
+    the images are in the page cache (rather than on a slow or network
+    filesystem) when the batch comes to be processed. Call start() once any
+    worker processes have been forked, as the thread is not copied to them,
+    and batch_done() as each batch finishes."""
+
+    def __init__(
+        self,
+        batch_directories: list[pathlib.Path],
+        depth: int,
+        in_flight: int = 1,
+    ):
+        self._batch_directories = list(batch_directories)
+        self._depth = depth
+        self._in_flight = in_flight
+        self._n_done = 0
+        # the first in_flight batches are already being read for processing
+        self._n_prefetched = min(in_flight, len(self._batch_directories))
+        self._stop = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> ImagePrefetcher:
+        return self
+
+    def __exit__(self, *args) -> None:
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def start(self) -> None:
+        """Start reading ahead, if not already started."""
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def batch_done(self) -> None:
+        with self._condition:
+            self._n_done += 1
+            self._condition.notify()
+
+    def _next_batch(self) -> pathlib.Path | None:
+        with self._condition:
+            while not self._stop and self._n_prefetched >= min(
+                len(self._batch_directories),
+                self._n_done + self._in_flight + self._depth,
+            ):
+                if self._n_prefetched == len(self._batch_directories):
+                    return None
+                self._condition.wait()
+            if self._stop:
+                return None
+            batch = self._batch_directories[self._n_prefetched]
+            self._n_prefetched += 1
+            return batch
+
+    def _run(self) -> None:
+        buffer = bytearray(_BUFFER_SIZE)
+        while (batch := self._next_batch()) is not None:
+            try:
+                files = batch_image_files(batch)
+                if not files:
+                    xia2_logger.info(
+                        "Not prefetching images, as only images stored one per "
+                        "file (e.g. CBF) can be read ahead"
+                    )
+                    return
+                for filename in files:
+                    with open(filename, "rb", buffering=0) as fh:
+                        while fh.readinto(buffer) and not self._stop:
+                            pass
+                    if self._stop:
+                        return
+            except Exception as e:
+                # only an optimisation: the images will be read when needed
+                xia2_logger.debug(f"Unable to prefetch images for {batch}: {e}")
+            else:
+                xia2_logger.debug(f"Prefetched images for {batch}")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import concurrent.futures
+import contextlib
+import logging
+import threading
+from collections.abc import Generator
+from concurrent.futures.process import BrokenProcessPool
+
+xia2_logger = logging.getLogger(__name__)
+
+
+class _SharedPool:
+    """A long-lived worker pool, shared between the reduction stages
+    (filtering, cosym, scaling and merging) of a single data reduction run.
+
+    Creating a pool per stage means that every worker pays process start-up
+    and the full dials/cctbx import cost again, which dominates when there
+    are many small batches. If a worker dies, the pool is broken for all
+    later jobs, so it is replaced when next submitted to.
+    """
+
+    def __init__(self, nproc: int):
+        self.nproc = max(nproc, 1)
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.nproc)
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        with self._lock:
+            pool = self._pool
+        try:
+            return pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            return self._replace(pool).submit(fn, *args, **kwargs)
+
+    def _replace(
+        self, broken: concurrent.futures.ProcessPoolExecutor
+    ) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is broken:
+                xia2_logger.debug("Replacing broken reduction worker pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.nproc
+                )
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._pool.shutdown(wait=True)
+
+
+_shared_pool: _SharedPool | None = None
+
+
+@contextlib.contextmanager
+def reduction_worker_pool(nproc: int) -> Generator[None, None, None]:
+    """Share one process pool between the parallel steps of a reduction run.
+
+    While this context is active, all parallel reduction steps submit their
+    work to the same pool rather than creating their own.
+    """
+    global _shared_pool
+    if _shared_pool is not None:
+        # Nested use, just reuse the outer pool.
+        yield
+        return
+    _shared_pool = _SharedPool(nproc)
+    try:
+        yield
+    finally:
+        pool, _shared_pool = _shared_pool, None
+        pool.shutdown()
+
+
+class _SharedPoolView(concurrent.futures.Executor):
+    """Submit jobs to the shared pool, keeping track of the futures created
+    and running at most max_workers of them at a time, as a pool of that
+    size created for the step would."""
+
+    def __init__(self, pool: _SharedPool, max_workers: int):
+        self._pool = pool
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1))
+        self.futures: list[concurrent.futures.Future] = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        # The shared pool outlives this view, so only wait for our own jobs.
+        if cancel_futures:
+            for future in self.futures:
+                future.cancel()
+        if wait:
+            concurrent.futures.wait(self.futures)
+
+
+def worker_pool(nproc: int) -> concurrent.futures.Executor:
+    """Get a process pool to run up to nproc parallel reduction jobs at once.
+
+    This is the shared pool if one has been set up with reduction_worker_pool,
+    otherwise a pool is created just for the calling step. As for a standard
+    executor, use as a context manager to wait for all submitted jobs on exit.
+    """
+    if _shared_pool is None:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max(nproc, 1))
+    return _SharedPoolView(_shared_pool, min(nproc, _shared_pool.nproc))
@@ -124,6 +124,13 @@ spotfinding {
             "the xia2.ssx phil scope will take precedent over identical options"
             "defined in the phil file."
     .expert_level=3
+  prefetch_batches = 0
+    .type = int(value_min=0)
+    .help = "Read the image files of up to this many batches ahead of those"
+            "being processed in the background, so that reading the images"
+            "from a slow or network filesystem overlaps with processing."
+            "Only images stored one per file are read ahead."
+    .expert_level=3
 }
 indexing {
   unit_cell = None
@@ -294,6 +301,7 @@ def run_xia2_ssx(
         batch_size=params.batch_size,
         njobs=params.multiprocessing.njobs,
         nproc=params.multiprocessing.nproc,
+        prefetch_batches=params.spotfinding.prefetch_batches,
         steps=params.workflow.steps,
         enable_live_reporting=params.enable_live_reporting,
         parsed_grouping=parsed_grouping,
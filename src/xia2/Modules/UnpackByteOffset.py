@@ -1,74 +1,88 @@
+# Encoding and decoding of CBF "byte offset" compressed data, in which each
+# pixel is stored as the difference from the previous pixel, in one byte if
+# possible, else escaped (-128) and stored in 2, then 4, then 8 bytes.
+
 from __future__ import annotations
 
-import struct
+import numpy as np
 
+# (escape prefix, little endian type of the value) for each width of delta
+_encodings = (
+    (b"", "<i1"),
+    (b"\x80", "<i2"),
+    (b"\x80\x00\x80", "<i4"),
+    (b"\x80\x00\x80\x00\x00\x00\x80", "<i8"),
+)
+_limits = (127, 32767, 2147483647)
 
-def pack_values(data):
-    current = 0
-    packed = ""
-
-    for d in data:
-        delta = d - current
-        if -127 < delta < 127:
-            packed += struct.pack("b", delta)
-            current = d
-            continue
-
-        packed += struct.pack("b", -128)
-        if -32767 < delta < 32767:
-            packed += struct.pack("<h", delta)
-            current = d
-            continue
 
-        packed += struct.pack("<h", -32768)
-        if -2147483647 < delta < 2147483647:
-            packed += struct.pack("<i", delta)
-            current = d
+def pack_values(data):
+    """Compress a sequence of integer pixel values, returning bytes."""
+
+    values = np.asarray(data, dtype=np.int64).ravel()
+    deltas = np.diff(values, prepend=0)
+
+    # the encoding used for each delta, as an index into _encodings
+    width = np.zeros(deltas.size, dtype=np.intp)
+    for limit in _limits:
+        width += np.abs(deltas) >= limit
+    sizes = np.array([len(p) + np.dtype(t).itemsize for p, t in _encodings])
+    offsets = np.concatenate(([0], np.cumsum(sizes[width])))
+
+    packed = np.zeros(offsets[-1], dtype=np.uint8)
+    for j, (prefix, dtype) in enumerate(_encodings):
+        sel = np.flatnonzero(width == j)
+        if not sel.size:
             continue
+        start = offsets[sel][:, np.newaxis]
+        if prefix:
+            packed[start + np.arange(len(prefix))] = np.frombuffer(prefix, np.uint8)
+        value_bytes = deltas[sel].astype(dtype).view(np.uint8)
+        itemsize = np.dtype(dtype).itemsize
+        packed[start + len(prefix) + np.arange(itemsize)] = value_bytes.reshape(
+            -1, itemsize
+        )
 
-        packed += struct.pack("<i", -2147483648)
-        packed += struct.pack("<q", delta)
-        current = d
-
-    return packed
+    return packed.tobytes()
 
 
 def unpack_values(data, length):
-    # unpack data stream
+    """Decompress length pixel values from data (bytes or any buffer), as a
+    numpy int64 array.
 
-    values = []
+    Runs of one byte deltas between escapes are copied directly from a view
+    of the buffer, so only the escaped (larger) deltas are handled one at a
+    time, and the pixel values are then the cumulative sum of the deltas."""
 
-    pixel = 0
+    stream = np.frombuffer(data, dtype=np.int8)
+    escapes = np.flatnonzero(stream == -128)
+
+    deltas = np.empty(length, dtype=np.int64)
+    n = 0
     ptr = 0
+    while n < length:
+        # the next escape at or after ptr - earlier ones were within the
+        # value of a previous wider delta
+        j = np.searchsorted(escapes, ptr)
+        end = escapes[j] if j < escapes.size else stream.size
+        count = min(end - ptr, length - n)
+        deltas[n : n + count] = stream[ptr : ptr + count]
+        n += count
+        ptr += count
+        if n == length:
+            break
+        if ptr >= stream.size:
+            raise ValueError(
+                "byte offset data ended after %d of %d values" % (n, length)
+            )
 
-    while len(values) < length:
-        delta = struct.unpack("b", data[ptr])[0]
         ptr += 1
-
-        if delta != -128:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<h", data[ptr : ptr + 2])[0]
-        ptr += 2
-
-        if delta != -32768:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<i", data[ptr : ptr + 4])[0]
-        ptr += 4
-
-        if delta != -2147483648:
-            pixel += delta
-            values.append(pixel)
-            continue
-
-        delta = struct.unpack("<q", data[ptr : ptr + 8])[0]
-        ptr += 8
-        pixel += delta
-        values.append(pixel)
-
-    return values
+        for _, dtype in _encodings[1:]:
+            value = np.frombuffer(data, dtype=dtype, count=1, offset=ptr)[0]
+            ptr += value.itemsize
+            if value != np.iinfo(dtype).min or dtype == "<i8":
+                break
+        deltas[n] = value
+        n += 1
+
+    return np.cumsum(deltas)
@@ -0,0 +1,338 @@
+# Reading of the image headers for a template when all of the headers are
+# needed (read_all_image_headers=True). The headers are read in parallel
+# chunks. Optionally (image_header_cache), the models read from each header
+# are kept in an on-disk cache keyed by the path, size and modification time
+# of the image, which is shared between runs and between the processes of a
+# run, so that each header is only read once.
+
+
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from importlib import metadata
+
+logger = logging.getLogger("xia2.Schema.ImageHeaders")
+
+# the number of images in each chunk is chosen to give each process several
+# chunks, but no fewer than this
+_MIN_CHUNK_SIZE = 10
+
+_MODELS = ("beam", "detector", "goniometer", "scan")
+
+# a busy cache is treated as a miss, rather than waiting for the lock
+_LOCK_TIMEOUT = 0.5
+
+# entries which have not been used for this long are evicted, as are the
+# least recently used entries beyond the maximum number
+_MAX_AGE = 30 * 24 * 3600
+_MAX_ENTRIES = 200_000
+
+
+def _cache_file(cache_dir):
+    """The header cache in cache_dir, which depends on the xia2 and dxtbx
+    versions since the models read from a header may change between
+    versions."""
+    h = hashlib.sha256()
+    for package in ("xia2", "dxtbx"):
+        try:
+            h.update(f"{package}={metadata.version(package)}".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    return os.path.join(cache_dir, f"image_headers-{h.hexdigest()[:16]}.sqlite")
+
+
+class HeaderCache:
+    """An on-disk cache of the models read from image headers. Each distinct
+    model is stored once, as most images share the beam, detector and
+    goniometer. Failure to read or write the cache, including the cache being
+    locked by another process, is not fatal - the headers are simply read."""
+
+    def __init__(self, filename):
+        self._filename = filename
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self._filename), exist_ok=True)
+        connection = sqlite3.connect(self._filename, timeout=_LOCK_TIMEOUT)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS headers (path TEXT, options TEXT, "
+            "size INTEGER, mtime_ns INTEGER, used REAL, beam TEXT, "
+            "detector TEXT, goniometer TEXT, scan TEXT, "
+            "PRIMARY KEY (path, options))"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS models (hash TEXT PRIMARY KEY, model TEXT)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS headers_used ON headers (used)")
+        return connection
+
+    def get(self, stats, options):
+        """Get the cached models for the images with the given os.stat
+        results, for those images which are unchanged since they were
+        cached."""
+        found = {}
+        paths = list(stats)
+        try:
+            connection = self._connect()
+            try:
+                model_cache = {}
+                for i in range(0, len(paths), 500):
+                    chunk = paths[i : i + 500]
+                    rows = connection.execute(
+                        "SELECT path, size, mtime_ns, %s FROM headers "
+                        "WHERE options = ? AND path IN (%s)"
+                        % (", ".join(_MODELS), ",".join("?" * len(chunk))),
+                        [options, *chunk],
+                    ).fetchall()
+                    for path, size, mtime_ns, *hashes in rows:
+                        st = stats[path]
+                        if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                            found[path] = {
+                                name: self._model(connection, model_cache, h)
+                                for name, h in zip(_MODELS, hashes)
+                            }
+                if found:
+                    # the entries are in use, so are kept from eviction
+                    with connection:
+                        connection.executemany(
+                            "UPDATE headers SET used = ? "
+                            "WHERE options = ? AND path = ?",
+                            ((time.time(), options, path) for path in found),
+                        )
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.debug("Unable to read image header cache: %s", e)
+        return found
+
+    @staticmethod
+    def _model(connection, model_cache, h):
+        if h is None:
+            return None
+        if h not in model_cache:
+            (model,) = connection.execute(
+                "SELECT model FROM models WHERE hash = ?", (h,)
+            ).fetchone()
+            model_cache[h] = json.loads(model)
+        return model_cache[h]
+
+    def put(self, stats, options, models):
+        """Cache the models read from the headers of the images, evicting
+        entries which are old or beyond the size of the cache."""
+        unique_models = {}
+        rows = []
+        for path, m in models.items():
+            hashes = []
+            for name in _MODELS:
+                if m[name] is None:
+                    hashes.append(None)
+                    continue
+                model = json.dumps(m[name], sort_keys=True)
+                h = hashlib.sha256(model.encode()).hexdigest()
+                unique_models[h] = model
+                hashes.append(h)
+            rows.append(
+                (
+                    path,
+                    options,
+                    stats[path].st_size,
+                    stats[path].st_mtime_ns,
+                    time.time(),
+                    *hashes,
+                )
+            )
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO models VALUES (?, ?)",
+                        unique_models.items(),
+                    )
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO headers "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._evict(connection)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            logger.debug("Unable to write image header cache: %s", e)
+
+    @staticmethod
+    def _evict(connection):
+        evicted = connection.execute(
+            "DELETE FROM headers WHERE used < ?", (time.time() - _MAX_AGE,)
+        ).rowcount
+        evicted += connection.execute(
+            "DELETE FROM headers WHERE rowid IN (SELECT rowid FROM headers "
+            "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (_MAX_ENTRIES,),
+        ).rowcount
+        if not evicted:
+            return
+        # and the models which are no longer used by any entry
+        connection.execute(
+            "DELETE FROM models WHERE hash NOT IN (%s)"
+            % " UNION ".join(
+                f"SELECT {name} FROM headers WHERE {name} IS NOT NULL"
+                for name in _MODELS
+            )
+        )
+
+
+def _read_headers(paths, format_kwargs):
+    """Read the headers of the images, returning a list of (path, models)
+    where models is a dictionary of the serialised beam, detector, goniometer
+    and scan models."""
+    from dxtbx.format.Registry import get_format_class_for_file
+
+    format_class = get_format_class_for_file(paths[0])
+    results = []
+    for path in paths:
+        fmt = format_class(path, **format_kwargs)
+        models = {}
+        for name in _MODELS:
+            model = getattr(fmt, f"get_{name}")()
+            models[name] = model.to_dict() if model is not None else None
+        results.append((path, models))
+    return results
+
+
+def read_image_headers(paths, format_kwargs, nproc=1, cache_dir=None):
+    """Get the serialised models from the headers of the images, from the
+    cache in cache_dir (if given) where possible, else reading the headers in
+    parallel chunks."""
+    options = json.dumps(format_kwargs, sort_keys=True)
+    stats = {path: os.stat(path) for path in paths}
+    cache = HeaderCache(_cache_file(cache_dir)) if cache_dir else None
+    models = cache.get(stats, options) if cache else {}
+
+    missing = [path for path in paths if path not in models]
+    logger.debug(
+        "Image headers: %d cached, %d to read", len(paths) - len(missing), len(missing)
+    )
+    if missing:
+        chunk_size = max(_MIN_CHUNK_SIZE, -(-len(missing) // (4 * nproc)))
+        chunks = [
+            missing[i : i + chunk_size] for i in range(0, len(missing), chunk_size)
+        ]
+        # daemonic processes, e.g. multiprocessing workers, may not have
+        # children of their own
+        if (
+            nproc > 1
+            and len(chunks) > 1
+            and not multiprocessing.current_process().daemon
+        ):
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(nproc, len(chunks))
+            ) as pool:
+                results = list(
+                    pool.map(_read_headers, chunks, itertools.repeat(format_kwargs))
+                )
+        else:
+            results = [_read_headers(chunk, format_kwargs) for chunk in chunks]
+        read = dict(itertools.chain.from_iterable(results))
+        if cache:
+            cache.put(stats, options, read)
+        models.update(read)
+
+    return [models[path] for path in paths]
+
+
+def _similar(compare, a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return compare(a, b)
+
+
+def imagesets_from_headers(
+    template,
+    paths,
+    format_kwargs,
+    compare_beam,
+    compare_detector,
+    compare_goniometer,
+    scan_tolerance,
+    nproc=1,
+    cache_dir=None,
+):
+    """Make the ImageSequences for the images matching a template from the
+    (possibly cached) image headers. Consecutive images with similar models
+    and continuous scans make up each sequence, as for
+    ExperimentListFactory.from_filenames(). Returns None if the images are
+    in a multi-image format, which must be read with from_filenames()."""
+    from dxtbx.format.FormatMultiImage import FormatMultiImage
+    from dxtbx.format.Registry import get_format_class_for_file
+    from dxtbx.imageset import ImageSetFactory
+    from dxtbx.model import (
+        BeamFactory,
+        DetectorFactory,
+        GoniometerFactory,
+        ScanFactory,
+    )
+
+    format_class = get_format_class_for_file(paths[0])
+    if format_class is None or issubclass(format_class, FormatMultiImage):
+        return None
+
+    sequences = []
+    for models in read_image_headers(
+        paths, format_kwargs, nproc=nproc, cache_dir=cache_dir
+    ):
+        if models["scan"] is None:
+            # a still image, which is not part of any sweep
+            continue
+        scan = ScanFactory.from_dict(models["scan"])
+        if scan.get_oscillation()[1] == 0:
+            continue
+        beam = BeamFactory.from_dict(models["beam"]) if models["beam"] else None
+        detector = (
+            DetectorFactory.from_dict(models["detector"])
+            if models["detector"]
+            else None
+        )
+        goniometer = (
+            GoniometerFactory.from_dict(models["goniometer"])
+            if models["goniometer"]
+            else None
+        )
+
+        if sequences:
+            last = sequences[-1]
+            if (
+                _similar(compare_beam, last["beam"], beam)
+                and _similar(compare_detector, last["detector"], detector)
+                and _similar(compare_goniometer, last["goniometer"], goniometer)
+            ):
+                try:
+                    last["scan"].append(scan, scan_tolerance=scan_tolerance)
+                except RuntimeError:
+                    pass
+                else:
+                    continue
+        sequences.append(
+            {"beam": beam, "detector": detector, "goniometer": goniometer, "scan": scan}
+        )
+
+    imagesets = []
+    for sequence in sequences:
+        first, last = sequence["scan"].get_image_range()
+        imagesets.append(
+            ImageSetFactory.make_sequence(
+                template,
+                list(range(first, last + 1)),
+                format_class=format_class,
+                format_kwargs=format_kwargs,
+                **sequence,
+            )
+        )
+    return imagesets
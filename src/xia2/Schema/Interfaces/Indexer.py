@@ -48,6 +48,7 @@ from functools import reduce
 from cctbx.sgtbx import bravais_types
 
 from xia2.Experts.LatticeExpert import SortLattices
+from xia2.Handlers.Journal import Journal
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
 
@@ -418,7 +419,8 @@ class Indexer:
         self._indxr_helper.insert(lattice, cell)
 
     def index(self):
-        if not self.get_indexer_finish_done():
+        indexed = not self.get_indexer_finish_done()
+        if indexed:
             f = inspect.currentframe().f_back.f_back
             m = f.f_code.co_filename
             l = f.f_lineno
@@ -541,6 +543,9 @@ class Indexer:
             if self._indxr_print:
                 logger.info(self.show_indexer_solutions())
 
+        if indexed and len(self._indxr_sweeps) == 1:
+            Journal.record_sweep(self.get_indexer_sweep(), "index")
+
     def show_indexer_solutions(self):
         lines = ["All possible indexing solutions:"]
         for l in self._indxr_helper.repr():
@@ -34,24 +34,106 @@ from __future__ import annotations
 import inspect
 import json
 import logging
-import math
+import multiprocessing
 import os
 
+import numpy as np
+
 import xia2.Schema.Interfaces.Indexer
 import xia2.Schema.Interfaces.Refiner
 
 # symmetry operator management functionality
 from xia2.Experts.SymmetryExpert import compose_symops, symop_to_mat
+from xia2.Handlers.Files import FileHandler
+from xia2.Handlers.Journal import Journal
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
 from xia2.Schema.Exceptions.BadLatticeError import BadLatticeError
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
+from xia2.Schema.PerImageStatistics import PerImageStatistics
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Integrater")
 
 
+class _LatticeRejected(Exception):
+    """Raised when the lattice of a speculative candidate is rejected, rather
+    than moving on to the next lattice."""
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # format the message now, as the arguments may not be picklable
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        self.records.append(record)
+
+
+def _integrate_lattice_candidate(integrater, rank, working_directory, connection):
+    """Integrate the candidate lattice rank places after the current one, in
+    a process forked from that of the integrater, in the given working
+    directory. Only this lattice is tried: the outcome sent through the
+    connection is ("integrated", the processing state of the sweep, log
+    records, files recorded), ("rejected", None, log records, {}) as soon as
+    the lattice is rejected, or ("failed", the error, [], {}). The log records
+    are replayed if the outcome is used, and the files (logs, reports and data
+    files) recorded with the FileHandler are recorded in the parent process
+    if the state is committed."""
+
+    refiner = integrater.get_integrater_refiner()
+    indexer = refiner.get_refiner_indexer(integrater.get_integrater_epoch())
+
+    # the log is kept until we know whether this result will be used
+    handler = _RecordingHandler()
+    for name in ("xia2", "dials", "dxtbx"):
+        logger_ = logging.getLogger(name)
+        for h in list(logger_.handlers):
+            logger_.removeHandler(h)
+        logger_.addHandler(handler)
+        logger_.propagate = False
+
+    # only the result which is kept is recorded, by the parent process
+    Journal.close()
+    files = FileHandler.get_records()
+
+    try:
+        for _ in range(rank):
+            refiner.eliminate(indxr_print=False)
+        integrater._integrater_reset()
+
+        os.makedirs(working_directory, exist_ok=True)
+        integrater.set_working_directory(working_directory)
+        refiner.set_working_directory(working_directory)
+        indexer.set_working_directory(working_directory)
+
+        n_lattices = len(indexer._indxr_helper.get_all())
+        integrater._speculative_candidate = True
+        integrater.integrate()
+        integrater._speculative_candidate = False
+        if len(indexer._indxr_helper.get_all()) < n_lattices:
+            # rejected by the refiner, which moved on to the next lattice
+            raise _LatticeRejected()
+        state = integrater.get_integrater_sweep().get_processing_state()
+        outcome = (
+            "integrated",
+            state,
+            handler.records,
+            FileHandler.get_records_since(files),
+        )
+    except _LatticeRejected:
+        outcome = ("rejected", None, handler.records, {})
+    except Exception as e:
+        outcome = ("failed", str(e), [], {})
+    connection.send(outcome)
+    connection.close()
+
+
 class Integrater(FrameProcessor):
     """An interface to present integration functionality in a similar
     way to the indexer interface."""
@@ -136,6 +218,12 @@ class Integrater(FrameProcessor):
 
         self._intgr_per_image_statistics = None
 
+        # set when a lattice has been rejected and the next candidate
+        # lattices are to be integrated in parallel
+        self._speculate = False
+        # set while integrating a single candidate lattice in parallel
+        self._speculative_candidate = False
+
     # serialization functions
 
     def to_dict(self):
@@ -155,6 +243,9 @@ class Integrater(FrameProcessor):
             elif a[0] == "_intgr_sweep":
                 # XXX I guess we probably want this?
                 continue
+            elif a[0] == "_intgr_per_image_statistics" and a[1] is not None:
+                # a reference to the sidecar file, once saved
+                obj[a[0]] = a[1].to_dict()
             elif a[0].startswith("_intgr_") or a[0].startswith("_fp_"):
                 obj[a[0]] = a[1]
         return obj
@@ -174,6 +265,8 @@ class Integrater(FrameProcessor):
                     where_str="",
                 ).object
                 v = cls.from_dict(v)
+            elif k == "_intgr_per_image_statistics":
+                v = PerImageStatistics.from_serialized(v)
             if isinstance(v, dict):
                 if v.get("__id__") == "ExperimentList":
                     from dxtbx.model.experiment_list import ExperimentListFactory
@@ -503,7 +596,12 @@ class Integrater(FrameProcessor):
     def integrate(self):
         """Actually perform integration until we think we are done..."""
 
+        integrated = not self.get_integrater_finish_done()
         while not self.get_integrater_finish_done():
+            if self._speculate:
+                self._integrate_speculatively()
+                continue
+
             while not self.get_integrater_done():
                 while not self.get_integrater_prepare_done():
                     logger.debug("Preparing to do some integration...")
@@ -519,8 +617,11 @@ class Integrater(FrameProcessor):
 
                     except BadLatticeError as e:
                         logger.info("Rejecting bad lattice %s", str(e))
-                        self._intgr_refiner.eliminate()
-                        self._integrater_reset()
+                        if self._integrater_eliminate():
+                            break
+
+                if self._speculate:
+                    break
 
                 # FIXME x1698 - may be the case that _integrate() returns the
                 # raw intensities, _integrate_finish() returns intensities
@@ -545,8 +646,11 @@ class Integrater(FrameProcessor):
 
                 except BadLatticeError as e:
                     logger.info("Rejecting bad lattice %s", str(e))
-                    self._intgr_refiner.eliminate()
-                    self._integrater_reset()
+                    if self._integrater_eliminate():
+                        break
+
+            if self._speculate:
+                continue
 
             self.set_integrater_finish_done(True)
             try:
@@ -556,10 +660,154 @@ class Integrater(FrameProcessor):
 
             except BadLatticeError as e:
                 logger.info("Bad Lattice Error: %s", str(e))
-                self._intgr_refiner.eliminate()
-                self._integrater_reset()
+                self._integrater_eliminate()
+
+        if integrated and len(self._intgr_refiner.get_indexer_sweeps()) <= 1:
+            Journal.record_sweep(self._intgr_sweep, "integrate")
         return self._intgr_hklout
 
+    def _integrater_eliminate(self):
+        """Eliminate the current lattice after a BadLatticeError. Returns
+        True if the next candidate lattices are to be integrated in parallel
+        rather than one at a time."""
+
+        if self._speculative_candidate:
+            raise _LatticeRejected()
+
+        self._intgr_refiner.eliminate()
+        self._integrater_reset()
+
+        n_candidates = min(
+            PhilIndex.params.xia2.settings.speculative_lattices,
+            len(self._speculative_lattice_candidates()),
+        )
+        self._speculate = n_candidates > 1
+        return self._speculate
+
+    def _speculative_lattice_candidates(self):
+        """The candidate lattices, in the order in which they would be tried,
+        if they may be integrated in parallel, else an empty list."""
+
+        if len(self._intgr_refiner.get_indexer_sweeps()) > 1:
+            # joint refinement - every sweep would need to be integrated
+            return []
+        if (
+            "fork" not in multiprocessing.get_all_start_methods()
+            or multiprocessing.current_process().daemon
+        ):
+            return []
+        indexer = self._intgr_refiner.get_refiner_indexer(self.get_integrater_epoch())
+        if (
+            indexer is None
+            or not indexer._indxr_helper
+            or indexer._indxr_user_input_lattice
+        ):
+            return []
+        return [lattice for lattice, cell in indexer._indxr_helper.get_all()]
+
+    def _integrate_speculatively(self):
+        """Refine and integrate the next few candidate lattices in parallel,
+        in forked processes each with their own working directory, and commit
+        the result that eliminating the lattices one at a time would have
+        given: the first candidate which was not rejected. The candidates
+        after this are stopped. If every candidate is rejected, the serial
+        process continues with the next lattice, and if a candidate fails it
+        is resumed from that candidate instead."""
+
+        self._speculate = False
+
+        candidates = self._speculative_lattice_candidates()[
+            : PhilIndex.params.xia2.settings.speculative_lattices
+        ]
+        if len(candidates) < 2:
+            return
+
+        logger.info(
+            "Integrating candidate lattices %s in parallel", " ".join(candidates)
+        )
+
+        context = multiprocessing.get_context("fork")
+        processes = []
+        connections = []
+        try:
+            for rank, lattice in enumerate(candidates):
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(
+                    target=_integrate_lattice_candidate,
+                    args=(
+                        self,
+                        rank,
+                        os.path.join(
+                            self.get_working_directory(),
+                            f"lattice_{rank + 1}_{lattice}",
+                        ),
+                        sender,
+                    ),
+                )
+                process.start()
+                sender.close()
+                processes.append(process)
+                connections.append(receiver)
+
+            # the outcomes are considered in the order in which the serial
+            # elimination would have tried the lattices
+            for rank, receiver in enumerate(connections):
+                try:
+                    outcome, result, records, files = receiver.recv()
+                except EOFError:
+                    outcome, result, records, files = "failed", "no result", [], {}
+                if outcome == "failed":
+                    logger.debug(
+                        "Speculative integration of lattice %s failed: %s",
+                        candidates[rank],
+                        result,
+                    )
+                    for _ in range(rank):
+                        self._intgr_refiner.eliminate()
+                    self._integrater_reset()
+                    return
+                for record in records:
+                    logging.getLogger(record.name).handle(record)
+                if outcome == "integrated":
+                    FileHandler.add_records(files)
+                    self._commit_speculative_state(result)
+                    return
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            for receiver in connections:
+                receiver.close()
+
+        # every candidate was rejected
+        for _ in range(len(candidates) - 1):
+            self._intgr_refiner.eliminate()
+        self._integrater_eliminate()
+
+    def _commit_speculative_state(self, state):
+        """Adopt the indexer, refiner and integrater state from a speculative
+        integration, keeping this integrater object and the original
+        working directories. The integrater state adopted is that which is
+        serialized by to_dict()."""
+
+        sweep = self.get_integrater_sweep()
+        working_directories = (
+            self.get_working_directory(),
+            self._intgr_refiner.get_working_directory(),
+            self._intgr_indexer.get_working_directory(),
+        )
+        sweep.set_processing_state(state)
+        integrater = sweep._integrater
+        for name in state["_integrater"]:
+            if name.startswith(("_intgr_", "_fp_")):
+                setattr(self, name, getattr(integrater, name))
+        sweep._integrater = self
+
+        self.set_working_directory(working_directories[0])
+        self._intgr_refiner.set_working_directory(working_directories[1])
+        self._intgr_indexer.set_working_directory(working_directories[2])
+
     def set_output_format(self, output_format="hkl"):
         logger.debug("setting integrator output format to %s" % output_format)
         assert output_format in ["hkl", "pickle"]
@@ -690,105 +938,66 @@ class Integrater(FrameProcessor):
         assert self._intgr_per_image_statistics is not None
 
         stats = self._intgr_per_image_statistics
+        if not isinstance(stats, PerImageStatistics):
+            stats = PerImageStatistics.from_dict(stats)
 
         # analyse stats here, perhaps raising an exception if we
         # are unhappy with something, so that the indexing solution
         # can be eliminated in the integrater.
 
-        images = sorted(stats)
-
         # these may not be present if only a couple of the
         # images were integrated...
 
-        try:
-            stddev_pixel = [stats[i]["rmsd_pixel"] for i in images]
-
-            # fix to bug # 2501 - remove the extreme values from this
-            # list...
-
-            stddev_pixel = sorted(set(stddev_pixel))
-
-            # only remove the extremes if there are enough values
-            # that this is meaningful... very good data may only have
-            # two values!
-
-            if len(stddev_pixel) > 4:
-                stddev_pixel = stddev_pixel[1:-1]
-
-            low, high = min(stddev_pixel), max(stddev_pixel)
-
-            lines.append("Processed batches %d to %d" % (min(images), max(images)))
-
-            lines.append(f"Standard Deviation in pixel range: {low:.2f} {high:.2f}")
-
-            overloads = None
-            fraction_weak = None
-            isigi = None
-
-            # print a one-spot-per-image rendition of this...
-            stddev_pixel = [stats[i]["rmsd_pixel"] for i in images]
-            if "overloads" in list(stats.values())[0]:
-                overloads = [stats[i]["overloads"] for i in images]
-            strong = [stats[i]["strong"] for i in images]
-            if "fraction_weak" in list(stats.values())[0]:
-                fraction_weak = [stats[i]["fraction_weak"] for i in images]
-            if "isigi" in list(stats.values())[0]:
-                isigi = [stats[i]["isigi"] for i in images]
-
-            # FIXME need to allow for blank images in here etc.
-
-            status_record = ""
-            for i, stddev in enumerate(stddev_pixel):
-                if fraction_weak is not None and fraction_weak[i] > 0.99:
-                    status_record += "."
-                elif isigi is not None and isigi[i] < 1.0:
-                    status_record += "."
-                elif stddev > 2.5:
-                    status_record += "!"
-                elif stddev > 1.0:
-                    status_record += "%"
-                elif overloads is not None and overloads[i] > 0.01 * strong[i]:
-                    status_record += "O"
-                else:
-                    status_record += "o"
-
-            if len(status_record) > 60:
-                lines.append("Integration status per image (60/record):")
-            else:
-                lines.append("Integration status per image:")
-
-            for chunk in (
-                status_record[i : i + 60] for i in range(0, len(status_record), 60)
-            ):
-                lines.append(chunk)
-            lines.append('"o" => good        "%" => ok        "!" => bad rmsd')
-            lines.append('"O" => overloaded  "#" => many bad  "." => weak')
-            lines.append('"@" => abandoned')
-
-            # next look for variations in the unit cell parameters
-            if "unit_cell" in list(stats.values())[0]:
-                unit_cells = [stats[i]["unit_cell"] for i in images]
-
-                # compute average
-                uc_mean = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-
-                for uc in unit_cells:
-                    for j in range(6):
-                        uc_mean[j] += uc[j]
-
-                for j in range(6):
-                    uc_mean[j] /= len(unit_cells)
-
-                max_rel_dev = 0.0
-
-                for uc in unit_cells:
-                    for j in range(6):
-                        if (math.fabs(uc[j] - uc_mean[j]) / uc_mean[j]) > max_rel_dev:
-                            max_rel_dev = math.fabs(uc[j] - uc_mean[j]) / uc_mean[j]
-
-                lines.append("Maximum relative deviation in cell: %.3f" % max_rel_dev)
-
-        except KeyError:
+        if "rmsd_pixel" not in stats.columns or "strong" not in stats.columns:
             raise RuntimeError("Refinement not performed...")
+        if np.isnan(stats.column("rmsd_pixel")).any():
+            raise RuntimeError("Refinement not performed...")
+
+        # fix to bug # 2501 - remove the extreme values from this
+        # list...
+
+        stddev_pixel = np.unique(stats.column("rmsd_pixel"))
+
+        # only remove the extremes if there are enough values
+        # that this is meaningful... very good data may only have
+        # two values!
+
+        if len(stddev_pixel) > 4:
+            stddev_pixel = stddev_pixel[1:-1]
+
+        low, high = stddev_pixel[0], stddev_pixel[-1]
+
+        lines.append(
+            "Processed batches %d to %d" % (stats.images.min(), stats.images.max())
+        )
+
+        lines.append(f"Standard Deviation in pixel range: {low:.2f} {high:.2f}")
+
+        # print a one-spot-per-image rendition of this...
+        status_record = stats.status_record()
+
+        if len(status_record) > 60:
+            lines.append("Integration status per image (60/record):")
+        else:
+            lines.append("Integration status per image:")
+
+        for chunk in (
+            status_record[i : i + 60] for i in range(0, len(status_record), 60)
+        ):
+            lines.append(chunk)
+        lines.append('"o" => good        "%" => ok        "!" => bad rmsd')
+        lines.append('"O" => overloaded  "#" => many bad  "." => weak')
+        lines.append('"@" => abandoned')
+
+        # then for runs of weak (e.g. blank) or overloaded images
+        for first, last in stats.windows(stats.weak()):
+            lines.append("Weak images: %d to %d" % (first, last))
+        for first, last in stats.windows(stats.overloaded()):
+            lines.append("Overloaded images: %d to %d" % (first, last))
+
+        # next look for variations in the unit cell parameters
+        max_rel_dev = stats.max_relative_cell_deviation()
+        if max_rel_dev is not None:
+            lines.append("Maximum relative deviation in cell: %.3f" % max_rel_dev)
 
         return "\n".join(lines)
@@ -5,6 +5,8 @@ import json
 import logging
 import os
 
+from xia2.Handlers.Journal import Journal
+
 logger = logging.getLogger("xia2.Schema.Interfaces.Refiner")
 
 
@@ -217,6 +219,7 @@ class Refiner:
         if self._refinr_indexers == {}:
             raise RuntimeError("no Indexer implementations assigned for refinement")
 
+        refined = not self.get_refiner_finish_done()
         while not self.get_refiner_finish_done():
             while not self.get_refiner_done():
                 while not self.get_refiner_prepare_done():
@@ -229,6 +232,9 @@ class Refiner:
             self._refinr_finish_done = True
             self._refine_finish()
 
+        if refined and len(self._refinr_sweeps) == 1:
+            Journal.record_sweep(self._refinr_sweeps[0], "refine")
+
         return self._refinr_result
 
     def set_refiner_payload(self, this, value):
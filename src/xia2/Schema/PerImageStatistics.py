@@ -0,0 +1,165 @@
+# Per-image integration statistics, held as one array per quantity rather
+# than a dictionary per image, so that the statistics of long sweeps are
+# compact, can be analysed without looping over the images and can be kept
+# in a binary sidecar file rather than in xia2.json.
+
+
+from __future__ import annotations
+
+import collections.abc
+import os
+
+import numpy as np
+
+# the quantities with more than one value per image
+_VECTOR_COLUMNS = {"beam": 2, "unit_cell": 6}
+
+
+class PerImageStatistics(collections.abc.Mapping):
+    """The per-image statistics from integration, as columns indexed by
+    image. Also behaves as the dictionary {image: {name: value}} which the
+    integraters used to record, so that per-image access still works.
+    Values not recorded for an image are NaN."""
+
+    def __init__(self, images, columns):
+        self.images = np.asarray(images, dtype=np.int64)
+        self.columns = {k: np.asarray(v, dtype=np.float64) for k, v in columns.items()}
+        self.filename = None
+        self._index = {image: i for i, image in enumerate(self.images.tolist())}
+
+    @classmethod
+    def from_dict(cls, stats):
+        """Make the columns from {image: {name: value}}, e.g. parsed from
+        the integration output. The images may be strings, as after a round
+        trip through json."""
+        images = sorted(int(image) for image in stats)
+        rows = [stats.get(image, stats.get(str(image))) for image in images]
+        names = sorted({name for row in rows for name in row})
+        columns = {}
+        for name in names:
+            shape = (
+                (len(images), _VECTOR_COLUMNS[name])
+                if name in _VECTOR_COLUMNS
+                else (len(images),)
+            )
+            column = np.full(shape, np.nan)
+            for i, row in enumerate(rows):
+                if name in row:
+                    column[i] = row[name]
+            columns[name] = column
+        return cls(images, columns)
+
+    # the dictionary interface
+
+    def __getitem__(self, image):
+        i = self._index[image]
+        row = {}
+        for name, column in self.columns.items():
+            value = column[i]
+            if name in _VECTOR_COLUMNS:
+                if not np.isnan(value).any():
+                    value = value.tolist()
+                    row[name] = tuple(value) if name == "unit_cell" else value
+            elif not np.isnan(value):
+                value = float(value)
+                row[name] = int(value) if value.is_integer() else value
+        return row
+
+    def __iter__(self):
+        return iter(self.images.tolist())
+
+    def __len__(self):
+        return len(self.images)
+
+    def column(self, name):
+        """The values of name for every image. Raises KeyError if name was
+        not recorded for any image."""
+        return self.columns[name]
+
+    # the sidecar file
+
+    def save(self, filename):
+        """Save the statistics to a compressed numpy file, which is then
+        referred to rather than the statistics themselves by to_dict()."""
+        np.savez_compressed(filename, images=self.images, **self.columns)
+        self.filename = os.fspath(filename)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            columns = {k: data[k] for k in data.files if k != "images"}
+            statistics = cls(data["images"], columns)
+        statistics.filename = os.fspath(filename)
+        return statistics
+
+    def to_dict(self):
+        if self.filename:
+            return {"__id__": "PerImageStatistics", "filename": self.filename}
+        return {str(image): self[image] for image in self}
+
+    @classmethod
+    def from_serialized(cls, obj):
+        """Restore the statistics from the output of to_dict(), or the
+        dictionary of per-image statistics of older xia2.json files."""
+        if obj is None:
+            return None
+        if obj.get("__id__") == "PerImageStatistics":
+            return cls.load(obj["filename"])
+        return cls.from_dict(obj)
+
+    # vectorised analysis
+
+    def weak(self):
+        """Whether each image is weak: almost all reflections weak, or a
+        mean I/sigma below 1."""
+        weak = np.zeros(len(self), dtype=bool)
+        if "fraction_weak" in self.columns:
+            weak |= self.columns["fraction_weak"] > 0.99
+        if "isigi" in self.columns:
+            weak |= self.columns["isigi"] < 1.0
+        return weak
+
+    def overloaded(self):
+        """Whether more than 1% of the strong reflections on each image are
+        overloaded."""
+        if "overloads" not in self.columns:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns["overloads"] > 0.01 * self.column("strong")
+
+    def status_record(self):
+        """One character per image summarising its integration: see
+        show_per_image_statistics in the Integrater interface."""
+        stddev = self.column("rmsd_pixel")
+        status = np.select(
+            [self.weak(), stddev > 2.5, stddev > 1.0, self.overloaded()],
+            [".", "!", "%", "O"],
+            default="o",
+        )
+        return "".join(status.tolist())
+
+    def windows(self, flags, window=10, fraction=0.5):
+        """The (first, last) image ranges over which the flags are set for
+        at least fraction of each window of consecutive images."""
+        flags = np.asarray(flags, dtype=np.float64)
+        window = min(window, len(flags))
+        if not window:
+            return []
+        mean = np.convolve(flags, np.ones(window) / window, mode="valid")
+        selected = np.zeros(len(flags), dtype=bool)
+        for start in np.flatnonzero(mean >= fraction):
+            selected[start : start + window] |= flags[start : start + window] > 0
+        edges = np.diff(np.concatenate(([0], selected.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        return [
+            (int(self.images[s]), int(self.images[e])) for s, e in zip(starts, ends)
+        ]
+
+    def max_relative_cell_deviation(self):
+        """The largest deviation of any unit cell parameter from its mean,
+        relative to that mean, or None if the cell was not recorded."""
+        if "unit_cell" not in self.columns:
+            return None
+        cells = self.columns["unit_cell"]
+        mean = cells.mean(axis=0)
+        return float(np.max(np.abs(cells - mean) / mean))
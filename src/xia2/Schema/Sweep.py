@@ -5,10 +5,16 @@
 from __future__ import annotations
 
 import os
+import time
 
-from xia2.Experts.FindImages import find_matching_images
+from xia2.Experts.FindImages import template_directory_number2image
 from xia2.Handlers.Phil import PhilIndex
 
+# file systems with coarse timestamps may not change the modification time of
+# a directory if another image is written within the same tick, so only trust
+# an unchanged modification time once it is older than this
+_MTIME_RESOLUTION_NS = 2_000_000_000
+
 
 def SweepFactory(template, directory, beam=None):
     """A factory which will return a list of sweep objects which match
@@ -65,6 +71,8 @@ class Sweep:
 
         # populate the rest of the structure
         self._images = []
+        self._imageset = None
+        self._directory_mtime = None
 
         if imageset is not None:
             self._imageset = imageset
@@ -120,28 +128,80 @@ class Sweep:
         if is_hdf5_name(os.path.join(self._directory, self._template)):
             return
 
-        images = find_matching_images(self._template, self._directory)
+        # new images change the modification time of the directory, so only
+        # look for them if this has changed since the last check
+        try:
+            mtime = os.stat(self._directory).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._directory_mtime:
+            return
+        if time.time_ns() - mtime > _MTIME_RESOLUTION_NS:
+            self._directory_mtime = mtime
+
+        if self._imageset is None:
+            self._imageset = self._load_imageset()
+            image_range = self._imageset.get_scan().get_image_range()
+            self._images = list(range(image_range[0], image_range[1] + 1))
+            return
 
-        if len(images) > len(self._images):
-            self._images = images
+        # images are written in order, so look for those following on from the
+        # end of this sweep rather than listing the whole directory
+        last_image = self._images[-1]
+        while self._image_exists(last_image + 1):
+            last_image += 1
+        if last_image == self._images[-1]:
+            return
 
-            from xia2.Schema import load_imagesets
+        from xia2.Schema import extend_imageset
 
-            imagesets = load_imagesets(
-                self._template,
-                self._directory,
-                id_image=self._id_image,
-                use_cache=False,
-                reversephi=PhilIndex.params.xia2.settings.input.reverse_phi,
-            )
+        imageset = extend_imageset(
+            self._template, self._directory, self._id_image, last_image
+        )
+        if imageset is None:
+            imageset = self._load_imageset()
 
-            max_images = 0
-            best_sweep = None
-            for imageset in imagesets:
-                scan = imageset.get_scan()
-                if scan is None:
-                    continue
-                if imageset.get_scan().get_num_images() > max_images:
-                    best_sweep = imageset
+        self._imageset = imageset
+        image_range = imageset.get_scan().get_image_range()
+        self._images = list(range(image_range[0], image_range[1] + 1))
 
-            self._imageset = best_sweep
+    def _image_exists(self, number):
+        try:
+            image = template_directory_number2image(
+                self._template, self._directory, number
+            )
+        except RuntimeError:
+            return False
+        return os.path.isfile(image)
+
+    def _load_imageset(self):
+        """Reload this sweep, reading all of the image headers, and return the
+        imageset with a scan which contains the first image of the sweep, or
+        the longest if this is not defined."""
+        from xia2.Schema import load_imagesets
+
+        imagesets = load_imagesets(
+            self._template,
+            self._directory,
+            use_cache=False,
+            reversephi=PhilIndex.params.xia2.settings.input.reverse_phi,
+        )
+
+        candidates = []
+        for imageset in imagesets:
+            scan = imageset.get_scan()
+            if scan is None:
+                continue
+            first, last = scan.get_image_range()
+            if self._id_image < 0 or first <= self._id_image <= last:
+                candidates.append(imageset)
+
+        if not candidates:
+            full_template_path = os.path.join(self._directory, self._template)
+            if self._id_image < 0:
+                raise RuntimeError("No sweep found for %s" % full_template_path)
+            raise RuntimeError(
+                "No sweep found for %s including image %d"
+                % (full_template_path, self._id_image)
+            )
+        return max(candidates, key=lambda i: i.get_scan().get_num_images())
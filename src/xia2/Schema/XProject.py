@@ -16,11 +16,58 @@ from xia2.Handlers.Syminfo import get_lattice
 from xia2.Handlers.XInfo import XInfo
 from xia2.Schema.XCrystal import XCrystal
 from xia2.Schema.XSample import XSample
+from xia2.Schema.XSweep import XSweep
 from xia2.Schema.XWavelength import XWavelength
 
 logger = logging.getLogger("xia2.Schema.XProject")
 
 
+def _skip_keys(data):
+    """Recursively drop dictionary keys which are not basic types, as for
+    json.dumps(skipkeys=True)."""
+    if isinstance(data, dict):
+        return {
+            k: _skip_keys(v)
+            for k, v in data.items()
+            if isinstance(k, (str, int, float, bool)) or k is None
+        }
+    if isinstance(data, (list, tuple)):
+        return [_skip_keys(v) for v in data]
+    return data
+
+
+def decode_dict_keys(data):
+    """Recursively decode possible float and int values."""
+    rv = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = decode_dict_keys(value)
+        try:
+            key = float(key)
+            if int(key) == key:
+                key = int(key)
+        except ValueError:
+            pass
+        rv[key] = value
+    return rv
+
+
+def _decode_msgpack_keys(data):
+    """Recursively convert dictionary keys as a round trip through json with
+    decode_dict_keys would: msgpack keeps the types of keys, whereas json makes
+    them all strings, e.g. True becomes "true" while "1" is decoded as 1."""
+    if isinstance(data, dict):
+        return decode_dict_keys(
+            {
+                k if isinstance(k, str) else json.dumps(k): _decode_msgpack_keys(v)
+                for k, v in data.items()
+            }
+        )
+    if isinstance(data, list):
+        return [_decode_msgpack_keys(v) for v in data]
+    return data
+
+
 class XProject:
     """A representation of a complete project. This will contain a dictionary
     of crystals."""
@@ -88,21 +135,6 @@ class XProject:
 
     @classmethod
     def from_json(cls, filename=None, string=None):
-        def _decode_dict(data):
-            """Recursively decode possible float and int values."""
-            rv = {}
-            for key, value in data.items():
-                if isinstance(value, dict):
-                    value = _decode_dict(value)
-                try:
-                    key = float(key)
-                    if int(key) == key:
-                        key = int(key)
-                except ValueError:
-                    pass
-                rv[key] = value
-            return rv
-
         assert [filename, string].count(None) == 1
         if filename:
             with open(filename, "rb") as f:
@@ -110,9 +142,64 @@ class XProject:
             base_path = os.path.dirname(filename)
         else:
             base_path = None
-        obj = json.loads(string, object_hook=_decode_dict)
+        obj = json.loads(string, object_hook=decode_dict_keys)
         return cls.from_dict(obj, base_path=base_path)
 
+    # compact binary project state - the project record, with the processing
+    # state of each sweep in a separate record following it, so that the state
+    # of a single sweep can be updated by appending a new record.
+
+    def as_msgpack(self, filename):
+        import msgpack
+
+        obj = self.to_dict()
+        sweep_records = []
+        for cname, cdict in obj["_crystals"].items():
+            for wname, wdict in cdict["_wavelengths"].items():
+                for sdict in wdict["_sweeps"]:
+                    state = {
+                        k: sdict.pop(k, None) for k in XSweep.processing_state_keys
+                    }
+                    key = "/".join((cname, wname, sdict["_name"]))
+                    sweep_records.append({"sweep": key, "state": state})
+        with open(filename, "wb") as fh:
+            fh.write(msgpack.packb(_skip_keys(obj)))
+            for record in sweep_records:
+                fh.write(msgpack.packb(_skip_keys(record)))
+
+    @staticmethod
+    def append_sweep_state(filename, sweep):
+        """Update the processing state of one sweep in a file written by
+        as_msgpack."""
+        import msgpack
+
+        from xia2.Handlers.Journal import sweep_key
+
+        record = {"sweep": sweep_key(sweep), "state": sweep.get_processing_state()}
+        with open(filename, "ab") as fh:
+            fh.write(msgpack.packb(_skip_keys(record)))
+
+    @classmethod
+    def from_msgpack(cls, filename):
+        import msgpack
+
+        states = {}
+        with open(filename, "rb") as fh:
+            unpacker = msgpack.Unpacker(fh, raw=False, strict_map_key=False)
+            obj = _decode_msgpack_keys(next(unpacker))
+            try:
+                for record in unpacker:
+                    states[record["sweep"]] = _decode_msgpack_keys(record["state"])
+            except ValueError:
+                # e.g. a partially written last record following a crash
+                pass
+        for cname, cdict in obj["_crystals"].items():
+            for wname, wdict in cdict["_wavelengths"].items():
+                for sdict in wdict["_sweeps"]:
+                    key = "/".join((cname, wname, sdict["_name"]))
+                    sdict.update(states.get(key, {}))
+        return cls.from_dict(obj, base_path=os.path.dirname(filename))
+
     def get_output(self):
         result = "Project: %s\n" % self._name
 
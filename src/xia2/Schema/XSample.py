@@ -45,10 +45,9 @@ class XSample:
         attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
         for a in attributes:
             if a[0] == "_sweeps":
-                sweeps = []
-                for sweep in a[1]:
-                    sweeps.append(sweep.to_dict())
-                obj[a[0]] = sweeps
+                # the sweeps are serialized in full by the parent xwavelength,
+                # only the names are needed to reference them from here
+                obj[a[0]] = [{"_name": sweep.get_name()} for sweep in a[1]]
             elif a[0] == "_crystal":
                 # don't serialize this since the parent xsample *should* contain
                 # the reference to the child xsweep
@@ -373,22 +373,8 @@ class XSweep:
         assert obj["__id__"] == "XSweep"
         return_obj = cls(name=None, sample=None, wavelength=None)
         for k, v in obj.items():
-            if k in ("_indexer", "_refiner", "_integrater") and v is not None:
-                from libtbx.utils import import_python_object
-
-                cls = import_python_object(
-                    import_path=".".join((v["__module__"], v["__name__"])),
-                    error_prefix="",
-                    target_must_be="",
-                    where_str="",
-                ).object
-                v = cls.from_dict(v)
-                if k == "_indexer":
-                    v.add_indexer_sweep(return_obj)
-                elif k == "_refiner":
-                    v.add_refiner_sweep(return_obj)
-                elif k == "_integrater":
-                    v.set_integrater_sweep(return_obj, reset=False)
+            if k in cls.processing_state_keys:
+                continue
             if isinstance(v, dict):
                 # if v.get('__id__') == 'ExperimentList':
                 # from dxtbx.model.experiment_list import ExperimentListFactory
@@ -398,16 +384,50 @@ class XSweep:
 
                     v = imageset_from_dict(v, check_format=False)
             setattr(return_obj, k, v)
-        if return_obj._indexer is not None and return_obj._integrater is not None:
-            return_obj._integrater._intgr_indexer = return_obj._indexer
-        if return_obj._integrater is not None and return_obj._refiner is not None:
-            return_obj._integrater._intgr_refiner = return_obj._refiner
-        if return_obj._indexer is not None and return_obj._refiner is not None:
-            return_obj._refiner._refinr_indexers[return_obj.get_epoch(1)] = (
-                return_obj._indexer
-            )
+        return_obj.set_processing_state(obj)
         return return_obj
 
+    # the parts of the sweep which change during processing
+    processing_state_keys = ("_indexer", "_refiner", "_integrater")
+
+    def get_processing_state(self):
+        """Serialize just the indexer, refiner and integrater of this sweep."""
+        return {
+            k: getattr(self, k).to_dict() if getattr(self, k) is not None else None
+            for k in self.processing_state_keys
+        }
+
+    def set_processing_state(self, obj):
+        """Restore the indexer, refiner and integrater of this sweep from the
+        output of get_processing_state (or to_dict). Any which were not
+        serialized are left unchanged."""
+        from libtbx.utils import import_python_object
+
+        for k in self.processing_state_keys:
+            v = obj.get(k)
+            if v is None:
+                continue
+            cls = import_python_object(
+                import_path=".".join((v["__module__"], v["__name__"])),
+                error_prefix="",
+                target_must_be="",
+                where_str="",
+            ).object
+            v = cls.from_dict(v)
+            if k == "_indexer":
+                v.add_indexer_sweep(self)
+            elif k == "_refiner":
+                v.add_refiner_sweep(self)
+            elif k == "_integrater":
+                v.set_integrater_sweep(self, reset=False)
+            setattr(self, k, v)
+        if self._indexer is not None and self._integrater is not None:
+            self._integrater._intgr_indexer = self._indexer
+        if self._integrater is not None and self._refiner is not None:
+            self._integrater._intgr_refiner = self._refiner
+        if self._indexer is not None and self._refiner is not None:
+            self._refiner._refinr_indexers[self.get_epoch(1)] = self._indexer
+
     def get_image_name(self, number):
         """Convert an image number into a name."""
 
@@ -1,14 +1,13 @@
 from __future__ import annotations
 
 import collections
+import copy
 import glob
 import itertools
 import logging
 import os
 
-from dials.command_line.dials_import import ManualGeometryUpdater
-from dials.util.options import geometry_phil_scope
-from dxtbx.imageset import ImageSequence
+from dxtbx.imageset import ImageSequence, ImageSetFactory
 from dxtbx.model.experiment_list import (
     BeamComparison,
     DetectorComparison,
@@ -19,7 +18,13 @@ from dxtbx.model.experiment_list import (
 from dxtbx.sequence_filenames import locate_files_matching_template_string
 from scitbx.array_family import flex
 
+from xia2.Experts.FindImages import template_directory_number2image
 from xia2.Handlers.Phil import PhilIndex
+from xia2.lib.lazy_import import lazy_import
+from xia2.Schema.ImageHeaders import imagesets_from_headers
+
+dials_import = lazy_import("dials.command_line.dials_import")
+dials_options = lazy_import("dials.util.options")
 
 logger = logging.getLogger("xia2.Schema")
 
@@ -79,12 +84,7 @@ def load_imagesets(
         )
         scan_tolerance = params.input.tolerance.scan.oscillation
 
-        # If diamond anvil cell data, always use dynamic shadowing
-        high_pressure = PhilIndex.params.dials.high_pressure.correction
-        format_kwargs = {
-            "dynamic_shadowing": params.input.format.dynamic_shadowing or high_pressure,
-            "multi_panel": params.input.format.multi_panel,
-        }
+        format_kwargs = _format_kwargs()
 
         if os.path.splitext(full_template_path)[-1] in known_hdf5_extensions:
             # if we are passed the correct file, use this, else look for a master
@@ -132,19 +132,40 @@ def load_imagesets(
                 paths = sorted(
                     locate_files_matching_template_string(full_template_path)
                 )
-                unhandled = []
-                experiments = ExperimentListFactory.from_filenames(
+                nproc = params.xia2.settings.multiprocessing.nproc
+                sequences = imagesets_from_headers(
+                    full_template_path,
                     paths,
-                    unhandled=unhandled,
-                    compare_beam=compare_beam,
-                    compare_detector=compare_detector,
-                    compare_goniometer=compare_goniometer,
-                    scan_tolerance=scan_tolerance,
-                    format_kwargs=format_kwargs,
-                )
-                assert len(unhandled) == 0, (
-                    "unhandled image files identified: %s" % unhandled
+                    format_kwargs,
+                    compare_beam,
+                    compare_detector,
+                    compare_goniometer,
+                    scan_tolerance,
+                    nproc=nproc if isinstance(nproc, int) else 1,
+                    cache_dir=params.xia2.settings.image_header_cache,
                 )
+                if sequences is not None:
+                    experiments = ExperimentList()
+                    for sequence in sequences:
+                        experiments.extend(
+                            ExperimentListFactory.from_imageset_and_crystal(
+                                sequence, None
+                            )
+                        )
+                else:
+                    unhandled = []
+                    experiments = ExperimentListFactory.from_filenames(
+                        paths,
+                        unhandled=unhandled,
+                        compare_beam=compare_beam,
+                        compare_detector=compare_detector,
+                        compare_goniometer=compare_goniometer,
+                        scan_tolerance=scan_tolerance,
+                        format_kwargs=format_kwargs,
+                    )
+                    assert len(unhandled) == 0, (
+                        "unhandled image files identified: %s" % unhandled
+                    )
 
             else:
                 from xia2.Handlers.CommandLine import CommandLine
@@ -184,10 +205,10 @@ def load_imagesets(
         update_geometry = []
 
         # Then add manual geometry
-        work_phil = geometry_phil_scope.format(params.input)
-        diff_phil = geometry_phil_scope.fetch_diff(source=work_phil)
+        work_phil = dials_options.geometry_phil_scope.format(params.input)
+        diff_phil = dials_options.geometry_phil_scope.fetch_diff(source=work_phil)
         if diff_phil.as_str() != "":
-            update_geometry.append(ManualGeometryUpdater(params.input))
+            update_geometry.append(dials_import.ManualGeometryUpdater(params.input))
 
         imageset_list = []
         for imageset in imagesets:
@@ -198,20 +219,7 @@ def load_imagesets(
 
         for imageset in imagesets:
             scan = imageset.get_scan()
-            exposure_times = scan.get_exposure_times()
-            epochs = scan.get_epochs()
-            if exposure_times.all_eq(0) or exposure_times[0] == 0:
-                exposure_times = flex.double(exposure_times.size(), 1)
-                scan.set_exposure_times(exposure_times)
-            elif not exposure_times.all_gt(0):
-                exposure_times = flex.double(exposure_times.size(), exposure_times[0])
-                scan.set_exposure_times(exposure_times)
-            if epochs.size() > 1 and not epochs.all_gt(0):
-                if epochs[0] == 0:
-                    epochs[0] = 1
-                for i in range(1, epochs.size()):
-                    epochs[i] = epochs[i - 1] + exposure_times[i - 1]
-                scan.set_epochs(epochs)
+            _fix_scan_times(scan)
             _id_image = scan.get_image_range()[0]
             imageset_cache[full_template_path][_id_image] = imageset
 
@@ -235,6 +243,90 @@ def load_imagesets(
     return list(imageset_cache[full_template_path].values())
 
 
+def extend_imageset(template, directory, id_image, last_image):
+    """Extend the cached imageset which starts at id_image to end at
+    last_image, reading the headers of only the new images. The beam, detector
+    and goniometer models (including any updates applied on loading) are kept.
+    Returns the extended imageset, or None if the imageset is not in the cache
+    or the new images could not be read, in which case the caller should
+    reload the imagesets with use_cache=False."""
+
+    full_template_path = os.path.join(directory, template)
+    imageset = imageset_cache.get(full_template_path, {}).get(id_image)
+    if imageset is None:
+        return None
+
+    scan = imageset.get_scan()
+    first_image, current_last_image = scan.get_image_range()
+    if last_image <= current_last_image:
+        return imageset
+
+    params = PhilIndex.params.xia2.settings
+    scan_tolerance = params.input.tolerance.scan.oscillation
+    format_class = imageset.get_format_class()
+    format_kwargs = _format_kwargs()
+
+    scan = copy.deepcopy(scan)
+    try:
+        for number in range(current_last_image + 1, last_image + 1):
+            image = template_directory_number2image(template, directory, number)
+            fmt = format_class.get_instance(image, **format_kwargs)
+            scan.append(fmt.get_scan(), scan_tolerance=scan_tolerance)
+    except Exception as e:
+        logger.debug(
+            "Unable to extend %s to image %d: %s", full_template_path, last_image, e
+        )
+        return None
+    _fix_scan_times(scan)
+
+    extended = ImageSetFactory.make_sequence(
+        full_template_path,
+        list(range(first_image, last_image + 1)),
+        format_class=format_class,
+        beam=imageset.get_beam(),
+        detector=imageset.get_detector(),
+        goniometer=imageset.get_goniometer(),
+        scan=scan,
+        format_kwargs=format_kwargs,
+    )
+    logger.debug(
+        "Extended %s to images %d to %d",
+        full_template_path,
+        first_image,
+        last_image,
+    )
+    imageset_cache[full_template_path][id_image] = extended
+    return extended
+
+
+def _format_kwargs():
+    params = PhilIndex.params.xia2.settings
+    # If diamond anvil cell data, always use dynamic shadowing
+    high_pressure = PhilIndex.params.dials.high_pressure.correction
+    return {
+        "dynamic_shadowing": params.input.format.dynamic_shadowing or high_pressure,
+        "multi_panel": params.input.format.multi_panel,
+    }
+
+
+def _fix_scan_times(scan):
+    """Replace missing exposure times and epochs in the scan."""
+    exposure_times = scan.get_exposure_times()
+    epochs = scan.get_epochs()
+    if exposure_times.all_eq(0) or exposure_times[0] == 0:
+        exposure_times = flex.double(exposure_times.size(), 1)
+        scan.set_exposure_times(exposure_times)
+    elif not exposure_times.all_gt(0):
+        exposure_times = flex.double(exposure_times.size(), exposure_times[0])
+        scan.set_exposure_times(exposure_times)
+    if epochs.size() > 1 and not epochs.all_gt(0):
+        if epochs[0] == 0:
+            epochs[0] = 1
+        for i in range(1, epochs.size()):
+            epochs[i] = epochs[i - 1] + exposure_times[i - 1]
+        scan.set_epochs(epochs)
+
+
 def update_with_reference_geometry(imagesets, reference_geometry_list):
     assert reference_geometry_list is not None
     assert len(reference_geometry_list) >= 1
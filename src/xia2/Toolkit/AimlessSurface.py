@@ -1,47 +1,80 @@
 from __future__ import annotations
 
+import functools
 import math
 
 import numpy as np
-import scitbx.math
 
 
 def order_from_nterm(n):
     return {0: 0, 80: 8, 3: 1, 8: 2, 15: 3, 48: 6, 99: 9, 35: 5, 24: 4, 63: 7}[n]
 
 
-def evaluate_1degree(ClmList):
+def _associated_legendre(order, x):
+    """The associated Legendre functions P_l^m(x), including the Condon-Shortley
+    phase, for 0 <= m <= l <= order, as a dict keyed by (l, m)."""
+    P = {}
+    somx2 = np.sqrt((1.0 - x) * (1.0 + x))
+    pmm = np.ones_like(x)
+    for m in range(order + 1):
+        if m > 0:
+            pmm = -(2 * m - 1) * somx2 * pmm
+        P[(m, m)] = pmm
+        if m < order:
+            P[(m + 1, m)] = x * (2 * m + 1) * pmm
+        for l in range(m + 2, order + 1):
+            P[(l, m)] = (
+                (2 * l - 1) * x * P[(l - 1, m)] - (l + m - 1) * P[(l - 2, m)]
+            ) / (l - m)
+    return P
+
+
+@functools.lru_cache(maxsize=None)
+def basis_1degree(order):
+    """The real spherical harmonics for 1 <= l <= order on a 1 degree grid of
+    theta (0-180) and phi (0-360), as an array of shape (nterm, 181, 361) in
+    the order of the Aimless coefficients, cached for each order."""
     d2r = math.pi / 180.0
-    order = order_from_nterm(len(ClmList))
-    lfg = scitbx.math.log_factorial_generator(2 * order + 1)
-    nsssphe = scitbx.math.nss_spherical_harmonics(order, 50000, lfg)
-    Clm = {}
-    idx = 0
+    theta = np.arange(0, 181) * d2r
+    phi = np.arange(0, 361) * d2r
+    P = _associated_legendre(order, np.cos(theta))
+    sqrt2 = math.sqrt(2)
+
+    basis = []
     for l in range(1, order + 1):
         for m in range(-l, l + 1):
-            Clm[(l, m)] = ClmList[idx]
-            idx += 1
+            am = abs(m)
+            # normalisation of the complex spherical harmonic Y_l^|m|
+            norm = math.sqrt(
+                (2 * l + 1)
+                / (4 * math.pi)
+                * math.factorial(l - am)
+                / math.factorial(l + am)
+            )
+            # Convert from complex to real according to
+            # http://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
+            if m < 0:
+                azimuthal = sqrt2 * ((-1) ** am) * np.sin(am * phi)
+            elif m == 0:
+                azimuthal = np.ones_like(phi)
+            else:
+                azimuthal = sqrt2 * ((-1) ** am) * np.cos(am * phi)
+            basis.append(np.outer(norm * P[(l, am)], azimuthal))
 
-    abscor = np.empty((1 + 180 // 1, 1 + 360 // 1), float, "C")
-    sqrt2 = math.sqrt(2)
-    for t in range(0, 181, 1):
-        for p in range(0, 361, 1):
-            a = 1.0
-            for l in range(1, order + 1):
-                for m in range(-l, l + 1):
-                    # Ylm = nsssphe.spherical_harmonic(l, m, t*d2r, p*d2r)
-                    # Convert from complex to real according to
-                    # http://en.wikipedia.org/wiki/Spherical_harmonics#Real_form
-                    Ylm = nsssphe.spherical_harmonic(l, abs(m), t * d2r, p * d2r)
-                    if m < 0:
-                        a += Clm[(l, m)] * sqrt2 * ((-1) ** m) * Ylm.imag
-                    elif m == 0:
-                        assert Ylm.imag == 0.0
-                        a += Clm[(l, m)] * Ylm.real
-                    else:
-                        a += Clm[(l, m)] * sqrt2 * ((-1) ** m) * Ylm.real
-            abscor[(t // 1, p // 1)] = a
-    return abscor
+    basis = np.array(basis).reshape(-1, theta.size, phi.size)
+    basis.setflags(write=False)
+    return basis
+
+
+def evaluate_1degree(ClmList):
+    """Evaluate the absorption surface 1 + sum Clm Ylm on a 1 degree grid of
+    theta (rows) and phi (columns)."""
+    order = order_from_nterm(len(ClmList))
+    if order == 0:
+        return np.ones((181, 361))
+    return 1.0 + np.tensordot(
+        np.array(ClmList, dtype=float), basis_1degree(order), axes=1
+    )
 
 
 def generate_map(abscor, png_filename):
@@ -50,9 +83,11 @@ def generate_map(abscor, png_filename):
     matplotlib.use("Agg")
     from matplotlib import pyplot
 
-    pyplot.imshow(abscor)
-    pyplot.colorbar()
-    pyplot.savefig(png_filename)
+    fig, ax = pyplot.subplots()
+    im = ax.imshow(abscor)
+    fig.colorbar(im, ax=ax)
+    fig.savefig(png_filename)
+    pyplot.close(fig)
 
 
 def scrape_coefficients(log_file_name=None, log=None):
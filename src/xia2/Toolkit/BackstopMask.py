@@ -16,9 +16,14 @@ and Mosflm."""
 
 from __future__ import annotations
 
+import base64
 import binascii
+import hashlib
 import logging
 import math
+import re
+
+import numpy as np
 
 from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
 
@@ -234,7 +239,8 @@ class BackstopMask:
 
         r = self.rectangle(header)
 
-        data = open(cbf_in, "rb").read()
+        with open(cbf_in, "rb") as fh:
+            data = fh.read()
 
         start_tag = binascii.unhexlify("0c1a04d5")
 
@@ -245,37 +251,42 @@ class BackstopMask:
         fast = 0
         slow = 0
         length = 0
+        size = None
 
-        for record in cbf_header.split("\n"):
+        for record in cbf_header.decode("latin-1").split("\n"):
             if "X-Binary-Size-Fastest-Dimension" in record:
                 fast = int(record.split()[-1])
             elif "X-Binary-Size-Second-Dimension" in record:
                 slow = int(record.split()[-1])
             elif "X-Binary-Number-of-Elements" in record:
                 length = int(record.split()[-1])
+            elif record.startswith("X-Binary-Size:"):
+                size = int(record.split()[-1])
 
         assert length == fast * slow
         assert fast == int(header["size"][0])
         assert slow == int(header["size"][1])
 
-        values = unpack_values(data[data_offset:], length)
-
-        # or perhaps mask it out a little more cleverly
-
-        limits = r.limits()
+        values = unpack_values(memoryview(data)[data_offset:], length)
 
-        for x in range(int(limits[0]), int(limits[1]) + 1):
-            for y in range(int(limits[2]), int(limits[3]) + 1):
-                j = y * fast + x
-                if r.is_inside((x + 0.5, y + 0.5)):
-                    values[j] = -3
+        values.reshape(slow, fast)[r.mask(fast, slow)] = -3
 
-        # and write out the updated file
+        # and write out the updated file, with the binary section header
+        # updated for the new compressed data, retaining anything after it
 
-        result = cbf_header + start_tag + pack_values(values)
+        packed = pack_values(values)
+        trailer = data[data_offset + size :] if size is not None else b""
+        cbf_header = re.sub(
+            rb"X-Binary-Size: *\d+", b"X-Binary-Size: %d" % len(packed), cbf_header
+        )
+        cbf_header = re.sub(
+            rb"Content-MD5: *\S+",
+            b"Content-MD5: " + base64.b64encode(hashlib.md5(packed).digest()),
+            cbf_header,
+        )
 
-        with open(cbf_out, "w") as fh:
-            fh.write(result)
+        with open(cbf_out, "wb") as fh:
+            fh.write(cbf_header + start_tag + packed + trailer)
 
     def rectangle(self, header):
         """Return a configured rectangle object to test whether pixels are
@@ -330,6 +341,30 @@ class rectangle:
 
         return min(xs), max(xs), min(ys), max(ys)
 
+    def mask(self, nx, ny):
+        """Rasterise the rectangle as a boolean array of shape (ny, nx), true
+        for the pixels with centres inside."""
+
+        mask = np.zeros((ny, nx), dtype=bool)
+        x0, x1, y0, y1 = self.limits()
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1) + 1, nx), min(int(y1) + 1, ny)
+        if x0 >= x1 or y0 >= y1:
+            return mask
+
+        x = np.arange(x0, x1)[np.newaxis, :] + 0.5
+        y = np.arange(y0, y1)[:, np.newaxis] + 0.5
+        inside = np.ones((y1 - y0, x1 - x0), dtype=bool)
+        for (a, b, c), sign in (
+            (self._l12, self._in12),
+            (self._l23, self._in23),
+            (self._l34, self._in34),
+            (self._l41, self._in41),
+        ):
+            inside &= sign * (a * x + b * y + c) >= 0.0
+        mask[y0:y1, x0:x1] = inside
+        return mask
+
     def is_inside(self, p):
         if self._in12 * self._evaluate(self._l12, p) < 0.0:
             return False
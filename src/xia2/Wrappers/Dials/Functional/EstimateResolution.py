@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+import iotbx.phil
+import libtbx.phil
+from dials.array_family import flex
+from dials.command_line.estimate_resolution import output_html_report
+from dials.util import resolution_analysis
+from dxtbx.model import ExperimentList
+
+from xia2.Driver.timing import record_step
+from xia2.lib.bits import _get_number
+from xia2.Modules.SSX.util import log_to_file, run_in_directory
+
+xia2_logger = logging.getLogger(__name__)
+
+phil_scope = iotbx.phil.parse(resolution_analysis.phil_str)
+
+
+class EstimateResolution:
+    """Estimate the resolution limits of scaled experiments and reflections in
+    memory, as dials.estimate_resolution, writing the same html report and
+    json plots. The setters and getters match those of the
+    xia2.Wrappers.Dials.EstimateResolution program wrapper."""
+
+    def __init__(self, working_directory: Path | None = None) -> None:
+        if working_directory:
+            self._working_directory = working_directory
+        else:
+            self._working_directory = Path.cwd()
+
+        self._params: libtbx.phil.scope_extract = phil_scope.extract()
+        self._xpid = _get_number()
+        self._resolution: dict[str, float | None] = {}
+
+    def set_nbins(self, nbins: int) -> None:
+        self._params.nbins = nbins
+
+    def set_limit_rmerge(self, limit_rmerge: float | None) -> None:
+        self._params.rmerge = limit_rmerge
+
+    def set_limit_completeness(self, limit_completeness: float | None) -> None:
+        self._params.completeness = limit_completeness
+
+    def set_limit_cc_half(self, limit_cc_half: float | None) -> None:
+        self._params.cc_half = limit_cc_half
+
+    def set_cc_half_fit(self, cc_half_fit: str) -> None:
+        self._params.cc_half_fit = cc_half_fit
+
+    def set_cc_half_significance_level(
+        self, cc_half_significance_level: float | None
+    ) -> None:
+        self._params.cc_half_significance_level = cc_half_significance_level
+
+    def set_limit_isigma(self, limit_isigma: float | None) -> None:
+        self._params.isigma = limit_isigma
+
+    def set_limit_misigma(self, limit_misigma: float | None) -> None:
+        self._params.misigma = limit_misigma
+
+    def set_labels(self, labels: str) -> None:
+        self._params.labels = labels
+
+    def get_xpid(self) -> int:
+        return self._xpid
+
+    def get_log_file(self) -> str:
+        return f"{self._xpid}_dials.estimate_resolution.log"
+
+    def get_html(self) -> str:
+        return str(
+            self._working_directory / f"{self._xpid}_dials.estimate_resolution.html"
+        )
+
+    def get_json(self) -> str:
+        return str(
+            self._working_directory / f"{self._xpid}_dials.estimate_resolution.json"
+        )
+
+    def get_resolution_rmerge(self) -> float | None:
+        return self._resolution.get("rmerge")
+
+    def get_resolution_completeness(self) -> float | None:
+        return self._resolution.get("completeness")
+
+    def get_resolution_cc_half(self) -> float | None:
+        return self._resolution.get("cc_half")
+
+    def get_resolution_isigma(self) -> float | None:
+        return self._resolution.get("isigma")
+
+    def get_resolution_misigma(self) -> float | None:
+        return self._resolution.get("misigma")
+
+    def run(self, expts: ExperimentList, refls: flex.reflection_table) -> None:
+        xia2_logger.debug("Running dials.estimate_resolution")
+        with (
+            run_in_directory(self._working_directory),
+            log_to_file(self.get_log_file()) as dials_logger,
+            record_step("dials.estimate_resolution"),
+        ):
+            resolutionizer = (
+                resolution_analysis.Resolutionizer.from_reflections_and_experiments(
+                    [refls], expts, self._params
+                )
+            )
+            plots = {}
+            for metric in resolution_analysis.metrics:
+                name = metric.name.lower()
+                limit = getattr(self._params, name, None)
+                if not limit:
+                    continue
+                try:
+                    result = resolutionizer.resolution(metric, limit=limit)
+                except RuntimeError as e:
+                    dials_logger.info(f"Resolution fit against {name} failed: {e}")
+                    continue
+                self._resolution[name] = result.d_min
+                dials_logger.info(f"Resolution {name}: {result.d_min:.2f}")
+                plots[name] = resolution_analysis.plot_result(metric, result)
+
+            output_html_report(plots, self.get_html())
+            with open(self.get_json(), "w") as fh:
+                json.dump(plots, fh)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+import libtbx.phil
+from dials.algorithms.scaling import scale_and_filter
+from dials.array_family import flex
+from dials.command_line.scale import phil_scope, run_scaling
+from dxtbx.model import ExperimentList
+
+from xia2.Driver.timing import record_step
+from xia2.Handlers.Citations import Citations
+from xia2.lib.bits import _get_number
+from xia2.Modules.SSX.util import log_to_file, run_in_directory
+from xia2.Wrappers.Dials.Functional import diff_phil_from_params_and_scope
+
+xia2_logger = logging.getLogger(__name__)
+
+
+class Scale:
+    """Run dials.scale on experiments and reflections in memory. Only the
+    html report (and the scale and filter results, if filtering) are written
+    to disk - the scaled experiments and reflections are returned."""
+
+    def __init__(self, working_directory: Path | None = None) -> None:
+        if working_directory:
+            self._working_directory = working_directory
+        else:
+            self._working_directory = Path.cwd()
+
+        self._params: libtbx.phil.scope_extract = phil_scope.extract()
+        self._xpid = _get_number()
+        self._html = f"{self._xpid}_dials.scale.html"
+        self._scale_and_filter_filename = f"{self._xpid}_scale_and_filter_results.json"
+        self._scale_and_filter_results = None
+
+    def set_phil_parameters(self, parameters: list[str]) -> None:
+        """Set the parameters from dials.scale command line parameters, e.g.
+        from DialsScale().get_phil_parameters()."""
+        interpreter = phil_scope.command_line_argument_interpreter()
+        working_phil = phil_scope.fetch(sources=interpreter.process(args=parameters))
+        self._params = working_phil.extract()
+
+    def get_xpid(self) -> int:
+        return self._xpid
+
+    def get_log_file(self) -> str:
+        return f"{self._xpid}_dials.scale.log"
+
+    def get_html(self) -> str:
+        return self._html
+
+    def get_scale_and_filter_filename(self) -> str:
+        return self._scale_and_filter_filename
+
+    def get_scale_and_filter_results(self) -> scale_and_filter.AnalysisResults:
+        return self._scale_and_filter_results
+
+    def run(
+        self, expts: ExperimentList, refls: flex.reflection_table
+    ) -> tuple[ExperimentList, flex.reflection_table]:
+        xia2_logger.debug("Running dials.scale")
+        Citations.cite("dials.scale")
+        self._params.output.html = self._html
+        if self._params.filtering.method:
+            self._params.output.scale_and_filter_results = (
+                self._scale_and_filter_filename
+            )
+
+        with (
+            run_in_directory(self._working_directory),
+            log_to_file(self.get_log_file()) as dials_logger,
+            record_step("dials.scale"),
+        ):
+            dials_logger.info(diff_phil_from_params_and_scope(self._params, phil_scope))
+            expts, refls = run_scaling(self._params, expts, [refls])
+
+            if self._params.filtering.method:
+                with open(self._scale_and_filter_filename) as fh:
+                    self._scale_and_filter_results = (
+                        scale_and_filter.AnalysisResults.from_dict(json.load(fh))
+                    )
+
+        return expts, refls
@@ -7,6 +7,7 @@ import os
 
 from xia2.Driver.DriverFactory import DriverFactory
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema.PerImageStatistics import PerImageStatistics
 
 logger = logging.getLogger("xia2.Wrappers.Dials.Integrate")
 
@@ -221,7 +222,8 @@ def Integrate(DriverType=None):
             with open(self._integration_report_filename) as fh:
                 self._integration_report = json.load(fh)
 
-            self._per_image_statistics = {}
+            images = []
+            columns = {"isigi": [], "isig_tot": [], "rmsd_pixel": [], "strong": []}
             table = self._integration_report["tables"]["integration.image.summary"]
             for row in table["rows"]:
                 n_ref = float(row["n_prf"])
@@ -231,11 +233,11 @@ def Integrate(DriverType=None):
                     ios = float(row["ios_sum"])
                     n_ref = float(row["n_sum"])
                 # XXX this +1 might need changing if James changes what is output in report.json
-                self._per_image_statistics[int(row["image"]) + 1] = {
-                    "isigi": ios,
-                    "isig_tot": ios * math.sqrt(n_ref),
-                    "rmsd_pixel": float(row["rmsd_xy"]),
-                    "strong": n_ref,
-                }
+                images.append(int(row["image"]) + 1)
+                columns["isigi"].append(ios)
+                columns["isig_tot"].append(ios * math.sqrt(n_ref))
+                columns["rmsd_pixel"].append(float(row["rmsd_xy"]))
+                columns["strong"].append(n_ref)
+            self._per_image_statistics = PerImageStatistics(images, columns)
 
     return IntegrateWrapper()
@@ -286,61 +286,52 @@ def DialsScale(DriverType=None, decay_correction=None):
         def get_scale_and_filter_results(self) -> scale_and_filter.AnalysisResults:
             return self._scale_and_filter_results
 
-        def scale(self):
-            """Actually perform the scaling."""
-            Citations.cite("dials.scale")
-            self.clear_command_line()  # reset the command line in case has already
-            # been run previously
-
-            assert len(self._experiments_json)
-            assert len(self._reflection_files)
-            assert len(self._experiments_json) == len(self._reflection_files)
-
-            for f in self._experiments_json + self._reflection_files:
-                assert os.path.isfile(f)
-                self.add_command_line(f)
+        def get_phil_parameters(self):
+            """The dials.scale parameters, other than the input and output
+            files, e.g. to run the scaling within this process."""
+            parameters = []
 
             nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
             if isinstance(nproc, int) and nproc > 1:
-                self.add_command_line(f"nproc={nproc}")
+                parameters.append(f"nproc={nproc}")
 
             if self._anomalous:
-                self.add_command_line("anomalous=True")
+                parameters.append("anomalous=True")
 
             if self._intensities == "summation":
-                self.add_command_line("intensity_choice=sum")
+                parameters.append("intensity_choice=sum")
             elif self._intensities == "profile":
-                self.add_command_line("intensity_choice=profile")
+                parameters.append("intensity_choice=profile")
 
             # Handle all model options. Model can be none - would trigger auto
             # models in dials.scale.
             if self._model is not None:
-                self.add_command_line(f"model={self._model}")
+                parameters.append(f"model={self._model}")
                 # Decay correction can refer to any model (physical, array, KB)
                 if self._bfactor:
-                    self.add_command_line(f"{self._model}.decay_correction=True")
+                    parameters.append(f"{self._model}.decay_correction=True")
                 else:
-                    self.add_command_line(f"{self._model}.decay_correction=False")
+                    parameters.append(f"{self._model}.decay_correction=False")
 
             if self._model in ("physical", "dose_decay", "array"):
                 # These options can refer to array, physical or dose_decay model
                 if self._absorption_correction:
-                    self.add_command_line(f"{self._model}.absorption_correction=True")
+                    parameters.append(f"{self._model}.absorption_correction=True")
                 else:
-                    self.add_command_line(f"{self._model}.absorption_correction=False")
+                    parameters.append(f"{self._model}.absorption_correction=False")
 
             if self._model in ("physical", "array"):
                 # These options can refer to array, physical or dose_decay model
                 if self._bfactor and self._brotation is not None:
-                    self.add_command_line(
+                    parameters.append(
                         f"{self._model}.decay_interval={self._brotation:g}"
                     )
 
             if self._model == "dose_decay" and self._share_decay is not None:
-                self.add_command_line(f"{self._model}.share.decay={self._share_decay}")
+                parameters.append(f"{self._model}.share.decay={self._share_decay}")
 
             if self._model == "dose_decay" and self._resolution_dependence is not None:
-                self.add_command_line(
+                parameters.append(
                     f"{self._model}.resolution_dependence={self._resolution_dependence}"
                 )
 
@@ -350,75 +341,125 @@ def DialsScale(DriverType=None, decay_correction=None):
                 and self._absorption_correction
                 and self._lmax is not None
             ):
-                self.add_command_line(f"{self._model}.lmax={self._lmax}")
+                parameters.append(f"{self._model}.lmax={self._lmax}")
             if self._absorption_level:
-                self.add_command_line(f"absorption_level={self._absorption_level}")
+                parameters.append(f"absorption_level={self._absorption_level}")
 
             # 'Spacing' i.e. scale interval only relevant to physical model.
             if self._model in ("physical", "dose_decay") and self._spacing:
-                self.add_command_line(f"{self._model}.scale_interval={self._spacing:g}")
+                parameters.append(f"{self._model}.scale_interval={self._spacing:g}")
             if self._model == "physical" and self._surface_weight:
-                self.add_command_line(
+                parameters.append(
                     f"{self._model}.surface_weight={self._surface_weight}"
                 )
             if self._shared_absorption:
-                self.add_command_line("share.absorption=True")
+                parameters.append("share.absorption=True")
 
-            self.add_command_line(f"full_matrix={self._full_matrix}")
+            parameters.append(f"full_matrix={self._full_matrix}")
             if self._error_model:
-                self.add_command_line(f"error_model={self._error_model}")
+                parameters.append(f"error_model={self._error_model}")
             if self._error_model_grouping:
-                self.add_command_line(
-                    f"error_model.grouping={self._error_model_grouping}"
-                )
+                parameters.append(f"error_model.grouping={self._error_model_grouping}")
             if self._error_model_groups and self._error_model_grouping == "grouped":
                 for g in self._error_model_groups:
-                    self.add_command_line(f"error_model_group={g}")
+                    parameters.append(f"error_model_group={g}")
             if self._outlier_rejection:
-                self.add_command_line(f"outlier_rejection={self._outlier_rejection}")
+                parameters.append(f"outlier_rejection={self._outlier_rejection}")
 
             if self._min_partiality is not None:
-                self.add_command_line(f"min_partiality={self._min_partiality}")
+                parameters.append(f"min_partiality={self._min_partiality}")
 
             if self._partiality_cutoff is not None:
-                self.add_command_line(f"partiality_cutoff={self._partiality_cutoff}")
+                parameters.append(f"partiality_cutoff={self._partiality_cutoff}")
 
             # next any 'generic' parameters
 
             if self._isigma_selection is not None:
-                self.add_command_line(
+                parameters.append(
                     "reflection_selection.Isigma_range={:f},{:f}".format(
                         *tuple(self._isigma_selection)
                     )
                 )
 
             if self._reflection_selection_method is not None:
-                self.add_command_line(
+                parameters.append(
                     f"reflection_selection.method={self._reflection_selection_method}"
                 )
 
             if self._d_min is not None:
-                self.add_command_line(f"cut_data.d_min={self._d_min:g}")
+                parameters.append(f"cut_data.d_min={self._d_min:g}")
 
             if self._d_max is not None:
-                self.add_command_line(f"cut_data.d_max={self._d_max:g}")
+                parameters.append(f"cut_data.d_max={self._d_max:g}")
 
             if self._cycles is not None:
-                self.add_command_line(f"max_iterations={self._cycles}")
+                parameters.append(f"max_iterations={self._cycles}")
 
             if self._outlier_zmax:
-                self.add_command_line(f"outlier_zmax={self._outlier_zmax}")
+                parameters.append(f"outlier_zmax={self._outlier_zmax}")
 
             if self._n_resolution_bins:
-                self.add_command_line(f"n_resolution_bins={self._n_resolution_bins}")
+                parameters.append(f"n_resolution_bins={self._n_resolution_bins}")
             if self._n_absorption_bins:
-                self.add_command_line(f"n_absorption_bins={self._n_absorption_bins}")
+                parameters.append(f"n_absorption_bins={self._n_absorption_bins}")
             if self._best_unit_cell is not None:
-                self.add_command_line(
+                parameters.append(
                     "best_unit_cell={},{},{},{},{},{}".format(*self._best_unit_cell)
                 )
             if self._overwrite_existing_models is not None:
-                self.add_command_line("overwrite_existing_models=True")
+                parameters.append("overwrite_existing_models=True")
+
+            if self._crystal_name:
+                parameters.append(f"output.crystal_name={self._crystal_name}")
+
+            if self._project_name:
+                parameters.append(f"output.project_name={self._project_name}")
+
+            if self._filtering_method:
+                parameters.append(f"filtering.method={self._filtering_method}")
+                if self._deltacchalf_max_cycles:
+                    parameters.append(
+                        f"filtering.deltacchalf.max_cycles={self._deltacchalf_max_cycles}"
+                    )
+                if self._deltacchalf_max_percent_removed:
+                    parameters.append(
+                        f"filtering.deltacchalf.max_percent_removed={self._deltacchalf_max_percent_removed}"
+                    )
+                if self._deltacchalf_min_completeness:
+                    parameters.append(
+                        f"filtering.deltacchalf.min_completeness={self._deltacchalf_min_completeness}"
+                    )
+                if self._deltacchalf_mode:
+                    parameters.append(
+                        f"filtering.deltacchalf.mode={self._deltacchalf_mode}"
+                    )
+                if self._deltacchalf_group_size:
+                    parameters.append(
+                        f"filtering.deltacchalf.group_size={self._deltacchalf_group_size}"
+                    )
+                if self._deltacchalf_stdcutoff:
+                    parameters.append(
+                        f"filtering.deltacchalf.stdcutoff={self._deltacchalf_stdcutoff}"
+                    )
+
+            return parameters
+
+        def scale(self):
+            """Actually perform the scaling."""
+            Citations.cite("dials.scale")
+            self.clear_command_line()  # reset the command line in case has already
+            # been run previously
+
+            assert len(self._experiments_json)
+            assert len(self._reflection_files)
+            assert len(self._experiments_json) == len(self._reflection_files)
+
+            for f in self._experiments_json + self._reflection_files:
+                assert os.path.isfile(f)
+                self.add_command_line(f)
+
+            for parameter in self.get_phil_parameters():
+                self.add_command_line(parameter)
 
             if not self._scaled_experiments:
                 self._scaled_experiments = os.path.join(
@@ -442,44 +483,13 @@ def DialsScale(DriverType=None, decay_correction=None):
                 )
             self.add_command_line(f"output.html={self._html}")
 
-            if self._crystal_name:
-                self.add_command_line(f"output.crystal_name={self._crystal_name}")
-
-            if self._project_name:
-                self.add_command_line(f"output.project_name={self._project_name}")
-
             if self._filtering_method:
-                self.add_command_line(f"filtering.method={self._filtering_method}")
                 self._scale_and_filter_filename = (
                     f"{self.get_xpid()}_scale_and_filter_results.json"
                 )
                 self.add_command_line(
                     f"output.scale_and_filter_results={self._scale_and_filter_filename}"
                 )
-                if self._deltacchalf_max_cycles:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.max_cycles={self._deltacchalf_max_cycles}"
-                    )
-                if self._deltacchalf_max_percent_removed:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.max_percent_removed={self._deltacchalf_max_percent_removed}"
-                    )
-                if self._deltacchalf_min_completeness:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.min_completeness={self._deltacchalf_min_completeness}"
-                    )
-                if self._deltacchalf_mode:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.mode={self._deltacchalf_mode}"
-                    )
-                if self._deltacchalf_group_size:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.group_size={self._deltacchalf_group_size}"
-                    )
-                if self._deltacchalf_stdcutoff:
-                    self.add_command_line(
-                        f"filtering.deltacchalf.stdcutoff={self._deltacchalf_stdcutoff}"
-                    )
 
             self.add_command_line(f"output.experiments={self._scaled_experiments}")
             self.add_command_line(f"output.reflections={self._scaled_reflections}")
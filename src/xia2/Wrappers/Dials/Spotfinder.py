@@ -40,6 +40,9 @@ def Spotfinder(DriverType=None):
         def set_input_sweep_filename(self, sweep_filename):
             self._input_sweep_filename = sweep_filename
 
+        def get_input_sweep_filename(self):
+            return self._input_sweep_filename
+
         def set_output_sweep_filename(self, sweep_filename):
             self._output_sweep_filename = sweep_filename
 
@@ -52,6 +55,15 @@ def Spotfinder(DriverType=None):
         def get_output_sweep_filename(self):
             return self._output_sweep_filename
 
+        def get_hot_mask_filename(self):
+            """The hot mask written for the (single) imageset, if any."""
+            if not self._write_hot_mask:
+                return None
+            return os.path.join(
+                self.get_working_directory(),
+                "%s_0.pickle" % (self._hot_mask_prefix or "hot_mask"),
+            )
+
         def set_input_spot_filename(self, spot_filename):
             self._input_spot_filename = spot_filename
 
@@ -94,6 +106,23 @@ def Spotfinder(DriverType=None):
         def set_maximum_trusted_value(self, maximum_trusted_value):
             self._maximum_trusted_value = maximum_trusted_value
 
+        def get_parameters(self):
+            """The parameters which affect the spots found, other than the
+            images and scan ranges."""
+            return {
+                "min_spot_size": self._min_spot_size,
+                "min_local": self._min_local,
+                "kernel_size": self._kernel_size,
+                "global_threshold": self._global_threshold,
+                "threshold_algorithm": self._threshold_algorithm,
+                "sigma_strong": self._sigma_strong,
+                "filter_ice_rings": self._filter_ice_rings,
+                "write_hot_mask": self._write_hot_mask,
+                "phil_file": self._phil_file,
+                "gain": self._gain,
+                "maximum_trusted_value": self._maximum_trusted_value,
+            }
+
         def run(self):
             logger.debug("Running dials.find_spots")
 
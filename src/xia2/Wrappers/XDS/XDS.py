@@ -22,6 +22,11 @@ class XDSException(Exception):
 
 _xds_version_cache = None
 
+# the output of XDS is only checked for errors at the end, so the XDS
+# wrappers keep just this many records in memory - the full output is in
+# the log file
+XDS_OUTPUT_RECORD_LIMIT = 1000
+
 
 def get_xds_version():
     global _xds_version_cache
@@ -14,6 +14,7 @@ from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
 
 # generic helper stuff
 from xia2.Wrappers.XDS.XDS import (
+    XDS_OUTPUT_RECORD_LIMIT,
     imageset_to_xds,
     template_to_xds,
     xds_check_error,
@@ -22,6 +23,7 @@ from xia2.Wrappers.XDS.XDS import (
 
 # specific helper stuff
 from xia2.Wrappers.XDS.XDSCorrectHelpers import _parse_correct_lp
+from xia2.Wrappers.XDS.XDSFiles import write_input_data_files
 
 logger = logging.getLogger("xia2.Wrappers.XDS.XDSCorrect")
 
@@ -34,6 +36,7 @@ def XDSCorrect(DriverType=None, params=None):
 
         def __init__(self, params=None):
             super().__init__()
+            self.set_output_record_limit(XDS_OUTPUT_RECORD_LIMIT)
 
             # phil parameters
 
@@ -303,11 +306,12 @@ def XDSCorrect(DriverType=None, params=None):
 
             # write the input data files...
 
-            for file_name in self._input_data_files_list:
-                src = self._input_data_files[file_name]
-                dst = os.path.join(self.get_working_directory(), file_name)
-                if src != dst:
-                    shutil.copyfile(src, dst)
+            write_input_data_files(
+                self.get_working_directory(),
+                self._input_data_files,
+                self._input_data_files_list,
+                self._output_data_files_list,
+            )
 
             self.start()
             self.close_wait()
@@ -366,14 +370,13 @@ def XDSCorrect(DriverType=None, params=None):
                 self._reindex_used = self._results["reindex_op"]
 
             # get the reflections to remove...
-            for line in open(
-                os.path.join(self.get_working_directory(), "CORRECT.LP")
-            ).readlines():
-                if '"alien"' in line:
-                    h, k, l = tuple(map(int, line.split()[:3]))
-                    z = float(line.split()[4])
-                    if (h, k, l, z) not in self._remove:
-                        self._remove.append((h, k, l, z))
+            with open(os.path.join(self.get_working_directory(), "CORRECT.LP")) as fh:
+                for line in fh:
+                    if '"alien"' in line:
+                        h, k, l = tuple(map(int, line.split()[:3]))
+                        z = float(line.split()[4])
+                        if (h, k, l, z) not in self._remove:
+                            self._remove.append((h, k, l, z))
 
             return
 
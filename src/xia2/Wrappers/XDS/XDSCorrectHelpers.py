@@ -49,7 +49,14 @@ def _parse_correct_lp(filename):
         raise RuntimeError("input filename not CORRECT.LP")
 
     with open(filename) as fh:
-        file_contents = fh.readlines()
+        return _parse_correct_lp_lines(fh)
+
+
+def _parse_correct_lp_lines(lines):
+    """Parse the lines of CORRECT.LP in a single pass, e.g. directly from
+    the open file."""
+
+    lines = iter(lines)
 
     postrefinement_stats = {}
 
@@ -57,7 +64,7 @@ def _parse_correct_lp(filename):
     # is low...
     postrefinement_stats["sdcorrection"] = (1.0, 0.0)
 
-    for i, line in enumerate(file_contents):
+    for line in lines:
         if "OF SPOT    POSITION (PIXELS)" in line:
             rmsd_pixel = float(line.split()[-1])
             postrefinement_stats.setdefault("rmsd_pixel", rmsd_pixel)
@@ -97,16 +104,18 @@ def _parse_correct_lp(filename):
         # look for I/sigma (resolution) information...
         if "RESOLUTION RANGE  I/Sigma  Chi^2  R-FACTOR  R-FACTOR" in line:
             resolution_info = []
-            j = i + 3
-            while "-----" not in file_contents[j]:
+            next(lines)
+            next(lines)
+            for row in lines:
+                if "-----" in row:
+                    break
                 try:
-                    l = file_contents[j].split()
+                    l = row.split()
                     resolution_info.append((float(l[1]), float(l[2])))
                 except ValueError:
-                    l = file_contents[j].split()
+                    l = row.split()
                     m = re.match(r"(\d+\.\d{2})(\d+\.\d+)", l[2])
                     resolution_info.append((float(l[1]), float(m.group(1))))
-                j += 1
 
             # bug # 2409 - this seems a little harsh set as 1.0 so
             # set this to 0.75 - even then 0.5 may be better..
@@ -114,23 +123,21 @@ def _parse_correct_lp(filename):
             postrefinement_stats["resolution_estimate_old"] = resolution_old
 
             # also recover the highest resolution limit of the data
-            j += 1
-            postrefinement_stats["highest_resolution"] = float(
-                file_contents[j].split()[1]
-            )
+            postrefinement_stats["highest_resolution"] = float(next(lines).split()[1])
 
         if "a          b              INPUT DATA SET" in line:
-            sdcorrection = list(map(float, file_contents[i + 1].split()[:2]))
+            sdcorrection = list(map(float, next(lines).split()[:2]))
 
             postrefinement_stats["sdcorrection"] = tuple(sdcorrection)
 
         if "CORRELATION  NPAIR  Rmeas  COMPARED  ESD" in line:
-            j = i + 2
-            while file_contents[j].strip():
-                if "*" in file_contents[j]:
+            next(lines)
+            for row in lines:
+                if not row.strip():
+                    break
+                if "*" in row:
                     postrefinement_stats["reindex_op"] = list(
-                        map(int, file_contents[j].split()[-12:])
+                        map(int, row.split()[-12:])
                     )
-                j += 1
 
     return postrefinement_stats
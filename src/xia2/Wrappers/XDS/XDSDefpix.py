@@ -11,10 +11,12 @@ from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
 
 # generic helper stuff
 from xia2.Wrappers.XDS.XDS import (
+    XDS_OUTPUT_RECORD_LIMIT,
     imageset_to_xds,
     template_to_xds,
     xds_check_version_supported,
 )
+from xia2.Wrappers.XDS.XDSFiles import write_input_data_files
 
 logger = logging.getLogger("xia2.Wrappers.XDS.XDSDefpix")
 
@@ -27,6 +29,7 @@ def XDSDefpix(DriverType=None):
 
         def __init__(self):
             super().__init__()
+            self.set_output_record_limit(XDS_OUTPUT_RECORD_LIMIT)
 
             # now set myself up...
 
@@ -143,11 +146,12 @@ def XDSDefpix(DriverType=None):
 
             # write the input data files...
 
-            for file_name in self._input_data_files_list:
-                src = self._input_data_files[file_name]
-                dst = os.path.join(self.get_working_directory(), file_name)
-                if src != dst:
-                    shutil.copyfile(src, dst)
+            write_input_data_files(
+                self.get_working_directory(),
+                self._input_data_files,
+                self._input_data_files_list,
+                self._output_data_files_list,
+            )
 
             self.start()
             self.close_wait()
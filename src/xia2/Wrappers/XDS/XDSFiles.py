@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import logging
+import os
+import shutil
+
+logger = logging.getLogger("xia2.Wrappers.XDS.XDSFiles")
+
 XDSFiles = [
     "X-CORRECTIONS.cbf",
     "Y-CORRECTIONS.cbf",
@@ -17,3 +23,56 @@ XDSFiles = [
     "DECAY.cbf",
     "MODPIX.cbf",
 ]
+
+
+def _is_shared(path):
+    """Whether the file at path is hard linked from elsewhere."""
+    try:
+        return os.lstat(path).st_nlink > 1
+    except FileNotFoundError:
+        return False
+
+
+def write_input_data_files(
+    working_directory, input_data_files, input_files, output_files
+):
+    """Put the input data files for an XDS step into its working directory.
+
+    The files, which may be large, are hard linked from wherever an earlier
+    step wrote them, falling back to a copy where that is not possible e.g.
+    across file systems. A file which is already linked in place is left
+    alone. XDS writes its output files in place, so outputs which are shared
+    with another directory are unlinked beforehand, and inputs which are
+    also outputs are given their own copy, so that running a step never
+    changes the files of another."""
+
+    for file_name in output_files:
+        dst = os.path.join(working_directory, file_name)
+        if _is_shared(dst):
+            if file_name in input_files and input_data_files[file_name] == dst:
+                # the step rewrites its own input, keep the contents
+                tmp = dst + ".tmp"
+                shutil.copyfile(dst, tmp)
+                os.replace(tmp, dst)
+            else:
+                os.remove(dst)
+
+    for file_name in input_files:
+        src = input_data_files[file_name]
+        dst = os.path.join(working_directory, file_name)
+        if src == dst:
+            continue
+        if file_name in output_files:
+            if os.path.lexists(dst):
+                os.remove(dst)
+            shutil.copyfile(src, dst)
+            continue
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            continue
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError as e:
+            logger.debug("Copying %s to %s as unable to link: %s", src, dst, e)
+            shutil.copyfile(src, dst)
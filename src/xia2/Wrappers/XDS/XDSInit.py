@@ -10,12 +10,14 @@ from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
 
 # generic helper stuff
 from xia2.Wrappers.XDS.XDS import (
+    XDS_OUTPUT_RECORD_LIMIT,
     _running_xds_version,
     find_hdf5_lib,
     imageset_to_xds,
     template_to_xds,
     xds_check_version_supported,
 )
+from xia2.Wrappers.XDS.XDSFiles import write_input_data_files
 
 
 def XDSInit(DriverType=None, params=None):
@@ -26,6 +28,7 @@ def XDSInit(DriverType=None, params=None):
 
         def __init__(self, params=None):
             super().__init__()
+            self.set_output_record_limit(XDS_OUTPUT_RECORD_LIMIT)
 
             # phil parameters
 
@@ -130,11 +133,12 @@ def XDSInit(DriverType=None, params=None):
 
             # write the input data files...
 
-            for file_name in self._input_data_files_list:
-                src = self._input_data_files[file_name]
-                dst = os.path.join(self.get_working_directory(), file_name)
-                if src != dst:
-                    shutil.copyfile(src, dst)
+            write_input_data_files(
+                self.get_working_directory(),
+                self._input_data_files,
+                self._input_data_files_list,
+                self._output_data_files_list,
+            )
 
             self.start()
             self.close_wait()
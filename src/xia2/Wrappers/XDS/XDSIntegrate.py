@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import concurrent.futures
 import copy
 import logging
 import os
@@ -9,12 +10,15 @@ from libtbx import Auto
 
 from xia2.Driver.DriverFactory import DriverFactory
 from xia2.Handlers.Phil import PhilIndex
+from xia2.lib.bits import auto_logfiler
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
+from xia2.Schema.PerImageStatistics import PerImageStatistics
 
 # generic helper stuff
 from xia2.Wrappers.XDS.XDS import (
+    XDS_OUTPUT_RECORD_LIMIT,
     _running_xds_version,
     find_hdf5_lib,
     imageset_to_xds,
@@ -22,15 +26,22 @@ from xia2.Wrappers.XDS.XDS import (
     xds_check_error,
     xds_check_version_supported,
 )
+from xia2.Wrappers.XDS.XDSFiles import write_input_data_files
 
 # specific helper stuff
 from xia2.Wrappers.XDS.XDSIntegrateHelpers import (
-    parse_integrate_lp,
-    parse_integrate_lp_updates,
+    merge_integrate_hkl,
+    merge_integrate_lp,
+    read_integrate_lp,
+    split_data_range,
 )
 
 logger = logging.getLogger("xia2.Wrappers.XDS.XDSIntegrate")
 
+# the minimum width in degrees of the image ranges integrated as separate
+# jobs, so that each has enough data to refine the geometry
+_MIN_FORKED_JOB_WIDTH = 5.0
+
 # For details on reflecting_range, it's E.S.D., and beam divergence etc.
 # see:
 #
@@ -45,6 +56,7 @@ def XDSIntegrate(DriverType=None, params=None):
 
         def __init__(self, params=None):
             super().__init__()
+            self.set_output_record_limit(XDS_OUTPUT_RECORD_LIMIT)
 
             # phil parameters
 
@@ -128,33 +140,96 @@ def XDSIntegrate(DriverType=None, params=None):
         def get_per_image_statistics(self):
             return self._per_image_statistics
 
-        def run(self):
-            """Run integrate."""
-
-            # image_header = self.get_header()
+        def _get_number_of_forked_jobs(self):
+            """The number of image ranges to integrate as separate jobs, each
+            at least _MIN_FORKED_JOB_WIDTH degrees wide, and when run locally
+            no more than the number of processors, as the jobs run at once."""
+
+            if self._params.fork_jobs <= 1 or self._parallel is Auto:
+                return 1
+            n_images = self._data_range[1] - self._data_range[0] + 1
+            max_jobs = int(n_images * self.get_phi_width() / _MIN_FORKED_JOB_WIDTH)
+            if PhilIndex.params.xia2.settings.multiprocessing.type != "qsub":
+                max_jobs = min(max_jobs, self._parallel)
+            return max(1, min(self._params.fork_jobs, max_jobs))
+
+        def _run_forked(self, n_jobs):
+            """Integrate the data range as n_jobs consecutive image ranges,
+            each run as a separate XDS job in its own directory, either
+            locally sharing the processors between the jobs or each submitted
+            with qsub, then merge the results in order of image range."""
 
-            ## crank through the header dictionary and replace incorrect
-            ## information with updated values through the indexer
-            ## interface if available...
+            mp_params = PhilIndex.params.xia2.settings.multiprocessing
+            if mp_params.type == "qsub":
+                driver_type = "qsub"
+                nproc = self._parallel
+            else:
+                driver_type = None
+                nproc = max(1, self._parallel // n_jobs)
 
-            ## need to add distance, wavelength - that should be enough...
+            drivers = []
+            for j, data_range in enumerate(split_data_range(self._data_range, n_jobs)):
+                directory = os.path.join(
+                    self.get_working_directory(), "INTEGRATE_%d" % (j + 1)
+                )
+                os.makedirs(directory, exist_ok=True)
+                logger.debug(
+                    "Integrating images %d to %d in %s", *data_range, directory
+                )
+                self._write_xds_inp(directory, data_range, nproc, forked=True)
+                write_input_data_files(
+                    directory,
+                    self._input_data_files,
+                    self._input_data_files_list,
+                    self._output_data_files_list,
+                )
 
-            # if self.get_distance():
-            # image_header['distance'] = self.get_distance()
+                driver = DriverFactory.Driver(driver_type)
+                driver.set_executable("xds_par" if nproc > 1 else "xds")
+                driver.set_cpu_threads(nproc)
+                driver.set_output_record_limit(XDS_OUTPUT_RECORD_LIMIT)
+                driver.set_working_directory(directory)
+                auto_logfiler(driver, "INTEGRATE_%d" % (j + 1))
+                drivers.append(driver)
+
+            def run_job(driver):
+                driver.start()
+                driver.close_wait()
+                xds_check_version_supported(driver.get_all_output())
+                xds_check_error(driver.get_all_output())
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as pool:
+                for future in [pool.submit(run_job, driver) for driver in drivers]:
+                    future.result()
+
+            directories = [driver.get_working_directory() for driver in drivers]
+            merge_integrate_hkl(
+                [os.path.join(d, "INTEGRATE.HKL") for d in directories],
+                os.path.join(self.get_working_directory(), "INTEGRATE.HKL"),
+                self._data_range,
+            )
+            merge_integrate_lp(
+                [os.path.join(d, "INTEGRATE.LP") for d in directories],
+                os.path.join(self.get_working_directory(), "INTEGRATE.LP"),
+            )
 
-            # if self.get_wavelength():
-            # image_header['wavelength'] = self.get_wavelength()
+            # FRAME.cbf is of the last image, so comes from the last job
+            for file in self._output_data_files_list:
+                dst = os.path.join(self.get_working_directory(), file)
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                shutil.copyfile(os.path.join(directories[-1], file), dst)
 
-            # if self.get_two_theta():
-            # image_header['two_theta'] = self.get_two_theta()
+        def _write_xds_inp(self, directory, data_range, nproc, forked=False):
+            """Write XDS.INP to integrate the data range in directory."""
 
             header = imageset_to_xds(self.get_imageset())
 
-            xds_inp = open(os.path.join(self.get_working_directory(), "XDS.INP"), "w")
+            xds_inp = open(os.path.join(directory, "XDS.INP"), "w")
 
             # what are we doing?
             xds_inp.write("JOB=INTEGRATE\n")
-            xds_inp.write("MAXIMUM_NUMBER_OF_PROCESSORS=%d\n" % self._parallel)
+            xds_inp.write("MAXIMUM_NUMBER_OF_PROCESSORS=%d\n" % nproc)
 
             from xia2.Handlers.Phil import PhilIndex
 
@@ -169,16 +244,18 @@ def XDSIntegrate(DriverType=None, params=None):
                 xds_inp.write("NUMBER_OF_PROFILE_GRID_POINTS_ALONG_GAMMA= %d\n" % c)
 
             mp_params = PhilIndex.params.xia2.settings.multiprocessing
-            if mp_params.mode == "serial" and mp_params.njob > 1:
+            if forked:
+                # each job is already a part of the data range
+                xds_inp.write("MAXIMUM_NUMBER_OF_JOBS=1\n")
+
+            elif mp_params.mode == "serial" and mp_params.njob > 1:
                 xds_inp.write("MAXIMUM_NUMBER_OF_JOBS=%d\n" % mp_params.njob)
 
             elif mp_params.mode == "serial" and mp_params.njob == Auto:
                 chunk_width = 30.0
                 phi_width = self.get_phi_width()
                 nchunks = int(
-                    (self._data_range[1] - self._data_range[0] + 1)
-                    * phi_width
-                    / chunk_width
+                    (data_range[1] - data_range[0] + 1) * phi_width / chunk_width
                 )
 
                 logger.debug("Xparallel: -1 using %d chunks", nchunks)
@@ -211,7 +288,7 @@ def XDSIntegrate(DriverType=None, params=None):
             if self._params.fix_scale:
                 if _running_xds_version() >= 20130330:
                     xds_inp.write(
-                        "DATA_RANGE_FIXED_SCALE_FACTOR= %d %d 1\n" % self._data_range
+                        "DATA_RANGE_FIXED_SCALE_FACTOR= %d %d 1\n" % data_range
                     )
                 else:
                     xds_inp.write("FIXED_SCALE_FACTOR=TRUE\n")
@@ -265,10 +342,34 @@ def XDSIntegrate(DriverType=None, params=None):
             if lib_str:
                 xds_inp.write(lib_str)
 
-            xds_inp.write("DATA_RANGE=%d %d\n" % self._data_range)
+            xds_inp.write("DATA_RANGE=%d %d\n" % data_range)
 
             xds_inp.close()
 
+        def run(self):
+            """Run integrate."""
+
+            # image_header = self.get_header()
+
+            ## crank through the header dictionary and replace incorrect
+            ## information with updated values through the indexer
+            ## interface if available...
+
+            ## need to add distance, wavelength - that should be enough...
+
+            # if self.get_distance():
+            # image_header['distance'] = self.get_distance()
+
+            # if self.get_wavelength():
+            # image_header['wavelength'] = self.get_wavelength()
+
+            # if self.get_two_theta():
+            # image_header['two_theta'] = self.get_two_theta()
+
+            self._write_xds_inp(
+                self.get_working_directory(), self._data_range, self._parallel
+            )
+
             # copy the input file...
             shutil.copyfile(
                 os.path.join(self.get_working_directory(), "XDS.INP"),
@@ -279,17 +380,22 @@ def XDSIntegrate(DriverType=None, params=None):
 
             # write the input data files...
 
-            for file_name in self._input_data_files_list:
-                src = self._input_data_files[file_name]
-                dst = os.path.join(self.get_working_directory(), file_name)
-                if src != dst:
-                    shutil.copyfile(src, dst)
+            write_input_data_files(
+                self.get_working_directory(),
+                self._input_data_files,
+                self._input_data_files_list,
+                self._output_data_files_list,
+            )
 
-            self.start()
-            self.close_wait()
+            n_jobs = self._get_number_of_forked_jobs()
+            if n_jobs > 1:
+                self._run_forked(n_jobs)
+            else:
+                self.start()
+                self.close_wait()
 
-            xds_check_version_supported(self.get_all_output())
-            xds_check_error(self.get_all_output())
+                xds_check_version_supported(self.get_all_output())
+                xds_check_error(self.get_all_output())
 
             # look for errors
             # like this perhaps - what the hell does this mean?
@@ -317,14 +423,10 @@ def XDSIntegrate(DriverType=None, params=None):
             # look through integrate.lp for some useful information
             # to help with the analysis
 
-            mosaics = []
-
-            for o in open(
+            lp = read_integrate_lp(
                 os.path.join(self.get_working_directory(), "INTEGRATE.LP")
-            ).readlines():
-                if "CRYSTAL MOSAICITY (DEGREES)" in o:
-                    mosaic = float(o.split()[-1])
-                    mosaics.append(mosaic)
+            )
+            mosaics = lp.mosaics
 
             assert len(mosaics) > 0, (
                 "XDS refinement failed (no mosaic spread range reported)"
@@ -340,14 +442,9 @@ def XDSIntegrate(DriverType=None, params=None):
                 self._max_mosaic,
             )
 
-            stats = parse_integrate_lp(
-                os.path.join(self.get_working_directory(), "INTEGRATE.LP")
-            )
-
-            self._per_image_statistics = stats
-
-            self._updates = parse_integrate_lp_updates(
-                os.path.join(self.get_working_directory(), "INTEGRATE.LP")
+            self._per_image_statistics = PerImageStatistics.from_dict(
+                lp.per_image_stats
             )
+            self._updates = lp.updates
 
     return XDSIntegrateWrapper(params)
@@ -3,128 +3,205 @@ from __future__ import annotations
 import os
 
 
-def parse_integrate_lp_updates(filename):
-    """Parse the integrate.lp file to get the values for any updated
-    parameters."""
-
-    if not os.path.split(filename)[-1] == "INTEGRATE.LP":
-        raise RuntimeError("input filename not INTEGRATE.LP")
-
-    with open(filename) as fh:
-        file_contents = fh.readlines()
-
-    updates = {}
-
-    for i, content in enumerate(file_contents):
-        if " ***** SUGGESTED VALUES FOR INPUT PARAMETERS *****" in content:
-            beam_parms = file_contents[i + 1].replace("=", "").split()
-            reflecting_parms = file_contents[i + 2].replace("=", "").split()
-            updates[beam_parms[0]] = float(beam_parms[1])
-            updates[beam_parms[2]] = float(beam_parms[3])
-            updates[reflecting_parms[0]] = float(reflecting_parms[1])
-            updates[reflecting_parms[2]] = float(reflecting_parms[3])
-
-    return updates
-
-
-def parse_integrate_lp(filename):
-    """Parse the contents of the INTEGRATE.LP file pointed to by filename."""
-
-    if not os.path.split(filename)[-1] == "INTEGRATE.LP":
-        raise RuntimeError("input filename not INTEGRATE.LP")
-
-    with open(filename) as fh:
-        file_contents = fh.readlines()
+class IntegrateLPParser:
+    """Parse INTEGRATE.LP a line at a time, as it is read or written, so
+    that the file is never held in memory. Gathers the per-image statistics,
+    the mosaic spread of each block of images and the suggested values for
+    the input parameters."""
+
+    def __init__(self):
+        self.per_image_stats = {}
+        self.mosaics = []
+        self.updates = {}
+
+        self._oscillation_range = 0.0
+        self._block_images = []
+        # the column boundaries while reading the table of per-image results
+        self._table_indices = None
+        # the number of lines of suggested values still to read
+        self._suggested = 0
+
+    def feed(self, content):
+        if self._table_indices is not None:
+            if content.strip():
+                self._parse_image(content)
+                return
+            self._table_indices = None
+
+        if self._suggested:
+            parms = content.replace("=", "").split()
+            self.updates[parms[0]] = float(parms[1])
+            self.updates[parms[2]] = float(parms[3])
+            self._suggested -= 1
+            return
 
-    per_image_stats = {}
-
-    oscillation_range = 0.0
-
-    block_images = []
-
-    for i, content in enumerate(file_contents):
         # check for the header contents - this is basically a duplicate
         # of the input data....
 
         if "OSCILLATION_RANGE=" in content:
-            oscillation_range = float(content.split()[1])
+            self._oscillation_range = float(content.split()[1])
 
         if "PROCESSING OF IMAGES" in content:
             lst = content.split()
-            block_images = list(range(int(lst[3]), int(lst[5]) + 1))
+            self._block_images = list(range(int(lst[3]), int(lst[5]) + 1))
 
         # look for explicitly per-image information
         if "IMAGEIERSCALE" in content.replace(" ", ""):
             words = content.split()
-            indices = [0] + [content.index(word) + len(word) for word in words]
-            j = i + 1
-            while file_contents[j].strip():
-                tokens = [
-                    file_contents[j][indices[k] : indices[k + 1]]
-                    for k in range(len(words))
-                ]
-                image = int(tokens[0])
-                status = int(tokens[1])
-                scale = float(tokens[2])
-                overloads = int(tokens[4])
-                all = int(tokens[5])
-                strong = int(tokens[6])
-                rejected = int(tokens[7])
-
-                if status == 0:
-                    # trap e.g. missing images - need to be able to
-                    # record this somewhere...
-
-                    if all:
-                        fraction_weak = 1.0 - (float(strong) / float(all))
-                    else:
-                        fraction_weak = 1.0
-
-                    per_image_stats[image] = {
-                        "scale": scale,
-                        "overloads": overloads,
-                        "strong": strong,
-                        "all": all,
-                        "fraction_weak": fraction_weak,
-                        "rejected": rejected,
-                    }
-
-                else:
-                    block_images.remove(image)
-
-                j += 1
+            self._table_indices = [0] + [
+                content.index(word) + len(word) for word in words
+            ]
+
+        if " ***** SUGGESTED VALUES FOR INPUT PARAMETERS *****" in content:
+            self._suggested = 2
 
         # then look for per-block information
 
         if "CRYSTAL MOSAICITY (DEGREES)" in content:
-            mosaic = float(content.split()[3])
-            for image in block_images:
-                per_image_stats[image]["mosaic"] = mosaic
+            self.mosaics.append(float(content.split()[-1]))
+            self._set_block("mosaic", float(content.split()[3]))
 
         if "OF SPOT    POSITION (PIXELS)" in content:
-            rmsd_pixel = float(content.split()[-1])
-            for image in block_images:
-                per_image_stats[image]["rmsd_pixel"] = rmsd_pixel
+            self._set_block("rmsd_pixel", float(content.split()[-1]))
 
         if "UNIT CELL PARAMETERS" in content:
-            unit_cell = tuple(map(float, content.split()[-6:]))
-            for image in block_images:
-                per_image_stats[image]["unit_cell"] = unit_cell
+            self._set_block("unit_cell", tuple(map(float, content.split()[-6:])))
 
         if "OF SPINDLE POSITION (DEGREES)" in content:
             rmsd_phi = float(content.split()[-1])
-            for image in block_images:
-                per_image_stats[image]["rmsd_phi"] = rmsd_phi / oscillation_range
+            self._set_block("rmsd_phi", rmsd_phi / self._oscillation_range)
 
         # want to convert this to mm in some standard setting!
         if "DETECTOR COORDINATES (PIXELS) OF DIRECT BEAM" in content:
-            beam = list(map(float, content.split()[-2:]))
-            for image in block_images:
-                per_image_stats[image]["beam"] = beam
+            self._set_block("beam", list(map(float, content.split()[-2:])))
 
         if "CRYSTAL TO DETECTOR DISTANCE (mm)" in content:
-            distance = float(content.split()[-1])
-            for image in block_images:
-                per_image_stats[image]["distance"] = distance
+            self._set_block("distance", float(content.split()[-1]))
+
+    def _set_block(self, key, value):
+        for image in self._block_images:
+            self.per_image_stats[image][key] = value
+
+    def _parse_image(self, content):
+        indices = self._table_indices
+        tokens = [content[indices[k] : indices[k + 1]] for k in range(len(indices) - 1)]
+        image = int(tokens[0])
+        status = int(tokens[1])
+        scale = float(tokens[2])
+        overloads = int(tokens[4])
+        all = int(tokens[5])
+        strong = int(tokens[6])
+        rejected = int(tokens[7])
+
+        if status == 0:
+            # trap e.g. missing images - need to be able to
+            # record this somewhere...
+
+            if all:
+                fraction_weak = 1.0 - (float(strong) / float(all))
+            else:
+                fraction_weak = 1.0
+
+            self.per_image_stats[image] = {
+                "scale": scale,
+                "overloads": overloads,
+                "strong": strong,
+                "all": all,
+                "fraction_weak": fraction_weak,
+                "rejected": rejected,
+            }
+
+        else:
+            self._block_images.remove(image)
+
+
+def read_integrate_lp(filename):
+    """Parse the INTEGRATE.LP file pointed to by filename, returning the
+    IntegrateLPParser."""
+
+    if not os.path.split(filename)[-1] == "INTEGRATE.LP":
+        raise RuntimeError("input filename not INTEGRATE.LP")
+
+    parser = IntegrateLPParser()
+    with open(filename) as fh:
+        for content in fh:
+            parser.feed(content)
+    return parser
+
+
+def parse_integrate_lp_updates(filename):
+    """Parse the integrate.lp file to get the values for any updated
+    parameters."""
+
+    return read_integrate_lp(filename).updates
+
+
+def parse_integrate_lp(filename):
+    """Parse the contents of the INTEGRATE.LP file pointed to by filename."""
 
-    return per_image_stats
+    return read_integrate_lp(filename).per_image_stats
+
+
+def split_data_range(data_range, n_jobs):
+    """Split the data range (first, last) into n_jobs contiguous image
+    ranges of as near as possible equal size, the earlier ones the larger."""
+
+    first, last = data_range
+    n_images = last - first + 1
+    n_jobs = max(1, min(n_jobs, n_images))
+    ranges = []
+    start = first
+    for j in range(n_jobs):
+        size = n_images // n_jobs + (1 if j < n_images % n_jobs else 0)
+        ranges.append((start, start + size - 1))
+        start += size
+    return ranges
+
+
+def merge_integrate_hkl(filenames, output, data_range):
+    """Merge the INTEGRATE.HKL files from integrating consecutive image
+    ranges, in that order, into output - as INTEGRATE.HKL from integrating
+    the whole data range at once."""
+
+    with open(output, "w") as fout:
+        for j, filename in enumerate(filenames):
+            with open(filename) as fin:
+                for line in fin:
+                    if line.startswith("!"):
+                        if j > 0 or line.startswith("!END_OF_DATA"):
+                            continue
+                        if line.startswith("!DATA_RANGE="):
+                            line = "!DATA_RANGE= %7d %7d\n" % tuple(data_range)
+                    fout.write(line)
+        fout.write("!END_OF_DATA\n")
+
+
+def merge_integrate_lp(filenames, output):
+    """Concatenate the INTEGRATE.LP files from integrating consecutive image
+    ranges, in that order, into output. The per-image and per-block results
+    are as in the individual files, and the suggested values for the input
+    parameters are the means of those from each file."""
+
+    suggested = []
+    with open(output, "w") as fout:
+        for filename in filenames:
+            with open(filename) as fin:
+                fout.write(fin.read())
+            updates = parse_integrate_lp_updates(filename)
+            if updates:
+                suggested.append(updates)
+
+        if suggested:
+            mean = {
+                k: sum(updates[k] for updates in suggested) / len(suggested)
+                for k in suggested[0]
+            }
+            fout.write("\n ***** SUGGESTED VALUES FOR INPUT PARAMETERS *****\n")
+            fout.write(
+                " BEAM_DIVERGENCE=%10.6f  BEAM_DIVERGENCE_E.S.D.=%10.6f\n"
+                % (mean["BEAM_DIVERGENCE"], mean["BEAM_DIVERGENCE_E.S.D."])
+            )
+            fout.write(
+                " REFLECTING_RANGE=%10.6f  REFLECTING_RANGE_E.S.D.=%10.6f\n"
+                % (mean["REFLECTING_RANGE"], mean["REFLECTING_RANGE_E.S.D."])
+            )
@@ -1,16 +1,69 @@
 from __future__ import annotations
 
+import os
+import sys
+import time
 
-def tail(filename):
-    for record in open(filename):
-        print(record[:-1])
-    return
+from xia2.Handlers import LogIndex
 
+debug_file = "xia2-debug.txt"
 
-def main():
+
+def tail(filename, offset=0):
+    """Print the contents of filename from offset, returning the offset
+    reached."""
+    with open(filename, "rb") as fh:
+        fh.seek(offset)
+        data = fh.read()
+    sys.stdout.write(data.decode("utf-8", errors="replace"))
+    sys.stdout.flush()
+    return offset + len(data)
+
+
+def current_logfile():
+    """The log file of the program xia2 is currently running."""
+    index = debug_file + LogIndex.INDEX_SUFFIX
+    if os.path.isfile(index):
+        return LogIndex.last_logfile(index)
+
+    # for jobs from before the log files were indexed
     filename = None
-    for record in open("xia2-debug.txt"):
+    for record in open(debug_file):
         if record.startswith("Logfile:"):
             filename = record.split("->")[-1].strip()
+    return filename
+
+
+def follow(interval=2.0):
+    """Print the log of each program as xia2 runs it, until interrupted."""
+    index = debug_file + LogIndex.INDEX_SUFFIX
+    if not os.path.isfile(index):
+        sys.exit(f"{index} not found: is xia2 running in this directory?")
+
+    logfiles, index_offset = LogIndex.logfiles_from(index)
+    filename = logfiles[-1] if logfiles else None
+    offset = 0
+    try:
+        while True:
+            if filename and os.path.isfile(filename):
+                offset = tail(filename, offset)
+            logfiles, index_offset = LogIndex.logfiles_from(index, index_offset)
+            if logfiles:
+                # finish the previous log before moving on to the next
+                if filename and os.path.isfile(filename):
+                    tail(filename, offset)
+                filename = logfiles[-1]
+                offset = 0
+            else:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    if "-f" in sys.argv[1:] or "--follow" in sys.argv[1:]:
+        follow()
+        return
+    filename = current_logfile()
     if filename:
         tail(filename)
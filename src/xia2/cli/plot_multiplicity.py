@@ -4,299 +4,232 @@ import json
 import sys
 
 import iotbx.phil
-from cctbx.miller.display import render_2d, scene
+import numpy as np
 from dials.util import Sorry
 from iotbx.gui_tools.reflections import get_array_description
 from iotbx.reflection_file_reader import any_reflection_file
-from scitbx.array_family import flex
 
+_axes = {"h": 0, "k": 1, "l": 2}
+
+
+class MultiplicityVolume:
+    """The multiplicity of every reflection of a miller array, expanded to P1
+    and including the Bijvoet mates. The data are merged and expanded once,
+    after which any number of slices can be cut from the volume."""
+
+    def __init__(self, miller_array, d_min=None):
+        if d_min is not None:
+            miller_array = miller_array.resolution_filter(d_min=d_min)
+        merged = miller_array.merge_equivalents().redundancies()
+        observed = merged.expand_to_p1().generate_bijvoet_mates()
+        missing = (
+            merged.complete_set(d_min=d_min).lone_set(merged).expand_to_p1()
+        ).generate_bijvoet_mates()
+        self.indices = _as_numpy(observed.indices())
+        self.multiplicities = observed.data().as_numpy_array()
+        self.missing_indices = _as_numpy(missing.indices())
+        self.max_multiplicity = (
+            int(self.multiplicities.max()) if self.multiplicities.size else 0
+        )
+        all_indices = np.concatenate((self.indices, self.missing_indices))
+        self._limits = (
+            np.abs(all_indices).max(axis=0) if all_indices.size else np.zeros(3, int)
+        )
 
-class MultiplicityViewPng(render_2d):
-    def __init__(self, scene, settings=None):
-        import matplotlib
+    def slice(self, axis, index=0):
+        """Cut a slice perpendicular to the given axis (h, k or l).
 
-        matplotlib.use("Agg")
-        from matplotlib import pyplot
-
-        render_2d.__init__(self, scene, settings)
-
-        self._open_circle_points = flex.vec2_double()
-        self._open_circle_radii = []
-        self._open_circle_colors = []
-        self._filled_circle_points = flex.vec2_double()
-        self._filled_circle_radii = []
-        self._filled_circle_colors = []
-
-        self.fig, self.ax = pyplot.subplots(figsize=self.settings.size_inches)
-        self.render(self.ax)
-        pyplot.close()
-
-    def GetSize(self):
-        return self.fig.get_size_inches() * self.fig.dpi  # size in pixels
-
-    def draw_line(self, ax, x1, y1, x2, y2):
-        ax.plot([x1, x2], [y1, y2], c=self._foreground)
-
-    def draw_text(self, ax, text, x, y):
-        ax.text(x, y, text, color=self._foreground, size=self.settings.font_size)
-
-    def draw_open_circle(self, ax, x, y, radius, color=None):
-        self._open_circle_points.append((x, y))
-        self._open_circle_radii.append(2 * radius)
-        if color is None:
-            color = self._foreground
-        self._open_circle_colors.append(color)
-
-    def draw_filled_circle(self, ax, x, y, radius, color):
-        self._filled_circle_points.append((x, y))
-        self._filled_circle_radii.append(2 * radius)
-        self._filled_circle_colors.append(color)
-
-    def render(self, ax):
-        from matplotlib import colormaps, colors
-
-        render_2d.render(self, ax)
-        if self._open_circle_points.size():
-            x, y = self._open_circle_points.parts()
-            ax.scatter(
-                x.as_numpy_array(),
-                y.as_numpy_array(),
-                s=self._open_circle_radii,
-                marker="o",
-                edgecolors=self._open_circle_colors,
-                facecolors=None,
-            )
-        if self._filled_circle_points.size():
-            x, y = self._filled_circle_points.parts()
-            # use pyplot colormaps then we can more easily get a colorbar
-            data = self.scene.multiplicities.data()
-            cmap_d = {
-                "heatmap": "hot",
-                "redblue": colors.LinearSegmentedColormap.from_list(
-                    "RedBlue", ["b", "r"]
-                ),
-                "grayscale": "Greys_r" if self.settings.black_background else "Greys",
-                "mono": (
-                    colors.LinearSegmentedColormap.from_list("mono", ["w", "w"])
-                    if self.settings.black_background
-                    else colors.LinearSegmentedColormap.from_list(
-                        "mono", ["black", "black"]
-                    )
-                ),
-            }
-            cm = cmap_d.get(self.settings.color_scheme, self.settings.color_scheme)
-            if isinstance(cm, str):
-                cm = colormaps[cm]
-            im = ax.scatter(
-                x.as_numpy_array(),
-                y.as_numpy_array(),
-                s=self._filled_circle_radii,
-                marker="o",
-                c=data.select(self.scene.slice_selection).as_numpy_array(),
-                edgecolors="none",
-                vmin=0,
-                vmax=flex.max(data),
-                cmap=cm,
-            )
-            # colorbar
-            cb = self.fig.colorbar(im, ax=ax)
-            [t.set_color(self._foreground) for t in cb.ax.get_yticklabels()]
-            [t.set_fontsize(self.settings.font_size) for t in cb.ax.get_yticklabels()]
-        self.ax.set_aspect("equal")
-        self.ax.set_facecolor(self._background)
-        xmax, ymax = self.GetSize()
-        ax.set_xlim(0, xmax)
-        ax.set_ylim(0, ymax)
-        ax.invert_yaxis()
-        ax.get_xaxis().set_visible(False)
-        ax.get_yaxis().set_visible(False)
-
-        self.fig.tight_layout()
-        self.fig.savefig(
-            self.settings.plot.filename, bbox_inches="tight", facecolor=self._background
-        )
+        Returns the indices along the two in-plane axes (x, y) and a grid of
+        multiplicities, indexed [y, x], which is 0 for missing reflections and
+        NaN where there is no reflection."""
+        i = _axes[axis]
+        plane = [j for j in range(3) if j != i]
+        nx, ny = (int(self._limits[j]) for j in plane)
+        grid = np.full((2 * ny + 1, 2 * nx + 1), np.nan)
+
+        sel = self.missing_indices[:, i] == index
+        missing = self.missing_indices[sel][:, plane]
+        grid[missing[:, 1] + ny, missing[:, 0] + nx] = 0
 
+        sel = self.indices[:, i] == index
+        observed = self.indices[sel][:, plane]
+        grid[observed[:, 1] + ny, observed[:, 0] + nx] = self.multiplicities[sel]
 
-class MultiplicityViewJson(render_2d):
-    def __init__(self, scene, settings=None):
-        render_2d.__init__(self, scene, settings)
+        return np.arange(-nx, nx + 1), np.arange(-ny, ny + 1), grid
 
-        self._open_circle_points = flex.vec2_double()
-        self._open_circle_radii = []
-        self._open_circle_colors = []
-        self._filled_circle_points = flex.vec2_double()
-        self._filled_circle_radii = []
-        self._filled_circle_colors = []
-        self._text = {"x": [], "y": [], "text": []}
-        self._lines = []
-        json_d = self.render(None)
+    def plot_png(self, settings):
+        import matplotlib
 
-        if self.settings.json.compact:
-            indent = None
+        matplotlib.use("Agg")
+        from matplotlib import colormaps, colors, pyplot
+
+        x, y, grid = self.slice(settings.slice_axis, settings.slice_index)
+        xlabel, ylabel = (a for a in "hkl" if a != settings.slice_axis)
+        foreground, background = ("white", "black")
+        if not settings.black_background:
+            foreground, background = background, foreground
+
+        cmap_d = {
+            "heatmap": "hot",
+            "redblue": colors.LinearSegmentedColormap.from_list("RedBlue", ["b", "r"]),
+            "grayscale": "Greys_r" if settings.black_background else "Greys",
+            "mono": colors.LinearSegmentedColormap.from_list(
+                "mono", [foreground, foreground]
+            ),
+        }
+        cm = cmap_d.get(settings.color_scheme, settings.color_scheme)
+        if isinstance(cm, str):
+            cm = colormaps[cm]
+        extent = (x[0] - 0.5, x[-1] + 0.5, y[0] - 0.5, y[-1] + 0.5)
+
+        fig, ax = pyplot.subplots(figsize=settings.size_inches)
+        if settings.show_missing:
+            ax.imshow(
+                np.where(grid == 0, 1.0, np.nan),
+                cmap=colors.ListedColormap(["grey"]),
+                origin="lower",
+                extent=extent,
+                interpolation="nearest",
+            )
+        if settings.sqrt_scale_colors:
+            norm = colors.PowerNorm(0.5, vmin=0, vmax=self.max_multiplicity)
         else:
-            indent = 2
-        with open(self.settings.json.filename, "w") as fh:
-            json.dump(json_d, fh, indent=indent)
-
-    def GetSize(self):
-        return 1600, 1600  # size in pixels
-
-    def draw_line(self, ax, x1, y1, x2, y2):
-        self._lines.append((x1, y1, x2, y2))
-
-    def draw_text(self, ax, text, x, y):
-        self._text["x"].append(x)
-        self._text["y"].append(y)
-        self._text["text"].append(text)
-
-    def draw_open_circle(self, ax, x, y, radius, color=None):
-        self._open_circle_points.append((x, y))
-        self._open_circle_radii.append(2 * radius)
-        if color is None:
-            color = self._foreground
-        self._open_circle_colors.append(color)
-
-    def draw_filled_circle(self, ax, x, y, radius, color):
-        self._filled_circle_points.append((x, y))
-        self._filled_circle_radii.append(2 * radius)
-        self._filled_circle_colors.append(color)
-
-    def render(self, ax):
-        render_2d.render(self, ax)
+            norm = colors.Normalize(vmin=0, vmax=self.max_multiplicity)
+        im = ax.imshow(
+            np.where(grid > 0, grid, np.nan),
+            cmap=cm,
+            norm=norm,
+            origin="lower",
+            extent=extent,
+            interpolation="nearest",
+        )
+        cb = fig.colorbar(im, ax=ax)
+        cb.set_label("Multiplicity", color=foreground, size=settings.font_size)
+        cb.ax.tick_params(colors=foreground, labelsize=settings.font_size)
+        ax.set_facecolor(background)
+        ax.set_xlabel(xlabel, color=foreground, size=settings.font_size)
+        ax.set_ylabel(ylabel, color=foreground, size=settings.font_size)
+        ax.tick_params(colors=foreground, labelsize=settings.font_size)
+        ax.set_title(
+            f"{settings.slice_axis}={settings.slice_index}",
+            color=foreground,
+            size=settings.font_size,
+        )
+        fig.tight_layout()
+        fig.savefig(settings.plot.filename, bbox_inches="tight", facecolor=background)
+        pyplot.close(fig)
+
+    def as_plotly_dict(self, settings):
+        x, y, grid = self.slice(settings.slice_axis, settings.slice_index)
+        xlabel, ylabel = (a for a in "hkl" if a != settings.slice_axis)
+
+        cmap_d = {
+            "rainbow": "Jet",
+            "heatmap": "Hot",
+            "redblue": "RdBu",
+            "grayscale": "Greys",
+            "mono": [[0, "black"], [1, "black"]],
+        }
+        # plotly has no non-linear colour scales, so with sqrt_scale_colors
+        # plot the square roots, with the colour bar labelled in multiplicities
+        scale = np.sqrt if settings.sqrt_scale_colors else int
+        z = [[None if not v > 0 else scale(v) for v in row] for row in grid]
+        colorbar = {"title": "Multiplicity", "titleside": "right"}
+        if settings.sqrt_scale_colors:
+            ticks = np.unique(
+                np.linspace(0, self.max_multiplicity, 6).round().astype(int)
+            )
+            colorbar["tickvals"] = np.sqrt(ticks).tolist()
+            colorbar["ticktext"] = [str(t) for t in ticks.tolist()]
         data = []
-        if self._open_circle_points.size():
-            x, y = self._open_circle_points.parts()
-            z = self._open_circle_colors
+        if settings.show_missing:
+            yi, xi = np.nonzero(grid == 0)
             data.append(
                 {
-                    "x": list(x.round(1)),
-                    "y": list(y.round(1)),
-                    #'z': list(z),
+                    "x": x[xi].tolist(),
+                    "y": y[yi].tolist(),
                     "type": "scatter",
                     "mode": "markers",
                     "name": "missing reflections",
                     "showlegend": False,
                     "marker": {
-                        #'color': list(z),
-                        "color": (
-                            "white" if self.settings.black_background else "black"
-                        ),
-                        "line": {
-                            #'color': 'black',
-                            "width": 0
-                        },
+                        "color": "white" if settings.black_background else "black",
+                        "line": {"width": 0},
                         "symbol": "circle",
                         "size": 5,
                     },
                 }
             )
-        if self._filled_circle_points.size():
-            x, y = self._filled_circle_points.parts()
-            z = self.scene.multiplicities.data().select(self.scene.slice_selection)
-
-            # why doesn't this work?
-            # colorscale = []
-            # assert len(z) == len(self._filled_circle_colors)
-            # for zi in range(flex.max(z)+1):
-            #  i = flex.first_index(z, zi)
-            #  if i is None: continue
-            #  print i, self._filled_circle_colors[i], 'rgb(%i,%i,%i)' %tuple(rgb * 264 for rgb in self._filled_circle_colors[i])
-            #  colorscale.append([zi, 'rgb(%i,%i,%i)' %self._filled_circle_colors[i]])
-
-            cmap_d = {
-                "rainbow": "Jet",
-                "heatmap": "Hot",
-                "redblue": "RdbU",
-                "grayscale": "Greys",
-                "mono": None,
+        data.append(
+            {
+                "x": x.tolist(),
+                "y": y.tolist(),
+                "z": z,
+                "type": "heatmap",
+                "name": "multiplicity",
+                "colorscale": cmap_d.get(settings.color_scheme, settings.color_scheme),
+                "zmin": 0,
+                "zmax": scale(self.max_multiplicity),
+                "showscale": settings.color_scheme != "mono",
+                "colorbar": colorbar,
             }
+        )
 
-            color = list(z)
-            colorscale = cmap_d.get(
-                self.settings.color_scheme, self.settings.color_scheme
-            )
-
-            if self.settings.color_scheme == "mono":
-                color = "black"
-                colorscale = None
-
-            data.append(
-                {
-                    "x": list(x.round(1)),
-                    "y": list(y.round(1)),
-                    #'z': list(z),
-                    "type": "scatter",
-                    "mode": "markers",
-                    "name": "multiplicity",
-                    "showlegend": False,
-                    "marker": {
-                        "color": color,
-                        "colorscale": colorscale,
-                        "cmin": 0,
-                        "cmax": flex.max(self.scene.multiplicities.data()),
-                        "showscale": True,
-                        "colorbar": {"title": "Multiplicity", "titleside": "right"},
-                        "line": {
-                            #'color': 'white',
-                            "width": 0
-                        },
-                        "symbol": "circle",
-                        "size": 5,
-                    },
-                }
-            )
-
-        text = {"mode": "text", "showlegend": False, "textposition": "top right"}
-        text.update(self._text)
-        data.append(text)
-
-        shapes = []
-        for x0, y0, x1, y1 in self._lines:
-            # color = 'rgb(%i,%i,%i)' %tuple(rgb * 264 for rgb in self._foreground)
-            color = "black"
-            shapes.append(
-                {
-                    "type": "line",
-                    "x0": x0,
-                    "y0": y0,
-                    "x1": x1,
-                    "y1": y1,
-                    "layer": "below",
-                    "line": {"color": color, "width": 2},
-                }
-            )
-
-        d = {
+        return {
             "data": data,
             "layout": {
-                "plot_bgcolor": "rgb(%i,%i,%i)"
-                % tuple(rgb * 264 for rgb in self._background),
-                "title": f"Multiplicity plot ({self.settings.slice_axis}={self.settings.slice_index})",
-                "shapes": shapes,
+                "plot_bgcolor": "black" if settings.black_background else "white",
+                "title": f"Multiplicity plot ({settings.slice_axis}={settings.slice_index})",
                 "hovermode": False,
-                "xaxis": {
-                    "showgrid": False,
-                    "zeroline": False,
-                    "showline": False,
-                    "ticks": "",
-                    "showticklabels": False,
-                },
+                "xaxis": {"title": xlabel, "showgrid": False, "zeroline": False},
                 "yaxis": {
-                    "autorange": "reversed",
+                    "title": ylabel,
                     "showgrid": False,
                     "zeroline": False,
-                    "showline": False,
-                    "ticks": "",
-                    "showticklabels": False,
+                    "scaleanchor": "x",
                 },
             },
         }
-        return d
+
+    def plot_json(self, settings):
+        indent = None if settings.json.compact else 2
+        with open(settings.json.filename, "w") as fh:
+            json.dump(self.as_plotly_dict(settings), fh, indent=indent)
 
 
+def _as_numpy(indices):
+    return (
+        indices.as_vec3_double().as_numpy_array().round().astype(np.int64)
+        if len(indices)
+        else np.zeros((0, 3), dtype=np.int64)
+    )
+
+
+# Of the cctbx.miller.display parameters, only those which apply to a slice
+# drawn as a grid of multiplicities.
 master_phil = iotbx.phil.parse(
     """
-include scope cctbx.miller.display.master_phil
+data = None
+  .type = path
+  .optional = False
+symmetry_file = None
+  .type = str
+black_background = True
+  .type = bool
+show_missing = False
+  .type = bool
+slice_axis = *h k l
+  .type = choice
+slice_index = 0
+  .type = int
+color_scheme = *rainbow heatmap redblue grayscale mono
+  .type = choice
+sqrt_scale_colors = False
+  .type = bool
+  .help = "Scale the colours by the square root of the multiplicity"
+d_min = None
+  .type = float
+  .help = "Only include reflections to this resolution"
 unit_cell = None
   .type = unit_cell
 space_group = None
@@ -315,8 +248,7 @@ size_inches = 20,20
   .type = floats(size=2, value_min=0)
 font_size = 20
   .type = int(value_min=1)
-""",
-    process_includes=True,
+"""
 )
 
 
@@ -354,19 +286,16 @@ def run(args=sys.argv[1:]):
     plot_multiplicity(miller_array, settings)
 
 
-def plot_multiplicity(miller_array, settings):
-    settings.scale_colors_multiplicity = True
-    settings.scale_radii_multiplicity = True
-    settings.expand_to_p1 = True
-    settings.expand_anomalous = True
-    settings.slice_mode = True
+def plot_multiplicity(miller_array, settings, volume=None):
+    """Plot a slice of the multiplicities as a png image and/or plotly json.
+
+    Pass a MultiplicityVolume to cut several slices from the same data without
+    merging and expanding the data again for every plot."""
+    if volume is None:
+        volume = MultiplicityVolume(miller_array, d_min=settings.d_min)
 
     if settings.plot.filename is not None:
-        MultiplicityViewPng(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        volume.plot_png(settings)
 
     if settings.json.filename is not None:
-        MultiplicityViewJson(
-            scene(miller_array, settings, merge=True), settings=settings
-        )
+        volume.plot_json(settings)
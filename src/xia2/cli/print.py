@@ -4,13 +4,13 @@ import logging
 import os
 
 import xia2.Handlers.Streams
-from xia2.Applications.xia2_main import write_citations
 
 logger = logging.getLogger("xia2.cli.print")
 
 
 def run():
     assert os.path.exists("xia2.json")
+    from xia2.Applications.xia2_main import write_citations
     from xia2.Schema.XProject import XProject
 
     xinfo = XProject.from_json(filename="xia2.json")
@@ -3,12 +3,11 @@ from __future__ import annotations
 import pickle
 import sys
 
-from dials.array_family import flex  # noqa: F401
-
 
 def main(filename):
     """Show a mask from create_mask."""
 
+    from dials.array_family import flex  # noqa: F401
     from matplotlib import pylab
 
     with open(filename, "rb") as fh:
@@ -16,6 +16,7 @@ from libtbx import phil
 
 import xia2
 import xia2.Handlers.Streams
+from xia2.Handlers import LogIndex
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Modules.Report import Report
@@ -483,6 +484,12 @@ def rst2html(rst):
 def extract_loggraph_tables(logfile):
     from iotbx import data_plots
 
+    # read just the tables if their positions in the log file were indexed
+    log_lines = LogIndex.loggraph_table_lines(logfile)
+    if log_lines is not None:
+        if not log_lines:
+            return []
+        return data_plots.import_ccp4i_logfile(log_lines=log_lines)
     return data_plots.import_ccp4i_logfile(file_name=logfile)
 
 
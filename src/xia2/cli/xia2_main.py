@@ -7,13 +7,10 @@ import time
 import traceback
 
 from dials.util import Sorry
-from dials.util.version import dials_version
-from libtbx import group_args
 
 import xia2.Driver.timing
 import xia2.Handlers.Streams
 import xia2.XIA2Version
-from xia2.Applications.xia2_helpers import process_one_sweep
 from xia2.Applications.xia2_main import (
     check_environment,
     get_command_line,
@@ -22,8 +19,7 @@ from xia2.Applications.xia2_main import (
 )
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import cleanup
-from xia2.Schema.XProject import XProject
-from xia2.Schema.XSweep import XSweep
+from xia2.Handlers.Journal import Journal
 
 logger = logging.getLogger("xia2.cli.xia2_main")
 
@@ -39,6 +35,10 @@ def get_ccp4_version():
 
 def xia2_main(stop_after=None):
     """Actually process something..."""
+    from dials.util.version import dials_version
+
+    from xia2.Schema.XProject import XProject
+
     Citations.cite("xia2")
 
     # print versions of related software
@@ -70,12 +70,17 @@ def xia2_main(stop_after=None):
     xinfo = CommandLine.get_xinfo()
     logger.info("Project directory: %s", xinfo.path)
 
-    if params.xia2.settings.developmental.continue_from_previous_job and os.path.exists(
-        "xia2.json"
-    ):
-        logger.debug("==== Starting from existing xia2.json ====")
+    # the most recent saved state, either the final xia2.json or the state
+    # saved during processing
+    saved_states = [f for f in ("xia2.json", "xia2.state") if os.path.exists(f)]
+    if params.xia2.settings.developmental.continue_from_previous_job and saved_states:
+        saved_state = max(saved_states, key=os.path.getmtime)
+        logger.debug("==== Starting from existing %s ====", saved_state)
         xinfo_new = xinfo
-        xinfo = XProject.from_json(filename="xia2.json")
+        if saved_state == "xia2.state":
+            xinfo = XProject.from_msgpack("xia2.state")
+        else:
+            xinfo = XProject.from_json(filename="xia2.json")
 
         crystals = xinfo.get_crystals()
         crystals_new = xinfo_new.get_crystals()
@@ -134,18 +139,50 @@ def xia2_main(stop_after=None):
 
     crystals = xinfo.get_crystals()
 
+    # record each completed processing stage, and if continuing from a previous
+    # job then pick up any sweeps from where they were left
+    journal = params.xia2.settings.developmental.journal
+    if journal:
+        # processing a sweep in parallel for the job which owns the journal,
+        # in a temporary directory whose output is moved up to the directory
+        # of the journal (see process_one_sweep)
+        Journal.open(journal, relocate=(xinfo.path, os.path.dirname(journal)))
+    else:
+        journal = os.path.abspath(xinfo.path / "xia2-journal.jsonl")
+        Journal.open(journal)
+    restored_sweeps = set()
+    if params.xia2.settings.developmental.continue_from_previous_job:
+        for crystal_id in crystals:
+            for wavelength_id in crystals[crystal_id].get_wavelength_names():
+                wavelength = crystals[crystal_id].get_xwavelength(wavelength_id)
+                for sweep in wavelength.get_sweeps():
+                    if Journal.restore_sweep(sweep) == "integrate":
+                        restored_sweeps.add(sweep)
+
     failover = params.xia2.settings.failover
 
     with cleanup(xinfo.path):
+        # save the processing state as we go, updated as each sweep completes
+        xinfo.as_msgpack("xia2.state")
+
         if mp_params.mode == "parallel" and njob > 1:
             driver_type = mp_params.type
-            command_line_args = CommandLine.get_argv()[1:]
+            # the stages completed by each sweep are recorded in our journal
+            command_line_args = CommandLine.get_argv()[1:] + [
+                "xia2.settings.developmental.journal=%s" % journal
+            ]
+            from libtbx import group_args
+
+            from xia2.Applications.xia2_helpers import process_one_sweep
+
             jobs = []
             for crystal_id in crystals:
                 for wavelength_id in crystals[crystal_id].get_wavelength_names():
                     wavelength = crystals[crystal_id].get_xwavelength(wavelength_id)
                     sweeps = wavelength.get_sweeps()
                     for sweep in sweeps:
+                        if sweep in restored_sweeps:
+                            continue
                         sweep._get_indexer()
                         sweep._get_refiner()
                         sweep._get_integrater()
@@ -197,6 +234,8 @@ def xia2_main(stop_after=None):
                     remove_sweeps = []
                     sweeps = wavelength.get_sweeps()
                     for sweep in sweeps:
+                        if sweep in restored_sweeps:
+                            continue
                         success, output, xsweep_dict = results[i_sweep]
                         if output is not None:
                             logger.info(output)
@@ -206,10 +245,9 @@ def xia2_main(stop_after=None):
                         else:
                             assert xsweep_dict is not None
                             logger.info("Loading sweep: %s", sweep.get_name())
-                            new_sweep = XSweep.from_dict(xsweep_dict)
-                            sweep._indexer = new_sweep._indexer
-                            sweep._refiner = new_sweep._refiner
-                            sweep._integrater = new_sweep._integrater
+                            sweep.set_processing_state(xsweep_dict)
+                            Journal.record_sweep(sweep, "integrate")
+                            XProject.append_sweep_state("xia2.state", sweep)
                         i_sweep += 1
                     for sweep in remove_sweeps:
                         wavelength.remove_sweep(sweep)
@@ -241,6 +279,7 @@ def xia2_main(stop_after=None):
                             else:
                                 sweep.get_integrater_intensities()
                             sweep.serialize()
+                            XProject.append_sweep_state("xia2.state", sweep)
                         except Exception as e:
                             if failover:
                                 logger.info(
@@ -256,7 +295,9 @@ def xia2_main(stop_after=None):
                         sample = sweep.sample
                         sample.remove_sweep(sweep)
 
-        # save intermediate xia2.json file in case scaling step fails
+        # save intermediate xia2.json file in case scaling step fails, which is
+        # also what a sweep processed in parallel returns (see process_one_sweep)
+        xinfo.as_msgpack("xia2.state")
         xinfo.as_json(filename="xia2.json")
 
         if stop_after not in ("index", "integrate"):
@@ -303,6 +344,8 @@ def run():
         sys.exit()
 
     if "-version" in sys.argv or "--version" in sys.argv:
+        from dials.util.version import dials_version
+
         print(xia2.XIA2Version.Version)
         print(dials_version())
         ccp4_version = get_ccp4_version()
@@ -8,6 +8,8 @@ import math
 import os
 from multiprocessing import Lock, Value
 
+from xia2.Handlers import LogIndex
+
 logger = logging.getLogger("xia2.lib.bits")
 
 
@@ -99,6 +101,7 @@ def auto_logfiler(DriverInstance, extra=None):
     DriverInstance.set_xpid(number)
 
     logger.debug("Logfile: %s -> %s", executable, logfile)
+    LogIndex.record_logfile(logfile)
 
     DriverInstance.write_log_file(logfile)
 
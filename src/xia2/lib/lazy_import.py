@@ -0,0 +1,37 @@
+# Deferred imports of heavy dependencies, so that the start up cost of a
+# module is only paid by the code paths which actually use it, rather than by
+# every program (or multiprocessing worker) which imports xia2 modules.
+
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Return the module name, without executing it until an attribute of
+    the module is first accessed. Modules which have already been imported
+    are returned as they are.
+
+    Intended for pure Python modules bound at module level, e.g.
+
+      dials_import = lazy_import("dials.command_line.dials_import")
+
+    Note that importing a submodule still imports its parent packages."""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
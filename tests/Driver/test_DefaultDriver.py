@@ -1,11 +1,35 @@
 from __future__ import annotations
 
+import sys
+
 import pytest
 
 import xia2.Driver.DefaultDriver
+import xia2.Driver.DriverFactory
 
 
 def test_defaultdriver_fails_on_start():
     d = xia2.Driver.DefaultDriver.DefaultDriver()
     with pytest.raises(NotImplementedError):
         d.start()
+
+
+def test_output_record_limit(tmp_path):
+    d = xia2.Driver.DriverFactory.DriverFactory.Driver("simple")
+    d.set_executable(sys.executable)
+    d.add_command_line("-c")
+    d.add_command_line("for i in range(5000): print(i)")
+    d.set_working_directory(str(tmp_path))
+    d.set_output_record_limit(10)
+    d.write_log_file(str(tmp_path / "python.log"))
+    d.start()
+    d.close_wait()
+    d.check_for_errors()
+
+    # only the end of the output is kept in memory, but all of it is logged
+    assert [record.strip() for record in d.get_all_output() if record] == [
+        str(i) for i in range(4991, 5000)
+    ]
+    assert (tmp_path / "python.log").read_text().split()[:5000] == [
+        str(i) for i in range(5000)
+    ]
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import concurrent.futures
+from unittest import mock
+
+import libtbx.phil
+
+import xia2.Handlers.Journal
+from xia2.Handlers.Journal import _Journal, sweep_fingerprint
+from xia2.Handlers.Phil import PhilIndex
+
+
+class _Sweep:
+    def __init__(self, name, state):
+        self._name = name
+        self._state = state
+
+    def get_name(self):
+        return self._name
+
+    def get_wavelength(self):
+        return None
+
+    def get_processing_state(self):
+        return {"_state": self._state}
+
+
+def test_journal_latest_record(tmp_path):
+    journal = _Journal()
+    sweep1 = _Sweep("SWEEP1", "indexed")
+    sweep2 = _Sweep("SWEEP2", "indexed")
+
+    fingerprints = {"SWEEP1": "a", "SWEEP2": "b"}
+    with mock.patch.object(
+        xia2.Handlers.Journal,
+        "sweep_fingerprint",
+        side_effect=lambda s: fingerprints[s.get_name()],
+    ):
+        # nothing is recorded until the journal has a file
+        journal.record_sweep(sweep1, "index")
+        journal.open(tmp_path / "xia2-journal.jsonl")
+        assert journal.latest_record(sweep1) is None
+
+        journal.record_sweep(sweep1, "index")
+        journal.record_sweep(sweep2, "index")
+        sweep1._state = "integrated"
+        journal.record_sweep(sweep1, "integrate")
+
+        # a partially written record, e.g. after a crash, is ignored
+        with (tmp_path / "xia2-journal.jsonl").open("a") as fh:
+            fh.write('{"sweep": "default/default/SWEEP1", "stage"')
+
+        record = journal.latest_record(sweep1)
+        assert record["stage"] == "integrate"
+        assert record["payload"]["_state"] == "integrated"
+        assert journal.latest_record(sweep2)["stage"] == "index"
+
+        # changed inputs invalidate the records for that sweep only
+        fingerprints["SWEEP2"] = "c"
+        assert journal.latest_record(sweep2) is None
+        assert journal.latest_record(sweep1) is not None
+
+
+def _record_sweeps(filename, name, n):
+    # in a worker process, as a sweep processed in parallel
+    xia2.Handlers.Journal.sweep_fingerprint = lambda s: "a"
+    journal = _Journal()
+    journal.open(filename)
+    for i in range(n):
+        # records much larger than the pipe buffer or a single page
+        journal.record_sweep(_Sweep(name, str(i) * 100000), "index")
+
+
+def test_journal_parallel_writers(tmp_path):
+    filename = tmp_path / "xia2-journal.jsonl"
+    names = ["SWEEP%d" % i for i in range(4)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=4) as pool:
+        for future in [pool.submit(_record_sweeps, filename, n, 10) for n in names]:
+            future.result()
+
+    journal = _Journal()
+    journal.open(filename)
+    records = list(journal._read_records())
+    # no record has been lost to interleaving with another
+    assert len(records) == 40
+    assert len(filename.read_text().splitlines()) == 40
+    for name in names:
+        assert [r["payload"]["_state"][0] for r in records if name in r["sweep"]] == [
+            str(i) for i in range(10)
+        ]
+
+
+def test_journal_relocate(tmp_path):
+    # a sweep processed in a temporary directory below that of the journal,
+    # from which its output is moved (see process_one_sweep)
+    tmpdir = tmp_path / "6fa459ea-ee8a-3ca4-894e-db77e160355e"
+    sweep = _Sweep("SWEEP1", str(tmpdir / "DEFAULT" / "NATIVE" / "SWEEP1"))
+    journal = _Journal()
+    journal.open(tmp_path / "xia2-journal.jsonl", relocate=(tmpdir, tmp_path))
+    with mock.patch.object(
+        xia2.Handlers.Journal, "sweep_fingerprint", return_value="a"
+    ):
+        journal.record_sweep(sweep, "index")
+        record = journal.latest_record(sweep)
+    assert record["payload"]["_state"] == str(tmp_path / "DEFAULT/NATIVE/SWEEP1")
+
+
+def test_sweep_fingerprint_parameters():
+    class _Template(_Sweep):
+        def get_template(self):
+            return "insulin_1_###.img"
+
+        def get_image_range(self):
+            return (1, 45)
+
+        def get_imageset(self):
+            return None
+
+    def fingerprint(parameters):
+        with mock.patch.object(
+            PhilIndex, "get_diff", return_value=libtbx.phil.parse(parameters)
+        ):
+            return sweep_fingerprint(_Template("SWEEP1", None))
+
+    serial = fingerprint("xia2.settings.space_group = P41212")
+    # as for the sweep processed in parallel
+    parallel = fingerprint(
+        """
+        xia2.settings {
+          space_group = P41212
+          multiprocessing.mode = serial
+          multiprocessing.njob = 1
+          multiprocessing.nproc = 4
+          sweep.id = SWEEP1
+          developmental.journal = /path/to/xia2-journal.jsonl
+        }
+        """
+    )
+    assert parallel == serial
+    assert fingerprint("xia2.settings.space_group = P43212") != serial
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+
+from xia2.Handlers import LogIndex
+
+table = """\
+ $TABLE: Analysis against Batch:
+ $GRAPHS: Rmerge v Batch:A:1,2: $$
+ N Batch Rmerge $$
+ $$
+ 1 1 0.05
+ 2 2 0.06
+ $$
+"""
+
+
+def test_logfile_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(LogIndex, "_logfile_index", None)
+    index = "xia2-debug.txt" + LogIndex.INDEX_SUFFIX
+    LogIndex.set_logfile_index(index)
+    for i in range(1, 1001):
+        LogIndex.record_logfile(f"{i}_xds.log")
+    assert LogIndex.last_logfile(index) == os.path.abspath("1000_xds.log")
+
+    logfiles, offset = LogIndex.logfiles_from(index)
+    assert len(logfiles) == 1000
+
+    # a partially written record is left for the next read
+    with open(index, "a") as fh:
+        fh.write("/path/to/1001_")
+    logfiles, offset = LogIndex.logfiles_from(index, offset)
+    assert logfiles == []
+    with open(index, "a") as fh:
+        fh.write("aimless.log\n")
+    logfiles, offset = LogIndex.logfiles_from(index, offset)
+    assert logfiles == ["/path/to/1001_aimless.log"]
+    assert LogIndex.last_logfile(index) == "/path/to/1001_aimless.log"
+
+
+def test_loggraph_index(tmp_path):
+    logfile = os.fspath(tmp_path / "1_aimless.log")
+    assert LogIndex.loggraph_table_lines(logfile) is None
+
+    LogIndex.clear_loggraph_index(logfile)
+    with open(logfile, "w", encoding="utf-8") as fh:
+        for i in range(100):
+            fh.write(f"some output {i}\n")
+            if i in (10, 50):
+                LogIndex.record_loggraph_table(fh)
+                fh.write(table)
+
+    lines = LogIndex.loggraph_table_lines(logfile)
+    assert "".join(lines) == 2 * table
+
+    # an index which does not match the log file is not used
+    with open(logfile, "w") as fh:
+        fh.write("different output\n" * 100)
+    assert LogIndex.loggraph_table_lines(logfile) is None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+
+from xia2.Handlers import Phil
+
+
+def test_master_phil_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", os.fspath(tmp_path))
+    cache_file = Phil._master_phil_cache_file()
+    assert cache_file.startswith(os.fspath(tmp_path))
+    assert not os.path.exists(cache_file)
+
+    # the first time the scope is built and cached, then read from the cache
+    built = Phil._load_master_phil()
+    assert os.path.isfile(cache_file)
+    cached = Phil._load_master_phil()
+    assert cached.as_str(attributes_level=3) == built.as_str(attributes_level=3)
+    assert (
+        cached.extract().xia2.settings.resolution.isigma
+        == built.extract().xia2.settings.resolution.isigma
+        is None
+    )
+
+    # a corrupt cache file is ignored
+    with open(cache_file, "w") as fh:
+        fh.write("xia2 {")
+    rebuilt = Phil._load_master_phil()
+    assert rebuilt.as_str(attributes_level=3) == built.as_str(attributes_level=3)
+
+
+def test_master_phil_cache_included_sources(tmp_path, monkeypatch):
+    # a package defining scopes included by the master scope, one of which
+    # includes another, as in a development install of dials
+    package = tmp_path / "xia2_test_scopes"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "outer.py").write_text(
+        'phil_str = """\ninclude scope xia2_test_scopes.inner.phil_str\n"""\n'
+    )
+    (package / "inner.py").write_text('phil_str = "x = 1"\n')
+    monkeypatch.syspath_prepend(os.fspath(tmp_path))
+    monkeypatch.setattr(
+        Phil,
+        "master_phil_str",
+        "include scope xia2_test_scopes.outer.phil_str\n"
+        "#include scope xia2_test_scopes.commented_out.phil_str\n",
+    )
+
+    assert Phil._included_sources(Phil.master_phil_str) == [
+        os.fspath(package / "outer.py"),
+        os.fspath(package / "inner.py"),
+    ]
+    cache_file = Phil._master_phil_cache_file()
+    assert Phil._master_phil_cache_file() == cache_file
+    # a change to a scope included by an included scope gives a new cache
+    (package / "inner.py").write_text('phil_str = "x = 2"\n')
+    assert Phil._master_phil_cache_file() != cache_file
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import pickle
+
+import numpy as np
+
+from xia2.Modules.Indexer.SpotfindingCache import (
+    SpotfindingCache,
+    combine_hot_masks,
+    merge_ranges,
+    spotfinding_key,
+    subtract_ranges,
+)
+
+
+def test_ranges():
+    assert merge_ranges([(21, 25), (1, 5), (6, 10), (8, 12)]) == [(1, 12), (21, 25)]
+    assert subtract_ranges([(1, 90)], []) == [(1, 90)]
+    assert subtract_ranges([(1, 5), (45, 49), (86, 90)], [(1, 5), (46, 47)]) == [
+        (45, 45),
+        (48, 49),
+        (86, 90),
+    ]
+    assert subtract_ranges([(1, 90)], [(1, 5), (45, 49), (86, 90)]) == [
+        (6, 44),
+        (50, 85),
+    ]
+    assert subtract_ranges([(10, 20)], [(1, 100)]) == []
+
+
+def test_spotfinding_cache(tmp_path):
+    mask = tmp_path / "pixels.mask"
+    mask.write_bytes(b"mask")
+    parameters = {"min_spot_size": 3, "sigma_strong": None}
+    key = spotfinding_key("insulin_1_###.img", parameters, [str(mask)])
+    assert key == spotfinding_key("insulin_1_###.img", dict(parameters), [str(mask)])
+    assert key != spotfinding_key("insulin_1_###.img", {"min_spot_size": 4}, [])
+    mask.write_bytes(b"new mask")
+    assert key != spotfinding_key("insulin_1_###.img", parameters, [str(mask)])
+    # the key depends on the geometry, e.g. for the filtering of ice rings
+    geometry = {"beam": {"wavelength": 0.9795}, "detector": {"distance": 190.0}}
+    key = spotfinding_key("insulin_1_###.img", parameters, [], geometry)
+    assert key != spotfinding_key("insulin_1_###.img", parameters, [])
+    geometry["detector"]["distance"] = 250.0
+    assert key != spotfinding_key("insulin_1_###.img", parameters, [], geometry)
+
+    cache = SpotfindingCache(str(tmp_path))
+    assert cache.get(key) is None
+    spots = tmp_path / "1_strong.refl"
+    spots.write_bytes(b"")
+    experiments = tmp_path / "1_strong.expt"
+    experiments.write_bytes(b"")
+    hot_mask = tmp_path / "1_hot_mask_0.pickle"
+    hot_mask.write_bytes(b"")
+    cache.set(key, [(45, 49), (1, 5), (6, 10)], str(spots), str(experiments))
+    cache.set("hot", [(1, 5)], str(spots), str(experiments), str(hot_mask))
+
+    # the cache is kept for later runs in the same directory
+    assert SpotfindingCache(str(tmp_path)).get(key) == {
+        "ranges": [(1, 10), (45, 49)],
+        "filename": str(spots),
+        "experiments": str(experiments),
+        "hot_mask": None,
+    }
+    assert SpotfindingCache(str(tmp_path)).get("hot")["hot_mask"] == str(hot_mask)
+    # but not if any of the files have gone
+    hot_mask.unlink()
+    assert SpotfindingCache(str(tmp_path)).get("hot") is None
+    assert SpotfindingCache(str(tmp_path)).get(key) is not None
+    experiments.unlink()
+    assert SpotfindingCache(str(tmp_path)).get(key) is None
+
+
+def test_combine_hot_masks(tmp_path):
+    first = np.ones((2, 3), dtype=bool)
+    first[0, 1] = False
+    second = np.ones((2, 3), dtype=bool)
+    second[1, 2] = False
+    for name, mask in (("first", first), ("second", second)):
+        with (tmp_path / name).open("wb") as fh:
+            pickle.dump((mask, np.ones(2, dtype=bool)), fh)
+
+    # the pixels hot on either set of images are masked, per panel
+    combine_hot_masks([tmp_path / "first", tmp_path / "second"], tmp_path / "second")
+    with (tmp_path / "second").open("rb") as fh:
+        combined = pickle.load(fh)
+    assert len(combined) == 2
+    assert combined[0].tolist() == [[True, False, True], [True, True, False]]
+    assert combined[1].all()
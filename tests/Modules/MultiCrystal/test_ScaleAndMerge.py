@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import copy
 
+import pytest
+from dials.algorithms.scaling.target_function import ScalingTarget
 from dials.array_family import flex
 from dxtbx.serialize import load
 
 from xia2.cli.multiplex import phil_scope
-from xia2.Modules.MultiCrystal.ScaleAndMerge import MultiCrystalScale
+from xia2.Modules.MultiCrystal.data_manager import DataManager
+from xia2.Modules.MultiCrystal.ScaleAndMerge import MultiCrystalScale, Scale
 
 
 def test_init(dials_data):
@@ -43,3 +46,54 @@ def test_init(dials_data):
 
     runner = MultiCrystalScale(expts, refls3, params)
     assert list(runner._data_manager.experiments.identifiers()) == identifiers
+
+
+def test_warm_start_scaling(dials_data, run_in_tmp_path, monkeypatch):
+    """
+    Benchmark scaling from the models of a previous scaling of all of the data
+    (warm start) against scaling with new models (cold start), by the number of
+    evaluations of the scaling target in the minimisation.
+    """
+    lcy = dials_data("l_cysteine_4_sweeps_scaled")
+    expts = load.experiment_list(lcy / "scaled_20_25.expt", check_format=False)
+    refls = flex.reflection_table.from_file(lcy / "scaled_20_25.refl")
+    assert all(expt.scaling_model is not None for expt in expts)
+
+    evaluations = []
+    compute_functional_gradients = ScalingTarget.compute_functional_gradients
+
+    def counted(self, *args, **kwargs):
+        evaluations[-1] += 1
+        return compute_functional_gradients(self, *args, **kwargs)
+
+    monkeypatch.setattr(ScalingTarget, "compute_functional_gradients", counted)
+
+    params = phil_scope.extract()
+    params.unit_cell.refine = []
+    params.resolution.d_min = 0.8
+    params.scaling.warm_start.max_iterations = 3
+
+    evaluations.append(0)
+    cold_expts = copy.deepcopy(expts)
+    for expt in cold_expts:
+        expt.scaling_model = None
+    cold = Scale(DataManager(cold_expts, copy.deepcopy(refls)), params, warm_start=True)
+
+    evaluations.append(0)
+    warm = Scale(
+        DataManager(copy.deepcopy(expts), copy.deepcopy(refls)),
+        params,
+        warm_start=True,
+    )
+
+    # without models to start from, there is a full scaling, while the short
+    # refinement from the previous models converges to the same result
+    cold_evaluations, warm_evaluations = evaluations
+    assert 0 < warm_evaluations < cold_evaluations
+    cc_half = []
+    for scaled in (cold, warm):
+        scaled_array, _, _ = scaled.data_manager.reflections_as_miller_arrays(
+            combined=True
+        )
+        cc_half.append(scaled_array.cc_one_half())
+    assert cc_half[1] == pytest.approx(cc_half[0], abs=0.01)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import random
+
+from dials.array_family import flex
+from dxtbx.model import Experiment, ExperimentList
+
+from xia2.Modules.MultiCrystal.data_manager import DataManager
+
+
+def test_reflections_per_experiment():
+    # non-contiguous ids, in a different order to the experiments
+    ids_to_identifiers = {0: "a", 2: "b", 5: "c", 7: "d"}
+    experiments = ExperimentList(
+        [Experiment(identifier=identifier) for identifier in ("c", "a", "d", "b")]
+    )
+    random.seed(0)
+    ids = [random.choice([0, 2, 5]) for _ in range(1000)]
+    reflections = flex.reflection_table()
+    reflections["id"] = flex.int(ids)
+    reflections["intensity.scale.value"] = flex.double(range(len(ids)))
+    reflections["miller_index"] = flex.miller_index(
+        [(random.randint(-10, 10), random.randint(-10, 10), 1) for _ in ids]
+    )
+    for id_, identifier in ids_to_identifiers.items():
+        reflections.experiment_identifiers()[id_] = identifier
+
+    data_manager = DataManager(experiments, reflections)
+    per_experiment = data_manager.reflections_per_experiment()
+    assert len(per_experiment) == len(experiments)
+    for expt, table in zip(experiments, per_experiment):
+        # the same as selecting the reflections for each experiment in turn
+        expected = reflections.select_on_experiment_identifiers([expt.identifier])
+        expected.reset_ids()
+        assert dict(table.experiment_identifiers()) == dict(
+            expected.experiment_identifiers()
+        )
+        assert list(table["id"]) == list(expected["id"])
+        assert list(table["intensity.scale.value"]) == list(
+            expected["intensity.scale.value"]
+        )
+        assert list(table["miller_index"]) == list(expected["miller_index"])
+    # an experiment with no reflections gives an empty table
+    assert per_experiment[2].size() == 0
+    # the input reflections are unchanged
+    assert len(reflections.experiment_identifiers()) == 4
+    assert list(reflections["id"]) == ids
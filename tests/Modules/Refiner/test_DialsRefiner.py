@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import os
+import time
+
+import pytest
+
+from xia2.Handlers.Phil import PhilIndex
+from xia2.lib.bits import _get_number
+from xia2.Modules.Refiner.DialsRefiner import DialsRefiner, _Refinement
+
+
+def _sweep_name(filename):
+    (name,) = (p for p in os.path.basename(filename).split("_") if "SWEEP" in p)
+    return name
+
+
+class _Refine:
+    """A dials.refine wrapper which records its runs rather than running,
+    taking longer for the earlier sweeps so that the refinements finish in
+    reverse order."""
+
+    def __init__(self, working_directory, runs, failures):
+        self._working_directory = working_directory
+        self._runs = runs
+        self._failures = failures
+        self._xpid = _get_number()
+        self._scan_varying = True
+
+    def set_experiments_filename(self, filename):
+        self._experiments_filename = filename
+
+    def set_indexed_filename(self, filename):
+        self._indexed_filename = filename
+
+    def set_scan_varying(self, scan_varying):
+        self._scan_varying = scan_varying
+
+    def set_interval_width_degrees(self, width):
+        pass
+
+    def run(self):
+        name = _sweep_name(self._experiments_filename)
+        time.sleep(0.05 * (4 - int(name[-1])))
+        if name in self._failures:
+            raise RuntimeError(f"refinement of {name} failed")
+        self._runs.append((self._xpid, name, self._scan_varying))
+
+    def _output(self, extension):
+        name = _sweep_name(self._experiments_filename)
+        return os.path.join(
+            self._working_directory, f"{self._xpid}_{name}_refined.{extension}"
+        )
+
+    def get_refined_experiments_filename(self):
+        return self._output("expt")
+
+    def get_refined_filename(self):
+        return self._output("refl")
+
+    def get_log_file(self):
+        return os.path.join(self._working_directory, f"{self._xpid}_dials.refine.log")
+
+
+class _Indexer:
+    def __init__(self, sweeps):
+        self._indxr_sweeps = sweeps
+
+    def get_indexer_experiment_list(self):
+        return [None] * len(self._indxr_sweeps)
+
+    def get_indexer_payload(self, name):
+        return {
+            "experiments_filename": "indexed.expt",
+            "indexed_filename": "indexed.refl",
+        }[name]
+
+
+class _Sweep:
+    def __init__(self, name, working_directory):
+        self._name = name
+        self._refiner = DialsRefiner()
+        self._refiner.set_working_directory(working_directory)
+        self._refiner.add_refiner_sweep(self)
+
+    def get_name(self):
+        return self._name
+
+    def _get_refiner(self):
+        return self._refiner
+
+
+class _Refinements:
+    def __init__(self):
+        # (xpid, sweep name, scan varying) of each refinement run
+        self.runs = []
+        # the names of the sweeps whose refinements fail
+        self.failures = set()
+        # (sweep name, _Refinement) as each refiner finishes
+        self.finished = []
+
+
+@pytest.fixture
+def refinements(monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.multiprocessing, "nproc", 4)
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "multi_sweep_refinement", False)
+    refinements = _Refinements()
+
+    def refine(self):
+        return _Refine(
+            self.get_working_directory(), refinements.runs, refinements.failures
+        )
+
+    def prepare_refinement(self, idxr):
+        (xsweep,) = self._refinr_sweeps
+        indexed = os.path.join(self.get_working_directory(), xsweep.get_name())
+        return _Refinement(
+            self,
+            idxr,
+            f"{indexed}_indexed.expt",
+            f"{indexed}_indexed.refl",
+            True,
+            True,
+            90,
+        )
+
+    def finish_refinement(self, refinement):
+        refinements.finished.append((self._refinr_sweeps[0].get_name(), refinement))
+
+    monkeypatch.setattr(DialsRefiner, "Refine", refine)
+    monkeypatch.setattr(DialsRefiner, "_prepare_refinement", prepare_refinement)
+    monkeypatch.setattr(DialsRefiner, "_finish_refinement", finish_refinement)
+    return refinements
+
+
+@pytest.fixture
+def xsweeps(tmp_path):
+    # three sweeps, indexed together and refined separately
+    xsweeps = [_Sweep(f"SWEEP{i}", str(tmp_path)) for i in (1, 2, 3)]
+    indexer = _Indexer(xsweeps)
+    for xsweep in xsweeps:
+        xsweep._get_refiner().add_refiner_indexer(1, indexer)
+    return xsweeps
+
+
+def _xpid(filename):
+    return int(os.path.basename(filename).split("_")[0])
+
+
+def test_refinements_are_numbered_in_sweep_order(refinements, xsweeps):
+    refiner = xsweeps[0]._get_refiner()
+    others = refiner._prepare_other_refinements()
+    assert [r.refiner for r in others] == [x._get_refiner() for x in xsweeps[1:]]
+
+    own = [
+        refiner._prepare_refinement(idxr) for idxr in refiner._get_refiner_indexers()
+    ]
+    refiner._run_refinements(own, others)
+
+    # the refinements finish in reverse order, but the wrappers, and so their
+    # files, are numbered in the order of the sweeps: the scan-static
+    # refinements, then the scan-varying refinements
+    assert [name for _, name, _ in refinements.runs[:3]] == [
+        "SWEEP3",
+        "SWEEP2",
+        "SWEEP1",
+    ]
+    assert [
+        (name, scan_varying) for _, name, scan_varying in sorted(refinements.runs)
+    ] == [
+        ("SWEEP1", False),
+        ("SWEEP2", False),
+        ("SWEEP3", False),
+        ("SWEEP1", True),
+        ("SWEEP2", True),
+        ("SWEEP3", True),
+    ]
+    xpids = sorted(xpid for xpid, _, _ in refinements.runs)
+    for refinement, xsweep, xpid in zip(own + others, xsweeps, xpids[3:]):
+        assert refinement.done and not refinement.failed
+        # each refinement has the results of the refinement of its own sweep
+        assert refinement.experiments_filename.endswith(
+            f"{xpid}_{xsweep.get_name()}_refined.expt"
+        )
+        assert _xpid(refinement.log_file) == xpid
+
+
+def test_prefetched_refinements_are_used(refinements, xsweeps):
+    xsweeps[0]._get_refiner().refine()
+    assert [name for name, _ in refinements.finished] == ["SWEEP1"]
+    assert len(refinements.runs) == 6
+
+    # the other sweeps are not refined again when their refiners are used, but
+    # take the results refined alongside the first sweep
+    for xsweep in xsweeps[1:]:
+        refiner = xsweep._get_refiner()
+        (prefetched,) = refiner._prefetched_refinements.values()
+        refiner.refine()
+        assert refinements.finished[-1] == (xsweep.get_name(), prefetched)
+        assert not refiner._prefetched_refinements
+    assert len(refinements.runs) == 6
+
+
+def test_failed_other_refinement_falls_back_to_serial(refinements, xsweeps):
+    refinements.failures.add("SWEEP2")
+    # the failure of another sweep's refinement is not raised here
+    xsweeps[0]._get_refiner().refine()
+    assert [name for name, _ in refinements.finished] == ["SWEEP1"]
+    assert not xsweeps[1]._get_refiner()._prefetched_refinements
+    assert len(xsweeps[2]._get_refiner()._prefetched_refinements) == 1
+
+    # that sweep is refined by its own refiner when it is used, without
+    # refining the others again
+    refinements.failures.clear()
+    del refinements.runs[:]
+    xsweeps[1]._get_refiner().refine()
+    name, refinement = refinements.finished[-1]
+    assert name == "SWEEP2"
+    assert refinement.done and not refinement.failed
+    assert [(name, scan_varying) for _, name, scan_varying in refinements.runs] == [
+        ("SWEEP2", False),
+        ("SWEEP2", True),
+    ]
+
+
+def test_failed_own_refinement_is_raised(refinements, xsweeps):
+    refinements.failures.add("SWEEP1")
+    with pytest.raises(RuntimeError, match="SWEEP1"):
+        xsweeps[0]._get_refiner().refine()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import concurrent.futures
+import random
+
+import pytest
+from cctbx import crystal
+from dxtbx.model import Crystal, Experiment, ExperimentList
+
+from xia2.Modules.SSX import data_integration_programs
+from xia2.Modules.SSX.data_integration_programs import (
+    IncrementalUnitCellClustering,
+    _auto_threshold_clusters,
+)
+
+
+def _cells(n, seed=0):
+    # two populations of unit cells, with a spread in cell lengths
+    rng = random.Random(seed)
+    cells = []
+    for i in range(n):
+        a, c = (78.0, 37.0) if i % 3 else (96.0, 45.0)
+        cells.append(
+            (rng.gauss(a, 0.5), rng.gauss(a, 0.5), rng.gauss(c, 0.3), 90, 90, 90)
+        )
+    return cells
+
+
+def _symmetries(n):
+    return [
+        crystal.symmetry(unit_cell=cell, space_group_symbol="P 1") for cell in _cells(n)
+    ]
+
+
+def _experiments(n, seed=0):
+    experiments = ExperimentList()
+    for a, b, c, *_ in _cells(n, seed):
+        crystal_model = Crystal(
+            (a, 0, 0), (0, b, 0), (0, 0, c), space_group_symbol="P 1"
+        )
+        experiments.append(Experiment(crystal=crystal_model))
+    return experiments
+
+
+def _summary(result):
+    _, large_clusters = result
+    return [tuple(cluster.median_cell) for cluster in large_clusters]
+
+
+def test_auto_threshold_clusters_parallel(monkeypatch):
+    symmetries = _symmetries(60)
+    serial = _auto_threshold_clusters(symmetries, nproc=1)
+    assert _summary(serial)
+
+    # a small number of crystals is clustered in-process, whatever nproc is
+    with monkeypatch.context() as m:
+        m.setattr(concurrent.futures, "ProcessPoolExecutor", None)
+        result = _auto_threshold_clusters(symmetries, nproc=4)
+    assert _summary(result) == _summary(serial)
+
+    monkeypatch.setattr(
+        data_integration_programs, "PARALLEL_CLUSTERING_MIN_CRYSTALS", 0
+    )
+    # the clusterings at all thresholds are calculated concurrently, to give
+    # the same result as the serial search
+    assert _summary(_auto_threshold_clusters(symmetries, nproc=4)) == _summary(serial)
+
+
+def test_incremental_clustering_reservoir():
+    clustering = IncrementalUnitCellClustering(threshold="auto", max_crystals=20)
+    first = _experiments(15)
+    clustering.add_experiments(first)
+    assert len(clustering) == 15
+    assert not clustering.is_sampled
+    exact = clustering.clusters(exact=True)
+    # with all crystals in the reservoir, the results are those of the exact
+    # clustering, and are cached until more crystals are added
+    assert clustering.clusters() is exact
+    assert "random sample" not in clustering.condensed_info()
+
+    for seed in range(1, 6):
+        clustering.add_experiments(_experiments(15, seed))
+    assert len(clustering) == 90
+    assert clustering.is_sampled
+    assert len(clustering._reservoir) == 20
+    assert all(s in clustering._all_symmetries for s in clustering._reservoir)
+    assert clustering.clusters() is not clustering.clusters(exact=True)
+    assert "random sample of 20 of 90 crystals" in clustering.condensed_info()
+
+
+def test_incremental_clustering_reservoir_is_uniform():
+    # each crystal is kept in the reservoir with probability max_crystals / n
+    counts = [0] * 50
+    trials = 400
+    experiments = _experiments(50)
+    for seed in range(trials):
+        clustering = IncrementalUnitCellClustering(max_crystals=10, seed=seed)
+        clustering.add_experiments(experiments)
+        for symmetry in clustering._reservoir:
+            counts[clustering._all_symmetries.index(symmetry)] += 1
+    assert sum(counts) == 10 * trials
+    for count in counts:
+        assert count / trials == pytest.approx(0.2, abs=0.1)
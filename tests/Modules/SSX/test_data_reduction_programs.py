@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from dials.array_family import flex
+from dxtbx.model import Crystal, Experiment, ExperimentList
+
+from xia2.Modules.SSX.data_reduction_definitions import FilePair
+from xia2.Modules.SSX.data_reduction_programs import (
+    _crystal_data_from_file_pair,
+    mean_I_over_sigma,
+)
+
+
+def _per_experiment_mean_I_over_sigma(refls, expts, partiality_cutoff=0.25):
+    # The previous implementation, splitting the table by experiment.
+    tables = refls.split_by_experiment_id()
+    assert len(tables) == len(expts)
+    mean_I_over_sigma_values = []
+    for table in tables:
+        sel = table.get_flags(table.flags.integrated_sum) & (
+            table["partiality"] > partiality_cutoff
+        )
+        I = table["intensity.sum.value"].select(sel)
+        V = table["intensity.sum.variance"].select(sel)
+        if not V.all_gt(0):
+            sel2 = V > 0
+            I = I.select(sel2)
+            V = V.select(sel2)
+        if not I.size():
+            mean_I_over_sigma_values.append(0.0)
+        else:
+            mean_I_over_sigma_values.append(flex.mean(I / flex.sqrt(V)))
+    return mean_I_over_sigma_values
+
+
+def _experiments(n):
+    experiments = ExperimentList()
+    for i in range(n):
+        crystal = Crystal(
+            (50 + i, 0, 0), (0, 60, 0), (0, 0, 70), space_group_symbol="P 1"
+        )
+        experiments.append(Experiment(crystal=crystal, identifier=str(i)))
+    return experiments
+
+
+def _reflections(n_expts):
+    random.seed(0)
+    ids = [random.randrange(n_expts) for _ in range(1000)]
+    reflections = flex.reflection_table()
+    reflections["id"] = flex.int(ids)
+    reflections["intensity.sum.value"] = flex.double(
+        [random.uniform(-10, 100) for _ in ids]
+    )
+    # including some reflections with zero or negative variances
+    reflections["intensity.sum.variance"] = flex.double(
+        [random.choice([0.0, -1.0, random.uniform(1, 50)]) for _ in ids]
+    )
+    # the last experiment has no reflections passing the partiality cutoff
+    reflections["partiality"] = flex.double(
+        [0.0 if i == n_expts - 1 else random.random() for i in ids]
+    )
+    reflections.set_flags(
+        flex.bool([random.random() > 0.1 for _ in ids]),
+        reflections.flags.integrated_sum,
+    )
+    return reflections
+
+
+def test_mean_I_over_sigma():
+    experiments = _experiments(5)
+    reflections = _reflections(5)
+    for cutoff in (0.0, 0.25, 0.9):
+        expected = _per_experiment_mean_I_over_sigma(reflections, experiments, cutoff)
+        assert mean_I_over_sigma(reflections, experiments, cutoff) == pytest.approx(
+            expected
+        )
+    assert mean_I_over_sigma(reflections, experiments)[-1] == 0.0
+
+
+@pytest.mark.parametrize("split", [False, True])
+def test_crystal_data_from_file_pair(tmp_path, split):
+    experiments = _experiments(3)
+    reflections = _reflections(3)
+    expt = tmp_path / "integrated.expt"
+    refl = tmp_path / "integrated.refl"
+    # with split=True, the crystal models are written to separate files
+    experiments.as_json(str(expt), split=split)
+    reflections.as_file(str(refl))
+
+    data = _crystal_data_from_file_pair(FilePair(expt, refl), True)
+    assert data.identifiers == ["0", "1", "2"]
+    assert [c.get_unit_cell().parameters()[0] for c in data.crystals] == pytest.approx(
+        [50, 51, 52]
+    )
+    assert data.mean_I_over_sigma_vals == pytest.approx(
+        _per_experiment_mean_I_over_sigma(reflections, experiments)
+    )
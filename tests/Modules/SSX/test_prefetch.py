@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import logging
+import time
+
+from xia2.Modules.SSX import prefetch
+from xia2.Modules.SSX.prefetch import ImagePrefetcher
+
+
+def _wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def _batches(tmp_path, n):
+    batches = []
+    for i in range(n):
+        batch = tmp_path / f"batch_{i}"
+        batch.mkdir()
+        (batch / "image_1.cbf").write_bytes(b"x" * 1000)
+        (batch / "image_2.cbf").write_bytes(b"x" * 1000)
+        batches.append(batch)
+    return batches
+
+
+def test_image_prefetcher(tmp_path, monkeypatch):
+    batches = _batches(tmp_path, 6)
+    prefetched = []
+
+    def batch_image_files(batch):
+        prefetched.append(batch)
+        return sorted(str(f) for f in batch.iterdir())
+
+    monkeypatch.setattr(prefetch, "batch_image_files", batch_image_files)
+
+    # with two batches in flight, the next two batches are read ahead
+    with ImagePrefetcher(batches, depth=2, in_flight=2) as prefetcher:
+        time.sleep(0.1)
+        # nothing is read until started
+        assert prefetched == []
+        prefetcher.start()
+        assert _wait_for(lambda: len(prefetched) == 2)
+        time.sleep(0.1)
+        assert prefetched == batches[2:4]
+
+        # as each batch finishes, one more is read ahead
+        prefetcher.batch_done()
+        assert _wait_for(lambda: len(prefetched) == 3)
+        assert prefetched[-1] == batches[4]
+        prefetcher.batch_done()
+        prefetcher.batch_done()
+        assert _wait_for(lambda: len(prefetched) == 4)
+        time.sleep(0.1)
+        # and no batch beyond the last
+        assert prefetched == batches[2:]
+    assert not prefetcher._thread.is_alive()
+
+
+def test_image_prefetcher_not_started(tmp_path):
+    # leaving an unstarted prefetcher is fine
+    with ImagePrefetcher(_batches(tmp_path, 2), depth=1) as prefetcher:
+        prefetcher.batch_done()
+    assert not prefetcher._thread.is_alive()
+
+
+def test_image_prefetcher_container_files(tmp_path, monkeypatch, caplog):
+    batches = _batches(tmp_path, 4)
+    prefetched = []
+
+    def batch_image_files(batch):
+        # e.g. the images of the batch are in an HDF5 file
+        prefetched.append(batch)
+        return []
+
+    monkeypatch.setattr(prefetch, "batch_image_files", batch_image_files)
+    with caplog.at_level(logging.INFO):
+        with ImagePrefetcher(batches, depth=2) as prefetcher:
+            prefetcher.start()
+            assert _wait_for(lambda: not prefetcher._thread.is_alive())
+    # the prefetching stops at the first batch, with a message
+    assert prefetched == batches[1:2]
+    assert "Not prefetching images" in caplog.text
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from xia2.Modules.SSX import reduction_pool
+from xia2.Modules.SSX.reduction_pool import reduction_worker_pool, worker_pool
+
+
+def _interval(duration):
+    start = time.monotonic()
+    time.sleep(duration)
+    return start, time.monotonic(), os.getpid()
+
+
+def _die():
+    os._exit(1)
+
+
+def _max_overlap(intervals):
+    events = sorted(
+        [(start, 1) for start, _, _ in intervals]
+        + [(end, -1) for _, end, _ in intervals]
+    )
+    running = overlap = 0
+    for _, change in events:
+        running += change
+        overlap = max(overlap, running)
+    return overlap
+
+
+def test_worker_pool_is_shared_between_stages():
+    with reduction_worker_pool(2):
+        with worker_pool(2) as pool:
+            first = [pool.submit(_interval, 0.1) for _ in range(4)]
+        with worker_pool(2) as pool:
+            second = [pool.submit(_interval, 0.1) for _ in range(4)]
+    pids = {f.result()[2] for f in first + second}
+    # the second stage reuses the worker processes of the first
+    assert len(pids) <= 2
+    assert reduction_pool._shared_pool is None
+
+
+def test_worker_pool_is_sized_per_stage():
+    with reduction_worker_pool(4):
+        with worker_pool(1) as pool:
+            serial = [pool.submit(_interval, 0.1) for _ in range(3)]
+        with worker_pool(3) as pool:
+            parallel = [pool.submit(_interval, 0.2) for _ in range(6)]
+    assert _max_overlap([f.result() for f in serial]) == 1
+    assert 1 < _max_overlap([f.result() for f in parallel]) <= 3
+
+
+def test_worker_pool_is_replaced_when_broken():
+    with reduction_worker_pool(2):
+        with worker_pool(2) as pool:
+            future = pool.submit(_die)
+        with pytest.raises(BrokenProcessPool):
+            future.result()
+        # later stages are not affected by the worker that died
+        with worker_pool(2) as pool:
+            futures = [pool.submit(_interval, 0) for _ in range(3)]
+        assert len([f.result() for f in futures]) == 3
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import iotbx.mtz
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+
+from xia2.Modules import MtzUtils
+from xia2.Modules.Mtzdump import Mtzdump
+
+
+def test_mtz_header_matches_iotbx(tmp_path):
+    xs = crystal.symmetry(
+        unit_cell=(78.1, 78.1, 78.1, 90, 90, 90), space_group_symbol="I213"
+    )
+    ms = miller.build_set(xs, anomalous_flag=False, d_min=3)
+    ma = ms.array(data=flex.double(ms.size(), 1), sigmas=flex.double(ms.size(), 1))
+    mtz_dataset = ma.as_mtz_dataset(column_root_label="I", wavelength=0.9795)
+    mtz_dataset.add_miller_array(
+        ma.customized_copy(data=flex.int(ma.size(), 0), sigmas=None),
+        column_root_label="FreeR_flag",
+    )
+    mtz_obj = mtz_dataset.mtz_object()
+    for i in range(1, 11):
+        mtz_obj.add_batch().set_num(i)
+    hklin = str(tmp_path / "test.mtz")
+    mtz_obj.write(hklin)
+
+    mtz_obj = iotbx.mtz.object(hklin)
+    header = MtzUtils.mtz_header(hklin)
+    assert header.n_reflections == mtz_obj.n_reflections()
+    assert header.space_group_name == mtz_obj.space_group_name()
+    assert header.space_group() == mtz_obj.space_group()
+    assert list(header.column_labels) == [c.label() for c in mtz_obj.columns()]
+    assert list(header.column_types) == [c.type() for c in mtz_obj.columns()]
+    assert MtzUtils.batches_from_mtz(hklin) == list(range(1, 11))
+    assert MtzUtils.nref_from_mtz(hklin) == mtz_obj.n_reflections()
+    assert MtzUtils.space_group_number_from_mtz(hklin) == 199
+
+    # the header is cached until the file changes
+    assert MtzUtils.mtz_header(hklin) is header
+
+    mtzdump = Mtzdump()
+    mtzdump.set_hklin(hklin)
+    mtzdump.dump()
+    assert mtzdump.get_spacegroup() == "I 21 3"
+    assert ("FreeR_flag", "I") in mtzdump.get_columns()
+    datasets = mtzdump.get_datasets()
+    assert len(datasets) == 1
+    assert mtzdump.get_dataset_info(datasets[0])["wavelength"] == pytest.approx(0.9795)
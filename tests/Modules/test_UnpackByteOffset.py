@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import struct
+
+import numpy as np
+import pytest
+
+from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
+
+
+def _pack_values_reference(values):
+    # straightforward implementation of the byte offset compression
+    current = 0
+    packed = b""
+    for v in values:
+        delta = v - current
+        current = v
+        if -127 < delta < 127:
+            packed += struct.pack("b", delta)
+            continue
+        packed += struct.pack("b", -128)
+        if -32767 < delta < 32767:
+            packed += struct.pack("<h", delta)
+            continue
+        packed += struct.pack("<h", -32768)
+        if -2147483647 < delta < 2147483647:
+            packed += struct.pack("<i", delta)
+            continue
+        packed += struct.pack("<i", -2147483648)
+        packed += struct.pack("<q", delta)
+    return packed
+
+
+@pytest.mark.parametrize("scale", [10, 200, 40000, 3_000_000_000])
+def test_pack_unpack_values(scale):
+    rng = np.random.default_rng(seed=scale)
+    values = rng.integers(-scale, scale, size=1000)
+    # including some -128s, which must not be taken as escapes
+    values[100:110] = -128
+    values = list(values) + [-1, -1, 0, 127, -127, 32767, -32768, 0]
+
+    packed = pack_values(values)
+    assert packed == _pack_values_reference(values)
+
+    unpacked = unpack_values(packed, len(values))
+    assert isinstance(unpacked, np.ndarray)
+    assert list(unpacked) == values
+
+    # trailing data (e.g. CBF padding) is ignored, and buffers are accepted
+    assert list(unpack_values(memoryview(packed + b"\0" * 10), len(values))) == values
+
+    with pytest.raises(ValueError):
+        unpack_values(packed, len(values) + 20)
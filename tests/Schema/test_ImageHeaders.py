@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+import shutil
+import sqlite3
+import types
+
+from dxtbx.model.experiment_list import (
+    BeamComparison,
+    DetectorComparison,
+    ExperimentListFactory,
+    GoniometerComparison,
+)
+
+from xia2.Schema import ImageHeaders
+
+
+def test_imagesets_from_headers(dials_data, tmp_path, monkeypatch):
+    # a copy of the first image which may be modified, links to the rest
+    shutil.copy(dials_data("insulin") / "insulin_1_001.img", tmp_path)
+    for j in range(2, 46):
+        tmp_path.joinpath(f"insulin_1_{j:03d}.img").symlink_to(
+            dials_data("insulin") / f"insulin_1_{j:03d}.img"
+        )
+    template = str(tmp_path / "insulin_1_###.img")
+    paths = [template.replace("###", f"{j:03d}") for j in range(1, 46)]
+    args = ({}, BeamComparison(), DetectorComparison(), GoniometerComparison(), 0.03)
+    cache_dir = str(tmp_path / "cache")
+
+    (imageset,) = ImageHeaders.imagesets_from_headers(
+        template, paths, *args, nproc=2, cache_dir=cache_dir
+    )
+    (expected,) = ExperimentListFactory.from_filenames(paths).imagesets()
+    assert imageset.get_scan() == expected.get_scan()
+    assert imageset.get_beam() == expected.get_beam()
+    assert imageset.get_detector() == expected.get_detector()
+    assert imageset.get_goniometer() == expected.get_goniometer()
+    assert list(imageset.paths()) == list(expected.paths())
+
+    read = []
+    _read_headers = ImageHeaders._read_headers
+
+    def read_headers(paths, format_kwargs):
+        read.extend(paths)
+        return _read_headers(paths, format_kwargs)
+
+    monkeypatch.setattr(ImageHeaders, "_read_headers", read_headers)
+
+    # the second time around, the headers are not read
+    (imageset,) = ImageHeaders.imagesets_from_headers(
+        template, paths, *args, cache_dir=cache_dir
+    )
+    assert imageset.get_scan() == expected.get_scan()
+    assert not read
+
+    # unless the image has changed
+    st = os.stat(paths[0])
+    os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    ImageHeaders.read_image_headers(paths, {}, cache_dir=cache_dir)
+    assert read == paths[:1]
+
+    # without a cache, all of the headers are read
+    del read[:]
+    ImageHeaders.read_image_headers(paths, {})
+    assert read == paths
+
+
+def _stat(size):
+    return types.SimpleNamespace(st_size=size, st_mtime_ns=size)
+
+
+def test_header_cache(tmp_path, monkeypatch):
+    cache = ImageHeaders.HeaderCache(str(tmp_path / "cache.sqlite"))
+    detector = {"panels": [{"name": "panel"}]}
+    stats = {f"image_{j}": _stat(j) for j in range(10)}
+    models = {
+        path: {"beam": None, "detector": detector, "goniometer": None, "scan": j}
+        for j, path in enumerate(stats)
+    }
+    cache.put(stats, "{}", models)
+    assert cache.get(stats, "{}") == models
+    assert cache.get(stats, '{"option": 1}') == {}
+    with sqlite3.connect(tmp_path / "cache.sqlite") as connection:
+        # the detector, shared by all of the images, is stored once
+        (count,) = connection.execute("SELECT COUNT(*) FROM models").fetchone()
+        assert count == 11
+
+    # a locked cache is a miss, rather than waiting for the lock
+    monkeypatch.setattr(ImageHeaders, "_LOCK_TIMEOUT", 0)
+    connection = sqlite3.connect(tmp_path / "cache.sqlite")
+    connection.execute("BEGIN EXCLUSIVE")
+    assert cache.get(stats, "{}") == {}
+    connection.rollback()
+    connection.close()
+
+    # the least recently used entries are evicted, along with their models
+    monkeypatch.setattr(ImageHeaders, "_MAX_ENTRIES", 3)
+    cache.get({path: stats[path] for path in ("image_0", "image_1")}, "{}")
+    new = {"image_10": _stat(10)}
+    cache.put(new, "{}", {"image_10": dict(models["image_0"], scan=10)})
+    assert sorted(cache.get({**stats, **new}, "{}")) == [
+        "image_0",
+        "image_1",
+        "image_10",
+    ]
+    with sqlite3.connect(tmp_path / "cache.sqlite") as connection:
+        (count,) = connection.execute("SELECT COUNT(*) FROM models").fetchone()
+        assert count == 4
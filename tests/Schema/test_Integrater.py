@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import os
+import time
+
+from xia2.Handlers.Files import _FileHandler
+from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema.Exceptions.BadLatticeError import BadLatticeError
+from xia2.Schema.Interfaces import Integrater as integrater_module
+from xia2.Schema.Interfaces.Integrater import Integrater
+
+
+class _Helper:
+    def __init__(self, lattices):
+        self.lattices = list(lattices)
+
+    def get_all(self):
+        return [(lattice, None) for lattice in self.lattices]
+
+
+class _Indexer:
+    _indxr_user_input_lattice = False
+
+    def __init__(self, lattices):
+        self._indxr_helper = _Helper(lattices)
+        self._working_directory = None
+
+    def eliminate(self, indxr_print=True):
+        self._indxr_helper.lattices.pop(0)
+
+    def set_working_directory(self, working_directory):
+        self._working_directory = working_directory
+
+    def get_working_directory(self):
+        return self._working_directory
+
+
+class _Refiner(_Indexer):
+    def __init__(self, indexer):
+        self._indexer = indexer
+        self._working_directory = None
+
+    def eliminate(self, indxr_print=True):
+        self._indexer.eliminate(indxr_print=indxr_print)
+
+    def get_refiner_done(self):
+        return True
+
+    def get_indexer_sweeps(self):
+        return [None]
+
+    def get_refiner_indexer(self, epoch):
+        return self._indexer
+
+
+class _Integrater(Integrater):
+    bad_lattices = ("tP", "oP")
+    # the directory in which a marker file is written as each lattice is
+    # prepared, in each working directory
+    marker_directory = None
+    # lattices which must all have been prepared before integration
+    barrier = ()
+    slow_lattices = ()
+    # whether to record log and data files, as the real integraters do
+    record_files = False
+
+    def _record_file(self, tag, extension):
+        filename = os.path.join(
+            self.get_working_directory(), f"{self._lattice()}_{tag}.{extension}"
+        )
+        open(filename, "w")
+        if extension == "log":
+            integrater_module.FileHandler.record_log_file(tag, filename)
+        else:
+            integrater_module.FileHandler.record_data_file(filename)
+
+    def _lattice(self):
+        return self._intgr_indexer._indxr_helper.lattices[0]
+
+    def _marker(self, lattice, working_directory):
+        return os.path.join(
+            self.marker_directory,
+            f"{lattice}_{os.path.basename(working_directory)}",
+        )
+
+    def _integrate_prepare(self):
+        if self.marker_directory:
+            open(self._marker(self._lattice(), self.get_working_directory()), "w")
+        if self.record_files:
+            self._record_file("refine", "log")
+        if self._lattice() in self.bad_lattices:
+            raise BadLatticeError(self._lattice())
+
+    def _integrate(self):
+        deadline = time.monotonic() + 30
+        while not all(
+            os.path.exists(self._marker(lattice, directory))
+            for lattice, directory in self.barrier
+        ):
+            assert time.monotonic() < deadline, "candidates integrated one at a time"
+            time.sleep(0.01)
+        if self._lattice() in self.slow_lattices:
+            time.sleep(60)
+        return None
+
+    def _integrate_finish(self):
+        if self.record_files:
+            self._record_file("integrate", "log")
+            self._record_file("integrated", "refl")
+        return (self._lattice(), os.path.basename(self.get_working_directory()))
+
+
+class _Sweep:
+    def __init__(self, lattices, working_directory):
+        indexer = _Indexer(lattices)
+        self._integrater = _Integrater()
+        self._integrater._intgr_indexer = indexer
+        self._integrater._intgr_refiner = _Refiner(indexer)
+        self._integrater.set_integrater_sweep(self)
+        for obj in (
+            self._integrater,
+            self._integrater._intgr_indexer,
+            self._integrater._intgr_refiner,
+        ):
+            obj.set_working_directory(working_directory)
+
+    def get_template(self):
+        return "insulin_1_###.img"
+
+    def get_processing_state(self):
+        # as XSweep.get_processing_state, for the parts used here
+        integrater = self._integrater
+        state = {
+            name: getattr(integrater, name)
+            for name in (
+                "_intgr_hklout",
+                "_intgr_prepare_done",
+                "_intgr_done",
+                "_intgr_finish_done",
+                "_intgr_working_directory",
+            )
+        }
+        state["_intgr_indexer"] = state["_intgr_refiner"] = None
+        return {
+            "lattices": list(integrater._intgr_indexer._indxr_helper.lattices),
+            "_integrater": state,
+        }
+
+    def set_processing_state(self, state):
+        integrater = _Sweep(
+            state["lattices"], state["_integrater"]["_intgr_working_directory"]
+        )._integrater
+        integrater.set_integrater_sweep(self, reset=False)
+        for name, value in state["_integrater"].items():
+            if name not in ("_intgr_indexer", "_intgr_refiner"):
+                setattr(integrater, name, value)
+        self._integrater = integrater
+
+
+def test_speculative_lattices(monkeypatch, tmp_path):
+    lattices = ["tP", "oP", "mC", "aP"]
+
+    serial = _Sweep(lattices, str(tmp_path))
+    assert serial._integrater.integrate() == ("mC", tmp_path.name)
+
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "speculative_lattices", 3)
+    sweep = _Sweep(lattices, str(tmp_path))
+    integrater = sweep._integrater
+    # oP, mC and aP are integrated in parallel, and the result for mC is kept
+    assert integrater.integrate() == ("mC", "lattice_2_mC")
+    assert sweep._integrater is integrater
+    assert integrater._intgr_indexer._indxr_helper.lattices == ["mC", "aP"]
+    assert integrater.get_working_directory() == str(tmp_path)
+    assert tmp_path.joinpath("lattice_1_oP").is_dir()
+
+
+def test_speculative_lattices_concurrent(monkeypatch, tmp_path):
+    markers = tmp_path / "markers"
+    markers.mkdir()
+    monkeypatch.setattr(_Integrater, "marker_directory", str(markers))
+    # mC is only integrated once aP has started, so the candidates must be
+    # integrated concurrently, and aP would take a minute if left to finish
+    monkeypatch.setattr(_Integrater, "barrier", [("aP", "lattice_3_aP")])
+    monkeypatch.setattr(_Integrater, "slow_lattices", ("aP",))
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "speculative_lattices", 3)
+
+    start = time.monotonic()
+    sweep = _Sweep(["tP", "oP", "mC", "aP"], str(tmp_path))
+    assert sweep._integrater.integrate() == ("mC", "lattice_2_mC")
+    # the first candidate which is not rejected is kept without waiting for
+    # the later candidates
+    assert time.monotonic() - start < 30
+    # and each candidate only tries its own lattice
+    assert sorted(p.name for p in markers.iterdir()) == [
+        "aP_lattice_3_aP",
+        "mC_lattice_2_mC",
+        "oP_lattice_1_oP",
+        f"tP_{tmp_path.name}",
+    ]
+
+
+def test_speculative_lattices_all_rejected(monkeypatch, tmp_path):
+    monkeypatch.setattr(_Integrater, "bad_lattices", ("tP", "oP", "mC"))
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "speculative_lattices", 2)
+    sweep = _Sweep(["tP", "oP", "mC", "aP"], str(tmp_path))
+    # oP and mC are both rejected, so aP is integrated as it would have been
+    assert sweep._integrater.integrate() == ("aP", tmp_path.name)
+
+
+def test_speculative_lattices_files(monkeypatch, tmp_path):
+    file_handler = _FileHandler()
+    monkeypatch.setattr(integrater_module, "FileHandler", file_handler)
+    monkeypatch.setattr(_Integrater, "record_files", True)
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "speculative_lattices", 3)
+    sweep = _Sweep(["tP", "oP", "mC", "aP"], str(tmp_path))
+    assert sweep._integrater.integrate() == ("mC", "lattice_2_mC")
+
+    # the files recorded when integrating the lattice which is kept are
+    # recorded, in place of those of the lattices rejected, and those of the
+    # lattices after it are not
+    committed = tmp_path / "lattice_2_mC"
+    assert file_handler._log_files == {
+        "refine": str(committed / "mC_refine.log"),
+        "integrate": str(committed / "mC_integrate.log"),
+    }
+    assert file_handler._data_files == [str(committed / "mC_integrated.refl")]
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from xia2.Schema.PerImageStatistics import PerImageStatistics
+
+
+def _stats():
+    stats = {}
+    for image in range(1, 41):
+        stats[image] = {
+            "rmsd_pixel": 0.5,
+            "strong": 100,
+            "overloads": 0,
+            "fraction_weak": 0.5,
+            "unit_cell": (78.0, 78.0, 37.0, 90.0, 90.0, 90.0),
+        }
+    # a blank run, an overloaded run and a few isolated bad images
+    for image in range(11, 21):
+        stats[image]["fraction_weak"] = 1.0
+    for image in range(31, 36):
+        stats[image]["overloads"] = 5
+    stats[3]["rmsd_pixel"] = 3.0
+    stats[4]["rmsd_pixel"] = 1.5
+    stats[40]["unit_cell"] = (78.78, 78.0, 37.0, 90.0, 90.0, 90.0)
+    return stats
+
+
+def test_per_image_statistics(tmp_path):
+    stats = _stats()
+    statistics = PerImageStatistics.from_dict(stats)
+    assert len(statistics) == 40
+    assert list(statistics) == list(range(1, 41))
+    assert statistics[40] == stats[40]
+
+    assert statistics.status_record() == "oo!%oooooo" + "." * 10 + "o" * 10 + (
+        "O" * 5 + "o" * 5
+    )
+    assert statistics.windows(statistics.weak()) == [(11, 20)]
+    assert statistics.windows(statistics.overloaded(), window=5) == [(31, 35)]
+    assert statistics.windows(statistics.overloaded(), window=20) == []
+    assert statistics.max_relative_cell_deviation() == pytest.approx(0.00975, abs=1e-5)
+
+    # once saved, the json refers to the saved file
+    filename = tmp_path / "per_image_statistics.npz"
+    statistics.save(filename)
+    obj = json.loads(json.dumps(statistics.to_dict()))
+    assert obj == {"__id__": "PerImageStatistics", "filename": str(filename)}
+    restored = PerImageStatistics.from_serialized(obj)
+    assert restored.status_record() == statistics.status_record()
+    assert restored[3] == stats[3]
+
+    # older json files have the statistics themselves, keyed by str(image)
+    legacy = json.loads(json.dumps(stats))
+    assert PerImageStatistics.from_serialized(legacy)[40] == stats[40]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import shutil
+
+import pytest
+
+from xia2.Schema import load_imagesets
+from xia2.Schema.Sweep import Sweep, SweepFactory
+
+
+def _link_images(dials_data, directory, images):
+    for j in images:
+        try:
+            directory.joinpath(f"insulin_1_{j:03d}.img").symlink_to(
+                dials_data("insulin") / f"insulin_1_{j:03d}.img"
+            )
+        except OSError:
+            shutil.copy(dials_data("insulin") / f"insulin_1_{j:03d}.img", directory)
+
+
+def test_sweep_growth(dials_data, tmp_path):
+    _link_images(dials_data, tmp_path, range(1, 21))
+    (sweep,) = SweepFactory("insulin_1_###.img", str(tmp_path))
+    assert sweep.get_images() == list(range(1, 21))
+
+    # more images are collected while the sweep is being processed
+    _link_images(dials_data, tmp_path, range(21, 46))
+    assert sweep.get_images() == list(range(1, 46))
+
+    scan = sweep.get_imageset().get_scan()
+    (reloaded,) = load_imagesets("insulin_1_###.img", str(tmp_path), use_cache=False)
+    assert scan.get_image_range() == reloaded.get_scan().get_image_range()
+    assert scan.get_oscillation() == reloaded.get_scan().get_oscillation()
+    assert list(scan.get_epochs()) == list(reloaded.get_scan().get_epochs())
+    assert len(sweep.get_imageset()) == 45
+
+
+def test_sweep_id_image(dials_data, tmp_path):
+    # two sweeps matching the same template, separated by a gap
+    _link_images(dials_data, tmp_path, list(range(1, 11)) + list(range(21, 31)))
+    assert Sweep("insulin_1_###.img", str(tmp_path), id_image=21).get_images() == (
+        list(range(21, 31))
+    )
+    assert Sweep("insulin_1_###.img", str(tmp_path), id_image=1).get_images() == (
+        list(range(1, 11))
+    )
+    with pytest.raises(RuntimeError, match="including image 15"):
+        Sweep("insulin_1_###.img", str(tmp_path), id_image=15)
@@ -128,6 +128,43 @@ def _exercise_serialization(dials_data, tmp_path):
     print(xproj.get_output())
     print("\n".join(xproj.summarise()))
 
+    # the msgpack state, with the state of a sweep updated after it was
+    # written, restores the same project as xia2.json
+    state = tmp_path / "xia2.state"
+    sweep._integrater = None
+    proj.as_msgpack(state)
+    sweep._integrater = integrater
+    XProject.append_sweep_state(state, sweep)
+    xproj = XProject.from_msgpack(state)
+    assert xproj.path == tmp_path
+    assert xproj.as_json() == XProject.from_json(string=proj.as_json()).as_json()
+    xsweep = xproj.get_crystals()["CRYST1"].get_xwavelength("WAVE1").get_sweeps()[0]
+    assert xsweep._integrater is not None
+
+    # a partially written last record, e.g. after a crash, is ignored
+    with state.open("ab") as fh:
+        fh.write(b"\x82\xa5sweep")
+    assert XProject.from_msgpack(state).as_json() == xproj.as_json()
+
+
+def test_msgpack_keys_as_json():
+    import msgpack
+
+    from xia2.Schema.XProject import _decode_msgpack_keys, _skip_keys, decode_dict_keys
+
+    obj = {
+        1: {"2": [{3.5: True, True: 1, None: 2, "x": {"10": "a", 1.0: 2}}]},
+        (1, 2): "skipped",
+        "cell": (78.0, 78.0, 37.0, 90.0, 90.0, 90.0),
+    }
+    expected = json.loads(json.dumps(obj, skipkeys=True), object_hook=decode_dict_keys)
+    unpacked = msgpack.unpackb(
+        msgpack.packb(_skip_keys(obj)), raw=False, strict_map_key=False
+    )
+    # msgpack keeps the types of the keys, unlike json
+    assert unpacked[1]["2"][0][True] == 1
+    assert _decode_msgpack_keys(unpacked) == expected
+
 
 def test_serialization(regression_test, ccp4, dials_data, run_in_tmp_path):
     with mock.patch.object(sys, "argv", []):
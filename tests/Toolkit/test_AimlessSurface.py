@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+import scitbx.math
+
+from xia2.Toolkit.AimlessSurface import evaluate_1degree
+
+
+def _evaluate_reference(ClmList, order, t, p):
+    # the absorption surface at theta, phi = t, p degrees from the complex
+    # spherical harmonics in scitbx
+    lfg = scitbx.math.log_factorial_generator(2 * order + 1)
+    nsssphe = scitbx.math.nss_spherical_harmonics(order, 50000, lfg)
+    a = 1.0
+    idx = 0
+    for l in range(1, order + 1):
+        for m in range(-l, l + 1):
+            Ylm = nsssphe.spherical_harmonic(
+                l, abs(m), math.radians(t), math.radians(p)
+            )
+            if m < 0:
+                a += ClmList[idx] * math.sqrt(2) * ((-1) ** m) * Ylm.imag
+            elif m == 0:
+                a += ClmList[idx] * Ylm.real
+            else:
+                a += ClmList[idx] * math.sqrt(2) * ((-1) ** m) * Ylm.real
+            idx += 1
+    return a
+
+
+@pytest.mark.parametrize("order", [1, 2, 4, 6])
+def test_evaluate_1degree(order):
+    rng = np.random.default_rng(seed=order)
+    ClmList = list(rng.normal(scale=0.05, size=order * (order + 2)))
+    abscor = evaluate_1degree(ClmList)
+    assert abscor.shape == (181, 361)
+    for t, p in ((0, 0), (37, 101), (90, 180), (143, 299), (180, 360)):
+        assert abscor[t, p] == pytest.approx(
+            _evaluate_reference(ClmList, order, t, p), abs=1e-8
+        )
+
+    # the surface is flat without any coefficients
+    assert np.all(evaluate_1degree([]) == 1)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+from dials.array_family import flex
+from dxtbx.serialize import load
+
+from xia2.Wrappers.Dials.Functional.EstimateResolution import EstimateResolution
+from xia2.Wrappers.Dials.Functional.Scale import Scale
+
+
+@pytest.fixture()
+def lcy_data(dials_data):
+    lcy = dials_data("l_cysteine_4_sweeps_scaled")
+    expts = load.experiment_list(lcy / "scaled_20_25.expt", check_format=False)
+    refls = flex.reflection_table.from_file(lcy / "scaled_20_25.refl")
+    yield expts, refls
+
+
+def test_scale(lcy_data, run_in_tmp_path):
+    expts, refls = lcy_data
+    scaler = Scale()
+    scaler.set_phil_parameters(["model=KB", "full_matrix=False", "cut_data.d_min=1.0"])
+    assert scaler._params.model == "KB"
+    assert scaler._params.cut_data.d_min == 1.0
+    scaled_expts, scaled_refls = scaler.run(expts, refls)
+
+    assert len(scaled_expts) == len(expts)
+    assert "inverse_scale_factor" in scaled_refls
+    assert flex.min(scaled_refls["d"].select(scaled_refls["d"] > 0)) >= 1.0
+
+    # only the log and html report are written
+    assert (run_in_tmp_path / scaler.get_log_file()).is_file()
+    assert (run_in_tmp_path / scaler.get_html()).is_file()
+    assert not list(run_in_tmp_path.glob("*.expt"))
+    assert not list(run_in_tmp_path.glob("*.refl"))
+
+
+def test_estimate_resolution(lcy_data, run_in_tmp_path):
+    expts, refls = lcy_data
+    m = EstimateResolution()
+    m.set_limit_cc_half(0.3)
+    m.set_limit_isigma(None)
+    m.set_limit_misigma(1.0)
+    m.run(expts, refls)
+
+    assert m.get_resolution_cc_half() is not None
+    assert m.get_resolution_misigma() is not None
+    assert m.get_resolution_isigma() is None
+    assert (run_in_tmp_path / m.get_log_file()).is_file()
+    # as well as the report and plots, as from dials.estimate_resolution
+    assert Path(m.get_html()).is_file()
+    with open(m.get_json()) as fh:
+        assert set(json.load(fh)) == {"cc_half", "misigma"}
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import os
+
+from xia2.Wrappers.XDS.XDSFiles import write_input_data_files
+
+
+def test_write_input_data_files(tmp_path):
+    init = tmp_path / "init"
+    integrate = tmp_path / "integrate"
+    init.mkdir()
+    integrate.mkdir()
+    for name in ("BKGINIT.cbf", "BLANK.cbf", "SPOT.XDS"):
+        init.joinpath(name).write_text(name)
+    input_data_files = {
+        name: str(init / name) for name in ("BKGINIT.cbf", "BLANK.cbf", "SPOT.XDS")
+    }
+
+    write_input_data_files(
+        str(integrate),
+        input_data_files,
+        ["BKGINIT.cbf", "BLANK.cbf", "SPOT.XDS"],
+        ["SPOT.XDS", "FRAME.cbf"],
+    )
+    # inputs are linked, unless the step will rewrite them
+    assert os.path.samefile(init / "BKGINIT.cbf", integrate / "BKGINIT.cbf")
+    assert os.path.samefile(init / "BLANK.cbf", integrate / "BLANK.cbf")
+    assert not os.path.samefile(init / "SPOT.XDS", integrate / "SPOT.XDS")
+    assert integrate.joinpath("SPOT.XDS").read_text() == "SPOT.XDS"
+
+    # rerunning a step which writes a linked file leaves the original alone
+    write_input_data_files(str(init), {}, [], ["BKGINIT.cbf", "BLANK.cbf"])
+    assert not init.joinpath("BKGINIT.cbf").exists()
+    assert integrate.joinpath("BKGINIT.cbf").read_text() == "BKGINIT.cbf"
+
+    # as does a step which rewrites its own, shared, input in place
+    write_input_data_files(
+        str(integrate),
+        {"BLANK.cbf": str(integrate / "BLANK.cbf")},
+        ["BLANK.cbf"],
+        ["BLANK.cbf"],
+    )
+    assert integrate.joinpath("BLANK.cbf").stat().st_nlink == 1
+    assert integrate.joinpath("BLANK.cbf").read_text() == "BLANK.cbf"
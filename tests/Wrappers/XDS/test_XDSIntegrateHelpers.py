@@ -1,6 +1,14 @@
 from __future__ import annotations
 
-from xia2.Wrappers.XDS.XDSIntegrateHelpers import parse_integrate_lp
+import pytest
+
+from xia2.Wrappers.XDS.XDSIntegrateHelpers import (
+    merge_integrate_hkl,
+    merge_integrate_lp,
+    parse_integrate_lp,
+    parse_integrate_lp_updates,
+    split_data_range,
+)
 
 
 def test_parse_integrate_lp(tmpdir):
@@ -42,6 +50,67 @@ def test_parse_integrate_lp(tmpdir):
     }
 
 
+def test_split_data_range():
+    assert split_data_range((1, 10), 3) == [(1, 4), (5, 7), (8, 10)]
+    assert split_data_range((1, 10), 1) == [(1, 10)]
+    assert split_data_range((5, 6), 4) == [(5, 5), (6, 6)]
+
+
+def test_merge_integrate_lp(tmpdir):
+    filenames = []
+    for name, contents, suggested in (
+        ("a", integrate_lp_example_1, (0.3, 0.03, 0.5, 0.07)),
+        ("b", integrate_lp_big_n_refl, (0.5, 0.05, 0.7, 0.09)),
+    ):
+        integrate_lp = tmpdir.mkdir(name).join("INTEGRATE.LP")
+        with integrate_lp.open("w") as fh:
+            fh.write(contents)
+            fh.write(" ***** SUGGESTED VALUES FOR INPUT PARAMETERS *****\n")
+            fh.write(
+                " BEAM_DIVERGENCE=%7.3f  BEAM_DIVERGENCE_E.S.D.=%7.3f\n"
+                " REFLECTING_RANGE=%7.3f  REFLECTING_RANGE_E.S.D.=%7.3f\n" % suggested
+            )
+        filenames.append(integrate_lp.strpath)
+
+    merged = tmpdir.join("INTEGRATE.LP").strpath
+    merge_integrate_lp(filenames, merged)
+    per_image_stats = parse_integrate_lp(merged)
+    assert list(per_image_stats) == list(range(1, 22)) + list(range(2601, 2611))
+    assert per_image_stats[1]["mosaic"] == 0.042
+    assert parse_integrate_lp_updates(merged) == pytest.approx(
+        {
+            "BEAM_DIVERGENCE": 0.4,
+            "BEAM_DIVERGENCE_E.S.D.": 0.04,
+            "REFLECTING_RANGE": 0.6,
+            "REFLECTING_RANGE_E.S.D.": 0.08,
+        }
+    )
+
+
+def test_merge_integrate_hkl(tmpdir):
+    filenames = []
+    for j, data_range in enumerate(((1, 10), (11, 20))):
+        integrate_hkl = tmpdir.join("INTEGRATE_%d.HKL" % j)
+        with integrate_hkl.open("w") as fh:
+            fh.write("!OUTPUT_FILE=INTEGRATE.HKL\n")
+            fh.write("!DATA_RANGE=%8d%8d\n" % data_range)
+            fh.write("!END_OF_HEADER\n")
+            fh.write("%6d%6d%6d\n" % (j, j, j))
+            fh.write("!END_OF_DATA\n")
+        filenames.append(integrate_hkl.strpath)
+
+    merged = tmpdir.join("INTEGRATE.HKL")
+    merge_integrate_hkl(filenames, merged.strpath, (1, 20))
+    assert merged.read().splitlines() == [
+        "!OUTPUT_FILE=INTEGRATE.HKL",
+        "!DATA_RANGE=       1      20",
+        "!END_OF_HEADER",
+        "     0     0     0",
+        "     1     1     1",
+        "!END_OF_DATA",
+    ]
+
+
 integrate_lp_example_1 = """\
  OSCILLATION_RANGE=  0.250000 DEGREES
 
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+from libtbx.utils import Sorry
+
+from xia2.cli.plot_multiplicity import (
+    MultiplicityVolume,
+    master_phil,
+    plot_multiplicity,
+    run,
+)
+
+
+@pytest.fixture
+def intensities():
+    symmetry = crystal.symmetry(
+        unit_cell=(20, 30, 40, 90, 90, 90), space_group_symbol="P 1"
+    )
+    complete = miller.build_set(symmetry, anomalous_flag=False, d_min=3.9)
+    # measure each reflection 1 + |h + k + l| % 3 times, and miss out (1, 1, 0)
+    indices = flex.miller_index()
+    for hkl in complete.indices():
+        if hkl not in ((1, 1, 0), (-1, -1, 0)):
+            for _ in range(1 + abs(sum(hkl)) % 3):
+                indices.append(hkl)
+    return miller.array(
+        miller.set(symmetry, indices, anomalous_flag=False),
+        data=flex.double(indices.size(), 1),
+        sigmas=flex.double(indices.size(), 1),
+    ).set_observation_type_xray_intensity()
+
+
+def _heatmap(plot):
+    (heatmap,) = (trace for trace in plot["data"] if trace["type"] == "heatmap")
+    return heatmap
+
+
+def test_multiplicity_heatmap_json(intensities, tmp_path):
+    settings = master_phil.extract()
+    settings.slice_axis = "l"
+    settings.slice_index = 0
+    settings.show_missing = True
+    settings.plot.filename = None
+    settings.json.filename = str(tmp_path / "multiplicities.json")
+    plot_multiplicity(intensities, settings)
+    with open(settings.json.filename) as fh:
+        plot = json.load(fh)
+
+    # the slice is a dense grid, z[y][x], of the multiplicities in the plane
+    heatmap = _heatmap(plot)
+    h, k = heatmap["x"], heatmap["y"]
+    assert h == list(range(-5, 6))
+    assert k == list(range(-7, 8))
+    assert len(heatmap["z"]) == len(k)
+    assert all(len(row) == len(h) for row in heatmap["z"])
+    assert heatmap["z"][k.index(2)][h.index(3)] == 1 + 5 % 3
+    # as are the Friedel mates
+    assert heatmap["z"][k.index(-2)][h.index(-3)] == 1 + 5 % 3
+    assert heatmap["zmax"] == 3
+
+    # missing reflections are not in the heatmap, but drawn as markers
+    assert heatmap["z"][k.index(1)][h.index(1)] is None
+    (missing,) = (trace for trace in plot["data"] if trace["type"] == "scatter")
+    assert sorted(zip(missing["x"], missing["y"])) == [(-1, -1), (1, 1)]
+    assert plot["layout"]["xaxis"]["title"] == "h"
+    assert plot["layout"]["yaxis"]["title"] == "k"
+
+
+def test_multiplicity_options(intensities):
+    settings = master_phil.extract()
+    settings.slice_axis = "h"
+
+    # reflections beyond d_min are excluded from the volume
+    x, y, grid = MultiplicityVolume(intensities, d_min=7).slice("h")
+    assert list(x) == list(range(-4, 5))
+    assert list(y) == list(range(-5, 6))
+    assert MultiplicityVolume(intensities).slice("h")[2].shape == (21, 15)
+
+    volume = MultiplicityVolume(intensities)
+    settings.sqrt_scale_colors = True
+    heatmap = _heatmap(volume.as_plotly_dict(settings))
+    z = heatmap["z"][heatmap["y"].index(1)][heatmap["x"].index(1)]
+    assert z == pytest.approx(math.sqrt(1 + 2 % 3))
+    assert heatmap["zmax"] == pytest.approx(math.sqrt(3))
+    assert heatmap["colorbar"]["ticktext"][-1] == "3"
+    assert heatmap["colorbar"]["tickvals"][-1] == pytest.approx(math.sqrt(3))
+
+    # options of cctbx.miller.display which have no meaning here are rejected
+    for name in ("uniform_size", "scale_radii_multiplicity", "sqrt_scale_radii"):
+        with pytest.raises(Sorry, match=name):
+            run([f"{name}=True"])
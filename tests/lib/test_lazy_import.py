@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import os
+import sys
+
+from xia2.lib.lazy_import import lazy_import
+
+
+def test_lazy_import(tmp_path, monkeypatch):
+    (tmp_path / "xia2_lazy_test_module.py").write_text(
+        "import os\nos.environ['XIA2_LAZY_TEST_EXECUTED'] = '1'\nvalue = 42\n"
+    )
+    monkeypatch.delenv("XIA2_LAZY_TEST_EXECUTED", raising=False)
+    monkeypatch.syspath_prepend(tmp_path)
+    monkeypatch.delitem(sys.modules, "xia2_lazy_test_module", raising=False)
+
+    module = lazy_import("xia2_lazy_test_module")
+    assert sys.modules["xia2_lazy_test_module"] is module
+    assert "XIA2_LAZY_TEST_EXECUTED" not in os.environ
+    assert module.value == 42
+    assert os.environ["XIA2_LAZY_TEST_EXECUTED"] == "1"
+
+    # subsequent imports give the same module
+    assert lazy_import("xia2_lazy_test_module") is module
+    import xia2_lazy_test_module
+
+    assert xia2_lazy_test_module is module
+    monkeypatch.delitem(sys.modules, "xia2_lazy_test_module")
@@ -0,0 +1,100 @@
+"""Import time of the xia2 command line programs, from python -X importtime.
+
+The cumulative import time of each entry point is recorded as a property of
+the test, to be tracked in the junit xml output, and compared with a budget
+for the most frequently run programs. As wall-clock times depend on the
+machine and its load, exceeding a budget gives a warning rather than a
+failure; the lightweight programs are checked deterministically by the
+modules they import."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+import warnings
+from importlib import metadata
+
+import pytest
+
+# programs which are run very frequently, e.g. from beamline automation, and
+# must not import any of the heavy scientific packages at start up
+lightweight_entry_points = (
+    "xia2.cli.is_doing",
+    "xia2.cli.get_image_number",
+    "xia2.cli.print",
+    "xia2.cli.show_mask",
+)
+heavy_packages = {"cctbx", "dials", "dxtbx", "h5py", "iotbx", "libtbx", "scitbx"}
+
+# import time budgets in seconds, generous enough to allow for a slow file
+# system but to catch e.g. a heavy dependency becoming a module level import
+import_time_budgets = {
+    "xia2.cli.is_doing": 0.1,
+    "xia2.cli.get_image_number": 0.1,
+    "xia2.cli.print": 0.1,
+    "xia2.cli.show_mask": 0.1,
+    "xia2.cli.xia2_main": 2,
+    "xia2.cli.ssx": 5,
+    "xia2.cli.multiplex": 5,
+}
+
+
+def import_times(module):
+    """The cumulative import time in microseconds of every module imported
+    when importing module in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def _xia2_entry_points():
+    return sorted(
+        {
+            ep.module
+            for ep in metadata.entry_points(group="console_scripts")
+            if ep.module.startswith("xia2.")
+        }
+    )
+
+
+@pytest.mark.parametrize("module", lightweight_entry_points)
+def test_lightweight_entry_point_imports(module):
+    times = import_times(module)
+    assert module in times
+    heavy = sorted(m for m in times if m.split(".")[0] in heavy_packages)
+    assert not heavy, f"{module} imports {', '.join(heavy)}"
+
+
+def test_phil_import_is_lazy():
+    times = import_times("xia2.Handlers.Phil")
+    assert not any(m.split(".")[0] in heavy_packages for m in times)
+
+
+@pytest.mark.parametrize("module", _xia2_entry_points())
+def test_entry_point_import_time(module, record_property):
+    times = import_times(module)
+    record_property("import_time_us", times[module])
+
+
+@pytest.mark.parametrize("module,budget", sorted(import_time_budgets.items()))
+def test_entry_point_import_time_budget(module, budget, record_property):
+    # best of three, as the first import may be slowed by a cold disk cache
+    import_time = min(import_times(module)[module] for _ in range(3)) / 1e6
+    record_property("best_import_time_s", import_time)
+    if import_time >= budget:
+        warnings.warn(
+            f"{module} took {import_time:.2f}s to import (budget {budget}s)",
+            stacklevel=1,
+        )